@@ -7,10 +7,20 @@ load_dotenv()
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 
 # --- Exode API Settings ---
-EXODE_API_BASE_URL = "https://api.exode.biz/saas/v2" 
+EXODE_API_BASE_URL = os.getenv('EXODE_API_BASE_URL', "https://api.exode.biz/saas/v2")
 SELLER_ID = os.getenv('SELLER_ID')
 EXODE_TOKEN = os.getenv('EXODE_TOKEN')
 SCHOOL_ID = os.getenv('SCHOOL_ID')
+# Total and connect timeouts (seconds) for a single Exode API request
+EXODE_TIMEOUT = float(os.getenv('EXODE_TIMEOUT', '10'))
+EXODE_CONNECT_TIMEOUT = float(os.getenv('EXODE_CONNECT_TIMEOUT', '5'))
+# Retries for timeouts, connection errors and 5xx responses
+EXODE_MAX_RETRIES = int(os.getenv('EXODE_MAX_RETRIES', '2'))
+# Maximum number of pooled keep-alive connections to the Exode API
+EXODE_POOL_SIZE = int(os.getenv('EXODE_POOL_SIZE', '20'))
+# Seconds to cache /user/find results by phone and tgId; "not found" uses the shorter TTL
+EXODE_LOOKUP_TTL = float(os.getenv('EXODE_LOOKUP_TTL', '120'))
+EXODE_NEGATIVE_LOOKUP_TTL = float(os.getenv('EXODE_NEGATIVE_LOOKUP_TTL', '30'))
 COURSES_SHEET_ID = os.getenv('COURSES_SHEET_ID')
 SUPPORT_GROUP_ID = os.getenv('SUPPORT_GROUP_ID')
 
@@ -26,6 +36,44 @@ PROFESSIONS_SHEET_ID = os.getenv('PROFESSIONS_SHEET_ID')
 # ID for the sheet with private universities
 PRIVATE_UNIVERSITIES_SHEET_ID = os.getenv('PRIVATE_UNIVERSITIES_SHEET_ID')
 FOREIGN_UNIVERSITIES_SHEET_ID = os.getenv('FOREIGN_UNIVERSITIES_SHEET_ID')
+# Number of worker threads for blocking Google Sheets calls
+GSHEETS_MAX_WORKERS = int(os.getenv('GSHEETS_MAX_WORKERS', '8'))
+# How many opened spreadsheets (handles + worksheet metadata) to keep in memory
+GSHEETS_MAX_OPEN_SPREADSHEETS = int(os.getenv('GSHEETS_MAX_OPEN_SPREADSHEETS', '32'))
+# Seconds after which a cached catalog worksheet is refreshed in the background
+CATALOG_CACHE_TTL = int(os.getenv('CATALOG_CACHE_TTL', '300'))
+# Google Sheets API quota shared by all managers: requests per minute and burst size
+GSHEETS_READS_PER_MINUTE = float(os.getenv('GSHEETS_READS_PER_MINUTE', '60'))
+GSHEETS_WRITES_PER_MINUTE = float(os.getenv('GSHEETS_WRITES_PER_MINUTE', '60'))
+GSHEETS_BURST = int(os.getenv('GSHEETS_BURST', '10'))
+# How many spreadsheets the bulk universities loader fetches at the same time
+GSHEETS_BULK_CONCURRENCY = int(os.getenv('GSHEETS_BULK_CONCURRENCY', '4'))
+# Local versioned snapshot of all catalogs (courses, professions, universities) served on start
+CATALOG_SNAPSHOT_PATH = os.getenv('CATALOG_SNAPSHOT_PATH', 'data/catalog_snapshot.sqlite3')
+# Seconds between bulk reloads of the university spreadsheets and snapshot saves
+CATALOG_SNAPSHOT_INTERVAL = int(os.getenv('CATALOG_SNAPSHOT_INTERVAL', '3600'))
+# Seconds between incremental syncs of the registration sheets (only new rows are fetched)
+REGISTRATION_SYNC_INTERVAL = float(os.getenv('REGISTRATION_SYNC_INTERVAL', '30'))
+# Seconds between full re-reads that catch manual edits and deletions in the registration sheets
+REGISTRATION_FULL_SYNC_INTERVAL = float(os.getenv('REGISTRATION_FULL_SYNC_INTERVAL', '900'))
+# Local SQLite journal for registration rows waiting to be written to Google Sheets
+WRITE_QUEUE_PATH = os.getenv('WRITE_QUEUE_PATH', 'data/write_queue.sqlite3')
+# Seconds between batched flushes of the write-behind queue
+WRITE_QUEUE_FLUSH_INTERVAL = float(os.getenv('WRITE_QUEUE_FLUSH_INTERVAL', '5'))
+
+# --- FSM Storage Settings ---
+# Backend for conversation state: memory, sqlite or redis
+FSM_STORAGE = os.getenv('FSM_STORAGE', 'sqlite')
+# File for the sqlite backend
+FSM_STORAGE_PATH = os.getenv('FSM_STORAGE_PATH', 'data/fsm.sqlite3')
+# Any Redis-protocol server for the redis backend (shared by several bot workers)
+REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+# Seconds after the last update when an abandoned session expires (0 = never)
+FSM_STORAGE_TTL = int(os.getenv('FSM_STORAGE_TTL', str(7 * 24 * 3600)))
+
+# --- STEM Test Settings ---
+# Append-only local log of test answers (survives restarts, queryable by user and date)
+TEST_LOG_PATH = os.getenv('TEST_LOG_PATH', 'data/test_answers.sqlite3')
 
 # ID таблиц для ГОСУДАРСТВЕННЫХ вузов, сгруппированные по городам
 STATE_UNIVERSITIES_BY_CITY = {
@@ -14,7 +14,7 @@ def get_children_keyboard(children: list, lexicon: dict, lang: str):
     """Создает клавиатуру со списком детей для выбора."""
     builder = InlineKeyboardBuilder()
     for child in children:
-        child_name = child.get('Имя ребенка', 'Имя не указано')
+        child_name = child.first_name or 'Имя не указано'
 
         builder.row(types.InlineKeyboardButton(
             text=child_name,
@@ -34,7 +34,7 @@ async def select_child_for_test_handler(callback: types.CallbackQuery, state: FS
     Показывает список детей для выбора.
     """
     lang = (await state.get_data()).get('language', 'ru')
-    children = registration_manager.get_children_by_parent_id(callback.from_user.id)
+    children = await registration_manager.get_children_by_parent_id(callback.from_user.id)
 
     if not children:
         await callback.answer("У вас еще нет добавленных детей. Сначала добавьте ребенка в профиле.", show_alert=True)
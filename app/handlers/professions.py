@@ -1,13 +1,53 @@
+from typing import Optional
+
 from aiogram import Router, F, types
 from aiogram.fsm.context import FSMContext
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
+from app.keyboards.pagination import PagedView, page_filter, parse_page_callback
 from app.states.registration import ProfessionsExplorer 
 from app.utils.google_sheets import ProfessionsGSheet
-from app.handlers.stem_navigator import PRIMARY_FIELDS, ADDITIONAL_FIELDS
+from app.handlers.stem_navigator import PRIMARY_FIELDS, ADDITIONAL_FIELDS, profession_card
+from app.utils.profession_index import Direction, DirectionsIndex
 
 router = Router()
 
+# В сессии хранится только версия каталога и выбранный индекс направления,
+# списки профессий восстанавливаются из общего кэша
+CATALOG_EXPIRED_TEXT = "Каталог профессий обновился. Пожалуйста, выберите направление заново."
+
+# Постраничные списки направлений и профессий направления
+DIRECTIONS_PAGES = PagedView(
+    "explore_dir", back_callback="back_to_main_menu", per_page=8, back_text="🏠 Главное меню"
+)
+PROFESSIONS_PAGES = PagedView(
+    "explore_prof", back_callback="back_to_directions_list", per_page=8, back_text="⬅️ Назад к направлениям"
+)
+
+
+def directions_markup(version, index: DirectionsIndex, page: int):
+    """Страница списка всех направлений (кнопки "explore_dir_<позиция>")."""
+    return DIRECTIONS_PAGES.markup(index.direction_names, page, key=version)
+
+
+def professions_markup(version, direction_index: int, direction: Direction, page: int):
+    """Страница списка профессий направления (кнопки "explore_prof_<позиция>")."""
+    return PROFESSIONS_PAGES.markup(direction.profession_names, page, key=(version, direction_index))
+
+
+def directions_index(professions_manager: ProfessionsGSheet, version) -> Optional[DirectionsIndex]:
+    """Направления общего каталога профессий для версии из сессии (строятся один раз на версию)."""
+    return professions_manager.directions_index(ProfessionsGSheet.ALL_PROFESSIONS_KEY, version)
+
+
+def resolve_direction(user_data: dict, professions_manager: ProfessionsGSheet, direction_index: int = None) -> Optional[Direction]:
+    """Направление из сессии (None, если версия каталога вытеснена или номера нет)."""
+    index = directions_index(professions_manager, user_data.get('professions_version'))
+    if direction_index is None:
+        direction_index = user_data.get('direction_index')
+    return index.direction(direction_index) if index else None
+
+
 @router.message(F.text.in_({"💼 Профессии"}))
 async def professions_start_handler(message: types.Message, state: FSMContext, professions_manager: ProfessionsGSheet):
     await message.delete()
@@ -19,27 +59,18 @@ async def professions_start_handler(message: types.Message, state: FSMContext, p
             pass  
     await state.clear() 
 
-    all_professions = professions_manager.get_all_professions()
+    catalog = await professions_manager.get_all_professions_catalog()
+    index = directions_index(professions_manager, catalog.version) if catalog else None
 
-    if not all_professions:
+    if not index or not index.directions:
         await message.answer("Каталог профессий временно недоступен. (Не удалось загрузить данные из листов human, tech и т.д.)")
         return
-    all_directions = sorted(list(set(p.get('Направление') for p in all_professions if p.get('Направление'))))
-    await state.update_data(all_professions=all_professions, all_directions=all_directions)
-    
-    builder = InlineKeyboardBuilder()
-    for index, direction in enumerate(all_directions):
-        builder.row(types.InlineKeyboardButton(
-            text=direction,
-            callback_data=f"explore_dir_{index}" 
-        ))
-    
-    builder.row(types.InlineKeyboardButton(text="🏠 Главное меню", callback_data="back_to_main_menu"))
+    await state.update_data(professions_version=catalog.version)
 
     await state.set_state(ProfessionsExplorer.choosing_direction)
     await message.answer(
         "Выберите интересующее вас направление:",
-        reply_markup=builder.as_markup()
+        reply_markup=directions_markup(catalog.version, index, 0)
     )
 
 @router.callback_query(ProfessionsExplorer.choosing_direction, F.data.startswith("explore_dir_"))
@@ -47,47 +78,60 @@ async def direction_selected_handler(callback: types.CallbackQuery, state: FSMCo
     direction_index = int(callback.data.replace("explore_dir_", ""))
     
     user_data = await state.get_data()
-    selected_direction = user_data.get('all_directions', [])[direction_index]
-    all_professions = user_data.get('all_professions', [])
-    filtered_professions = [p for p in all_professions if p.get('Направление') == selected_direction]
-    
-    builder = InlineKeyboardBuilder()
-    for index, prof in enumerate(filtered_professions):
-        builder.row(types.InlineKeyboardButton(
-            text=prof.get('Название профессии'),
-            callback_data=f"explore_prof_{index}"
-        ))
-    
-    builder.row(types.InlineKeyboardButton(text="⬅️ Назад к направлениям", callback_data="back_to_directions_list"))
+    direction = resolve_direction(user_data, professions_manager, direction_index)
+    if direction is None:
+        await callback.answer(CATALOG_EXPIRED_TEXT, show_alert=True)
+        return
     
     await state.set_state(ProfessionsExplorer.choosing_profession)
-    await state.update_data(filtered_professions=filtered_professions)
+    await state.update_data(direction_index=direction_index)
     
     await callback.message.edit_text(
-        f"<b>{selected_direction}</b>\n\nВыберите профессию:",
-        reply_markup=builder.as_markup()
+        f"<b>{direction.name}</b>\n\nВыберите профессию:",
+        reply_markup=professions_markup(user_data.get('professions_version'), direction_index, direction, 0)
     )
     await callback.answer()
 
+
+@router.callback_query(page_filter(DIRECTIONS_PAGES, PROFESSIONS_PAGES))
+async def professions_pagination_handler(callback: types.CallbackQuery, state: FSMContext, professions_manager: ProfessionsGSheet):
+    """Листание списков направлений и профессий."""
+    view, page = parse_page_callback(callback.data)
+    user_data = await state.get_data()
+    version = user_data.get('professions_version')
+
+    if view == DIRECTIONS_PAGES.view:
+        index = directions_index(professions_manager, version)
+        markup = directions_markup(version, index, page) if index else None
+    else:
+        direction = resolve_direction(user_data, professions_manager)
+        markup = professions_markup(
+            version, user_data.get('direction_index'), direction, page
+        ) if direction is not None else None
+
+    if markup is None:
+        await callback.answer(CATALOG_EXPIRED_TEXT, show_alert=True)
+        return
+    await callback.message.edit_reply_markup(reply_markup=markup)
+    await callback.answer()
+
 @router.callback_query(
     F.data.startswith("explore_prof_"),
     ProfessionsExplorer.choosing_profession, 
     ProfessionsExplorer.viewing_profession   
 )
-async def show_profession_card_handler(callback: types.CallbackQuery, state: FSMContext):
+async def show_profession_card_handler(callback: types.CallbackQuery, state: FSMContext, professions_manager: ProfessionsGSheet):
     prof_index = int(callback.data.replace("explore_prof_", ""))
     user_data = await state.get_data()
-    filtered_professions = user_data.get('filtered_professions', [])
+    direction = resolve_direction(user_data, professions_manager)
+    filtered_professions = direction.professions if direction else None
     if not filtered_professions or prof_index >= len(filtered_professions):
         await callback.answer("Произошла ошибка, попробуйте заново.", show_alert=True)
         return
         
     profession = filtered_professions[prof_index]
     
-    card_text = f"<b>{profession.get('Название профессии')}</b>\n\n"
-    for field in PRIMARY_FIELDS:
-        if value := profession.get(field):
-            card_text += f"<b>{field}:</b> {value}\n"
+    card_text = profession_card(profession, PRIMARY_FIELDS)
             
     builder = InlineKeyboardBuilder()
     builder.row(types.InlineKeyboardButton(
@@ -95,9 +139,7 @@ async def show_profession_card_handler(callback: types.CallbackQuery, state: FSM
         callback_data=f"explore_full_{prof_index}"
     ))
     
-    all_directions = user_data.get('all_directions', [])
-    direction_name = profession.get('Направление')
-    direction_index = all_directions.index(direction_name) if direction_name in all_directions else -1
+    direction_index = user_data.get('direction_index', -1)
 
     builder.row(types.InlineKeyboardButton(
         text="⬅️ Назад к профессиям", 
@@ -108,21 +150,18 @@ async def show_profession_card_handler(callback: types.CallbackQuery, state: FSM
     await callback.answer()
 
 @router.callback_query(ProfessionsExplorer.viewing_profession, F.data.startswith("explore_full_"))
-async def show_full_profession_card_handler(callback: types.CallbackQuery, state: FSMContext):
+async def show_full_profession_card_handler(callback: types.CallbackQuery, state: FSMContext, professions_manager: ProfessionsGSheet):
     prof_index = int(callback.data.replace("explore_full_", ""))
     user_data = await state.get_data()
-    filtered_professions = user_data.get('filtered_professions', [])
+    direction = resolve_direction(user_data, professions_manager)
+    filtered_professions = direction.professions if direction else None
     if not filtered_professions or prof_index >= len(filtered_professions):
         await callback.answer("Произошла ошибка, попробуйте заново.", show_alert=True)
         return
 
     profession = filtered_professions[prof_index]
 
-    card_text = f"<b>{profession.get('Название профессии')}</b>\n\n"
-    all_fields = PRIMARY_FIELDS + ADDITIONAL_FIELDS
-    for field in all_fields:
-        if value := profession.get(field):
-            card_text += f"<b>{field}:</b> {value}\n\n"
+    card_text = profession_card(profession, PRIMARY_FIELDS + ADDITIONAL_FIELDS, separator="\n\n")
 
     builder = InlineKeyboardBuilder()
     builder.row(types.InlineKeyboardButton(
@@ -139,24 +178,18 @@ async def show_full_profession_card_handler(callback: types.CallbackQuery, state
 @router.callback_query(F.data == "back_to_directions_list")
 async def back_to_directions_list_handler(callback: types.CallbackQuery, state: FSMContext, professions_manager: ProfessionsGSheet):
     await state.clear()
-    all_professions = professions_manager.get_all_professions()
+    catalog = await professions_manager.get_all_professions_catalog()
+    index = directions_index(professions_manager, catalog.version) if catalog else None
+    if index is None:
+        await callback.answer(CATALOG_EXPIRED_TEXT, show_alert=True)
+        return
 
-    all_directions = sorted(list(set(p.get('Направление') for p in all_professions if p.get('Направление'))))
-    await state.update_data(all_professions=all_professions, all_directions=all_directions) 
-    
-    builder = InlineKeyboardBuilder()
-    for index, direction in enumerate(all_directions):
-        builder.row(types.InlineKeyboardButton(
-            text=direction,
-            callback_data=f"explore_dir_{index}"
-        ))
-    
-    builder.row(types.InlineKeyboardButton(text="🏠 Главное меню", callback_data="back_to_main_menu"))
+    await state.update_data(professions_version=catalog.version) 
 
     await state.set_state(ProfessionsExplorer.choosing_direction)
     await callback.message.edit_text(
         "Выберите интересующее вас направление:",
-        reply_markup=builder.as_markup()
+        reply_markup=directions_markup(catalog.version, index, 0)
     )
     await callback.answer()
 
@@ -5,7 +5,7 @@ from aiogram.fsm.context import FSMContext
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 # --- 1. ИСПРАВЛЕННЫЕ ИМПОРТЫ ---
-from app.utils.google_sheets import RegistrationGSheet 
+from app.utils.google_sheets import RegistrationGSheet, ProfileBundle, UPDATE_QUEUED
 from app.states.registration import ProfileEditing, GeneralRegistration, ParentRegistration, StudentRegistration
 from app.keyboards.inline import (
     get_profile_keyboard, get_edit_profile_choices_keyboard,
@@ -34,12 +34,12 @@ async def profile_handler(message: types.Message, state: FSMContext, lexicon: di
     # --- Конец логики ---
     
     lang = user_fsm_data.get('language', 'ru') # Используем уже сохраненный lang
-    user_data = registration_manager.get_user_by_id(message.from_user.id)
+    profile = await registration_manager.load_profile_bundle(message.from_user.id)
 
-    if user_data:
+    if profile:
         # Если профиль НАЙДЕН в Google-таблице
         await state.set_state(ProfileEditing.showing_profile)
-        await show_profile_screen(message, state, lexicon, lang, user_data, registration_manager)
+        await show_profile_screen(message, state, lexicon, lang, profile)
     else:
         # --- (Если профиль НЕ найден) ---
         
@@ -89,7 +89,7 @@ async def my_children_handler(message: types.Message, state: FSMContext, lexicon
     lang = user_fsm_data.get('language', 'ru')
     
     # 1. Проверяем, зарегистрирован ли родитель
-    user_data = registration_manager.get_user_by_id(message.from_user.id)
+    user_data = await registration_manager.get_user_by_id(message.from_user.id)
     if not (user_data and user_data.get('role') == 'parent'):
 
         role = user_fsm_data.get('role')
@@ -113,7 +113,7 @@ async def my_children_handler(message: types.Message, state: FSMContext, lexicon
     await state.set_state(ProfileEditing.managing_children)
     
     # --- Эта логика скопирована из `show_children_list` и адаптирована ---
-    children = registration_manager.get_children_by_parent_id(message.from_user.id)
+    children = await registration_manager.get_children_by_parent_id(message.from_user.id)
     
     if children:
         # Отправляем НОВОЕ сообщение
@@ -146,8 +146,7 @@ async def show_profile_screen(
     state: FSMContext, 
     lexicon: dict, 
     lang: str, 
-    user_data: dict, 
-    registration_manager: RegistrationGSheet
+    profile: ProfileBundle
 ):
 
     target_message = message if isinstance(message, types.Message) else message.message
@@ -171,27 +170,28 @@ async def show_profile_screen(
             await bot.send_message(target_message.chat.id, text, reply_markup=reply_markup, parse_mode=parse_mode)
 
             
-    user_role = user_data.get('role')
+    user = profile.user
+    user_role = profile.role
 
     if user_role == 'parent':
         text = lexicon[lang]['profile-parent-display'].format(
-            first_name=user_data.get('Имя'),
-            last_name=user_data.get('Фамилия'),
-            phone=user_data.get('Номер телефона'),
-            email=user_data.get('Email') or "Не указан"
+            first_name=user.first_name,
+            last_name=user.last_name,
+            phone=user.phone,
+            email=user.email or "Не указан"
         )
         keyboard = get_profile_keyboard(lexicon, lang, is_parent=True)
         await send_or_edit(text, reply_markup=keyboard, parse_mode="Markdown")
     
     elif user_role == 'student':
-        parent_contact = registration_manager.get_student_parent_contact(user_data.get('Telegram ID'))
-        age = calculate_age(user_data.get('Дата рождения'))
+        parent_contact = profile.parent_contact
+        age = calculate_age(user.birth_date)
         text = lexicon[lang]['profile-student-display'].format(
-            first_name=user_data.get('Имя'),
-            last_name=user_data.get('Фамилия'),
-            dob=user_data.get('Дата рождения'), age=age or 'N/A', 
-            phone=user_data.get('Телефон') or "Не указан",
-            city=user_data.get('Город'), 
+            first_name=user.first_name,
+            last_name=user.last_name,
+            dob=user.birth_date, age=age or 'N/A', 
+            phone=user.phone or "Не указан",
+            city=user.city, 
             parent_contact=parent_contact or "Не указан"
         )
         keyboard = get_profile_keyboard(lexicon, lang, is_parent=False)
@@ -202,7 +202,7 @@ async def show_profile_screen(
 
 async def show_children_list(callback: types.CallbackQuery, state: FSMContext, lexicon: dict, lang: str, registration_manager: RegistrationGSheet):
 
-    children = registration_manager.get_children_by_parent_id(callback.from_user.id)
+    children = await registration_manager.get_children_by_parent_id(callback.from_user.id)
     
     if children:
         await callback.message.edit_text(
@@ -240,18 +240,17 @@ async def view_child_details_handler(callback: types.CallbackQuery, state: FSMCo
         child_index = int(callback.data.split("_")[2])
         lang = (await state.get_data()).get('language', 'ru')
         
-        children = registration_manager.get_children_by_parent_id(callback.from_user.id)
+        children = await registration_manager.get_children_by_parent_id(callback.from_user.id)
         child = children[child_index]
 
         if child:
-            age = calculate_age(child.get('Дата рождения'))
-            child_name = f"{child.get('Имя ребенка', '')} {child.get('Фамилия ребенка', '')}".strip()
+            age = calculate_age(child.birth_date)
             
             text = lexicon[lang]['child-details-display'].format(
-                first_name=child.get('Имя ребенка', ''), 
-                last_name=child.get('Фамилия ребенка', ''),
-                dob=child.get('Дата рождения', 'не указана'), age=age or 'N/A', 
-                city=child.get('Город', 'не указан'), interests=child.get('Интересы', 'не указаны'), 
+                first_name=child.first_name, 
+                last_name=child.last_name,
+                dob=child.birth_date or 'не указана', age=age or 'N/A', 
+                city=child.city or 'не указан', interests=child.interests or 'не указаны', 
                 courses="Пока не записан на курсы"
             )
             await state.set_state(ProfileEditing.viewing_child_details)
@@ -282,7 +281,7 @@ async def add_child_from_profile_handler(callback: types.CallbackQuery, state: F
 @router.callback_query(ProfileEditing.showing_profile, F.data == "edit_profile_action")
 async def edit_profile_action_handler(callback: types.CallbackQuery, state: FSMContext, lexicon: dict, registration_manager: RegistrationGSheet):
     lang = (await state.get_data()).get('language', 'ru')
-    user_data = registration_manager.get_user_by_id(callback.from_user.id)
+    user_data = await registration_manager.get_user_by_id(callback.from_user.id)
     is_parent = user_data and user_data.get('role') == 'parent'
 
     await state.set_state(ProfileEditing.choosing_field_to_edit)
@@ -329,17 +328,19 @@ async def save_edited_field_handler(message: types.Message, state: FSMContext, l
     
     await message.delete()
 
-    success = registration_manager.update_user_data(
+    success = await registration_manager.update_user_data(
         user_id=message.from_user.id,
         field_name=field_to_edit,
         new_value=new_value
     )
     
-    updated_user_data = registration_manager.get_user_by_id(message.from_user.id)
+    profile = await registration_manager.load_profile_bundle(message.from_user.id)
 
-    if success and updated_user_data:
-        # Передаем registration_manager дальше
-        await show_profile_screen(message, state, lexicon, lang, updated_user_data, registration_manager)
+    if success and profile:
+        if success == UPDATE_QUEUED:
+            # Таблица сейчас недоступна: правка внесена в очередь и запишется вместе с анкетой
+            await message.answer("Изменения сохранены и появятся в таблице, как только она станет доступна.")
+        await show_profile_screen(message, state, lexicon, lang, profile)
     else:
         await message.answer("Не удалось обновить профиль. Попробуйте снова.")
 
@@ -348,11 +349,10 @@ async def save_edited_field_handler(message: types.Message, state: FSMContext, l
 @router.callback_query(F.data == "back_to_profile_view")
 async def back_to_profile_view_handler(callback: types.CallbackQuery, state: FSMContext, lexicon: dict, registration_manager: RegistrationGSheet):
     lang = (await state.get_data()).get('language', 'ru')
-    user_data = registration_manager.get_user_by_id(callback.from_user.id)
-    if user_data:
+    profile = await registration_manager.load_profile_bundle(callback.from_user.id)
+    if profile:
         await state.set_state(ProfileEditing.showing_profile)
-        # Передаем registration_manager дальше
-        await show_profile_screen(callback, state, lexicon, lang, user_data, registration_manager)
+        await show_profile_screen(callback, state, lexicon, lang, profile)
     await callback.answer()
 
 @router.callback_query(ProfileEditing.showing_profile, F.data == "my_courses_action")
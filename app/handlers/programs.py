@@ -7,12 +7,35 @@ from app.utils.google_sheets import CoursesGSheet
 from app.keyboards.inline import (
     get_course_categories_keyboard,
     get_course_subcategories_keyboard,
-    get_specific_courses_keyboard,
     get_course_card_keyboard
 )
+from app.keyboards.pagination import PagedView, page_filter, parse_page_callback
 
 router = Router()
 
+# В сессии хранятся фильтры и версия каталога курсов, а не сам список курсов
+CATALOG_EXPIRED_TEXT = "Список курсов обновился. Пожалуйста, выберите направление заново."
+
+
+# Постраничный список курсов подкатегории (кнопки "course_<позиция>")
+COURSES_PAGES = PagedView("course", back_callback="back_to_subcategories", per_page=8)
+
+
+def filter_specific_courses(all_courses: list, category: str, subcategory: str, lang: str) -> list:
+    return [
+        c for c in all_courses 
+        if c.category == category 
+        and c.subcategory == subcategory
+        and c.language == lang
+    ]
+
+
+def specific_courses_markup(user_data: dict, specific_courses: list, lexicon: dict, lang: str, page: int = 0):
+    """Страница списка курсов подкатегории; список страниц строится один раз на версию каталога и фильтры."""
+    key = (user_data.get('courses_version'), user_data.get('selected_category'), user_data.get('selected_subcategory'), lang)
+    return COURSES_PAGES.markup(lambda: [course.name for course in specific_courses], page, lexicon, lang, key=key)
+
+
 # --- ШАГ 1: ВЫБОР КАТЕГОРИИ (Программирование, Математика) ---
 
 @router.message(F.text.in_({"📚 Программы обучения", "📚 O'quv dasturlari"}))
@@ -27,12 +50,12 @@ async def programs_start_handler(message: types.Message, state: FSMContext, lexi
             pass 
     lang = (await state.get_data()).get('language', 'ru')
     
-    all_courses = courses_manager.get_courses()
+    all_courses = await courses_manager.get_courses()
     if not all_courses:
         await message.answer("К сожалению, список курсов сейчас недоступен.")
         return
 
-    categories = sorted(list(set(c['Категория'] for c in all_courses if c.get('Категория'))))
+    categories = sorted(list(set(c.category for c in all_courses if c.category)))
     
     await state.set_state(Programs.choosing_direction)
     await message.answer(
@@ -47,31 +70,26 @@ async def category_selected_handler(callback: types.CallbackQuery, state: FSMCon
     lang = (await state.get_data()).get('language', 'ru')
     selected_category = callback.data.split('_', 1)[1]
     
-    await state.update_data(selected_category=selected_category)
-    all_courses = courses_manager.get_courses()
+    catalog = await courses_manager.get_catalog(courses_manager.worksheet_name)
+    all_courses = (courses_manager.courses(catalog.version) or []) if catalog else []
+    await state.update_data(selected_category=selected_category, courses_version=catalog.version if catalog else None)
     
     subcategories = sorted(list(set(
-        c['Подкатегория'] for c in all_courses 
-        if c.get('Категория') == selected_category and c.get('Подкатегория')
+        c.subcategory for c in all_courses 
+        if c.category == selected_category and c.subcategory
     )))
 
     if len(subcategories) == 1:
         selected_subcategory = subcategories[0]
         await state.update_data(selected_subcategory=selected_subcategory)
 
-        specific_courses = [
-            c for c in all_courses 
-            if c.get('Категория') == selected_category 
-            and c.get('Подкатегория') == selected_subcategory
-            and c.get('language') == lang
-        ]
+        specific_courses = filter_specific_courses(all_courses, selected_category, selected_subcategory, lang)
         
-        await state.update_data(specific_courses_list=specific_courses)
         await state.set_state(Programs.choosing_course)
         
         await callback.message.edit_text(
             f"Вы выбрали: {selected_category}\nДоступные курсы:",
-            reply_markup=get_specific_courses_keyboard(specific_courses, lexicon, lang)
+            reply_markup=specific_courses_markup(await state.get_data(), specific_courses, lexicon, lang)
         )
 
     else:
@@ -92,43 +110,62 @@ async def subcategory_selected_handler(callback: types.CallbackQuery, state: FSM
     user_data = await state.get_data()
     selected_category = user_data.get('selected_category')
 
-    await state.update_data(selected_subcategory=selected_subcategory)
-    all_courses = courses_manager.get_courses()
+    catalog = await courses_manager.get_catalog(courses_manager.worksheet_name)
+    all_courses = (courses_manager.courses(catalog.version) or []) if catalog else []
+    await state.update_data(selected_subcategory=selected_subcategory, courses_version=catalog.version if catalog else None)
 
-    specific_courses = [
-        c for c in all_courses 
-        if c.get('Категория') == selected_category 
-        and c.get('Подкатегория') == selected_subcategory
-        and c.get('language') == lang
-    ]
+    specific_courses = filter_specific_courses(all_courses, selected_category, selected_subcategory, lang)
     
-    await state.update_data(specific_courses_list=specific_courses)
     await state.set_state(Programs.choosing_course)
     await callback.message.edit_text(
         f"Вы выбрали: {selected_subcategory}\nДоступные курсы:",
-        reply_markup=get_specific_courses_keyboard(specific_courses, lexicon, lang)
+        reply_markup=specific_courses_markup(await state.get_data(), specific_courses, lexicon, lang)
+    )
+    await callback.answer()
+
+
+@router.callback_query(Programs.choosing_course, page_filter(COURSES_PAGES))
+async def courses_pagination_handler(callback: types.CallbackQuery, state: FSMContext, lexicon: dict, courses_manager: CoursesGSheet):
+    _, page = parse_page_callback(callback.data)
+    user_data = await state.get_data()
+    lang = user_data.get('language', 'ru')
+    all_courses = courses_manager.courses(user_data.get('courses_version'))
+    if all_courses is None:
+        await callback.answer(CATALOG_EXPIRED_TEXT, show_alert=True)
+        return
+    specific_courses = filter_specific_courses(
+        all_courses, user_data.get('selected_category'), user_data.get('selected_subcategory'), lang
+    )
+    await callback.message.edit_reply_markup(
+        reply_markup=specific_courses_markup(user_data, specific_courses, lexicon, lang, page)
     )
     await callback.answer()
 
 # --- ШАГ 4: ПОКАЗ КАРТОЧКИ КУРСА ---
 @router.callback_query(Programs.choosing_course, F.data.startswith("course_"))
-async def course_selected_handler(callback: types.CallbackQuery, state: FSMContext, lexicon: dict):
+async def course_selected_handler(callback: types.CallbackQuery, state: FSMContext, lexicon: dict, courses_manager: CoursesGSheet):
     lang = (await state.get_data()).get('language', 'ru')
     course_index = int(callback.data.split('_', 1)[1])
     user_data = await state.get_data()
-    specific_courses = user_data.get('specific_courses_list', [])
+    all_courses = courses_manager.courses(user_data.get('courses_version'))
+    specific_courses = filter_specific_courses(
+        all_courses or [], user_data.get('selected_category'), user_data.get('selected_subcategory'), lang
+    )
+    if course_index >= len(specific_courses):
+        await callback.answer(CATALOG_EXPIRED_TEXT, show_alert=True)
+        return
     target_course = specific_courses[course_index]
 
     await state.set_state(Programs.viewing_course)
     
     card_text = (
-        f"<b>{target_course.get('Название курса', 'Название не указано')}</b>\n\n"
-        f"{target_course.get('Описание', 'Описание скоро будет добавлено.')}\n\n"
-        f"<b>Длительность:</b> {target_course.get('Длительность')}\n"
-        f"<b>Цена:</b> {target_course.get('Цена')}"
+        f"<b>{target_course.name or 'Название не указано'}</b>\n\n"
+        f"{target_course.description or 'Описание скоро будет добавлено.'}\n\n"
+        f"<b>Длительность:</b> {target_course.duration}\n"
+        f"<b>Цена:</b> {target_course.price}"
     )
     
-    course_id = target_course.get('course_id', 'unknown') 
+    course_id = target_course.course_id or 'unknown' 
 
     await callback.message.edit_text(
         card_text,
@@ -140,8 +177,8 @@ async def course_selected_handler(callback: types.CallbackQuery, state: FSMConte
 @router.callback_query(F.data == "back_to_categories")
 async def back_to_categories_handler(callback: types.CallbackQuery, state: FSMContext, lexicon: dict, courses_manager: CoursesGSheet):
     lang = (await state.get_data()).get('language', 'ru')
-    all_courses = courses_manager.get_courses()
-    categories = sorted(list(set(c['Категория'] for c in all_courses if c.get('Категория'))))
+    all_courses = await courses_manager.get_courses()
+    categories = sorted(list(set(c.category for c in all_courses if c.category)))
     await state.set_state(Programs.choosing_direction)
     await callback.message.edit_text(
         "Выберите направление, которое вас интересует:",
@@ -155,10 +192,10 @@ async def back_to_subcategories_handler(callback: types.CallbackQuery, state: FS
     user_data = await state.get_data()
     selected_category = user_data.get('selected_category')
 
-    all_courses = courses_manager.get_courses()
+    all_courses = await courses_manager.get_courses()
     subcategories = sorted(list(set(
-        c['Подкатегория'] for c in all_courses 
-        if c.get('Категория') == selected_category and c.get('Подкатегория')
+        c.subcategory for c in all_courses 
+        if c.category == selected_category and c.subcategory
     )))
 
     if len(subcategories) <= 1:
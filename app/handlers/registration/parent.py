@@ -9,7 +9,7 @@ from aiogram_calendar import SimpleCalendar, SimpleCalendarCallback
 
 from app.utils.google_sheets import RegistrationGSheet
 from app.utils.helpers import calculate_age
-from app.utils.exode_api import find_user_by_phone, upsert_user
+from app.utils.exode_api import ExodeClient
 from app.keyboards.reply import get_share_phone_keyboard, get_parent_main_menu_keyboard
 from app.keyboards.inline import (
     get_skip_keyboard, get_profile_confirmation_keyboard, get_edit_profile_keyboard,
@@ -164,13 +164,13 @@ async def show_parent_confirmation_screen(message: types.Message | types.Callbac
 # --- ПОДТВЕРЖДЕНИЕ И СОХРАНЕНИЕ ПРОФИЛЯ РОДИТЕЛЯ ---
 
 @router.callback_query(ParentRegistration.confirming_profile, F.data == "confirm_profile")
-async def confirm_parent_profile_handler(callback: types.CallbackQuery, state: FSMContext, lexicon: dict, registration_manager: RegistrationGSheet):
+async def confirm_parent_profile_handler(callback: types.CallbackQuery, state: FSMContext, lexicon: dict, registration_manager: RegistrationGSheet, exode_client: ExodeClient):
     """Подтверждение и сохранение профиля родителя с созданием аккаунта в Exode."""
     await clear_history(callback.message.chat.id, state, callback.bot)
     await state.update_data(telegram_id=callback.from_user.id)
     user_data = await state.get_data()
     lang = user_data.get('language')
-    registration_manager.add_parent(user_data)
+    await registration_manager.add_parent(user_data)
     payload = {
         'tgId': callback.from_user.id,
         'profile': {
@@ -189,7 +189,7 @@ async def confirm_parent_profile_handler(callback: types.CallbackQuery, state: F
     if user_data.get('parent_email') and user_data.get('parent_email') != 'Пропущено':
         payload['email'] = user_data['parent_email']
 
-    exode_result = upsert_user(payload)
+    exode_result = await exode_client.upsert_user(payload)
     if not exode_result:
         print("Warning: Failed to create Exode account for parent")
 
@@ -301,7 +301,7 @@ async def process_existing_child_prompt(callback: types.CallbackQuery, state: FS
     await callback.answer()
 
 @router.message(ParentRegistration.entering_child_phone)
-async def process_child_phone_number(message: Message, state: FSMContext, lexicon: dict):
+async def process_child_phone_number(message: Message, state: FSMContext, lexicon: dict, exode_client: ExodeClient):
     """Шаг 3: Ищем ребенка по номеру телефона в Exode."""
     phone_number = message.text.strip()
 
@@ -310,7 +310,7 @@ async def process_child_phone_number(message: Message, state: FSMContext, lexico
     lang = (await state.get_data()).get('language')
     searching_msg = await message.answer(lexicon[lang]['searching-user'])
     await append_message_ids(state, message, searching_msg) 
-    child_data = find_user_by_phone(phone_number)
+    child_data = await exode_client.find_user_by_phone(phone_number)
     full_name = ""
     
     if child_data:
@@ -526,7 +526,7 @@ async def confirm_child_and_ask_consent_handler(callback: types.CallbackQuery, s
     
     user_data = await state.get_data()
     lang = user_data.get('language')
-    registration_manager.add_child(parent_id=callback.from_user.id, data=user_data)
+    await registration_manager.add_child(parent_id=callback.from_user.id, data=user_data)
     if user_data.get('exode_user_id'):       
         message_text = lexicon[lang]['child-profile-linked-success']
         await state.update_data(
@@ -551,7 +551,7 @@ async def confirm_child_and_ask_consent_handler(callback: types.CallbackQuery, s
     await callback.answer()
 
 @router.callback_query(ChildRegistration.confirming_exode_creation)
-async def finalize_child_registration_handler(callback: types.CallbackQuery, state: FSMContext, lexicon: dict):
+async def finalize_child_registration_handler(callback: types.CallbackQuery, state: FSMContext, lexicon: dict, exode_client: ExodeClient):
     """Обработчик согласия на создание аккаунта в Exode для ребенка."""
     await clear_history(callback.message.chat.id, state, callback.bot)
 
@@ -579,7 +579,7 @@ async def finalize_child_registration_handler(callback: types.CallbackQuery, sta
         else: 
             unique_id = str(uuid.uuid4())[:8]
             payload['email'] = f"child_{unique_id}@school.local"
-        new_exode_user = upsert_user(payload)
+        new_exode_user = await exode_client.upsert_user(payload)
         
         if new_exode_user and new_exode_user.get('user'):
             message_text = lexicon[lang]['child-profile-created-success']
@@ -5,7 +5,7 @@ from aiogram_calendar import SimpleCalendar, SimpleCalendarCallback
 from datetime import datetime
 import logging
 
-from app.utils.exode_api import find_user_by_phone, upsert_user
+from app.utils.exode_api import ExodeClient
 from app.utils.google_sheets import RegistrationGSheet, CoursesGSheet
 from app.states.registration import StudentRegistration, StemNavigator, Programs
 from app.keyboards.inline import (
@@ -91,12 +91,12 @@ async def handle_is_registered_answer(callback: types.CallbackQuery, state: FSMC
     await callback.answer()
 
 @router.message(StudentRegistration.entering_existing_phone)
-async def process_existing_phone(message: Message, state: FSMContext, lexicon: dict):
+async def process_existing_phone(message: Message, state: FSMContext, lexicon: dict, exode_client: ExodeClient):
     phone = message.text.strip()
     lang = (await state.get_data()).get('language', 'ru')
     searching_msg = await message.answer(lexicon[lang]['searching-user'])
     await append_message_ids(state, message, searching_msg)
-    exode_data = find_user_by_phone(phone)
+    exode_data = await exode_client.find_user_by_phone(phone)
     user_info, profile, full_name = None, None, ""
     if exode_data and exode_data.get('user'):
         user_info = exode_data['user']
@@ -349,7 +349,7 @@ async def show_student_confirmation_screen(message: types.Message, state: FSMCon
             pass
 
 @router.callback_query(StudentRegistration.confirming_profile, F.data == "student_confirm_profile")
-async def confirm_student_profile_handler(callback: types.CallbackQuery, state: FSMContext, lexicon: dict, registration_manager: RegistrationGSheet):
+async def confirm_student_profile_handler(callback: types.CallbackQuery, state: FSMContext, lexicon: dict, registration_manager: RegistrationGSheet, exode_client: ExodeClient):
     await clear_history(callback.message.chat.id, state, callback.bot)
     user_data = await state.get_data()
     lang = user_data.get('language', 'ru')
@@ -367,7 +367,7 @@ async def confirm_student_profile_handler(callback: types.CallbackQuery, state:
         'Роль': 'student'
     }
     
-    registration_manager.add_student(data_to_save)
+    await registration_manager.add_student(data_to_save)
     
     consent_text = lexicon[lang]['student-exode-consent-prompt']
     
@@ -377,7 +377,7 @@ async def confirm_student_profile_handler(callback: types.CallbackQuery, state:
             'tgId': callback.from_user.id
         }
         
-        result = upsert_user(payload)
+        result = await exode_client.upsert_user(payload)
         
         await state.set_state(StudentRegistration.choosing_goal)
         next_msg = await callback.message.answer(
@@ -398,7 +398,7 @@ async def confirm_student_profile_handler(callback: types.CallbackQuery, state:
     await callback.answer()
 
 @router.callback_query(StudentRegistration.confirming_exode_creation)
-async def handle_exode_creation_consent(callback: types.CallbackQuery, state: FSMContext, lexicon: dict):
+async def handle_exode_creation_consent(callback: types.CallbackQuery, state: FSMContext, lexicon: dict, exode_client: ExodeClient):
     await clear_history(callback.message.chat.id, state, callback.bot)
     
     user_data = await state.get_data()
@@ -422,7 +422,7 @@ async def handle_exode_creation_consent(callback: types.CallbackQuery, state: FS
             }
         }
         
-        result = upsert_user(payload)
+        result = await exode_client.upsert_user(payload)
         
         if result:
             success_msg = await callback.message.answer(
@@ -657,12 +657,12 @@ async def coming_soon_handler(callback: types.CallbackQuery, state: FSMContext,
 @router.callback_query(F.data == "find_subject_courses")
 async def find_subject_courses_handler(callback: types.CallbackQuery, state: FSMContext, lexicon: dict, courses_manager: CoursesGSheet):
     lang = (await state.get_data()).get('language', 'ru')
-    all_courses = courses_manager.get_courses()
+    all_courses = await courses_manager.get_courses()
     if not all_courses:
         await callback.answer("К сожалению, список курсов сейчас недоступен.", show_alert=True)
         return
 
-    categories = sorted(list(set(c['Категория'] for c in all_courses if c.get('Категория'))))
+    categories = sorted(list(set(c.category for c in all_courses if c.category)))
     
     await state.set_state(Programs.choosing_direction)
     await edit_and_save_message(
@@ -1,49 +1,96 @@
-import collections
+from typing import Optional
+
 from aiogram import Router, F, types
 from aiogram.fsm.context import FSMContext
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
+from app.keyboards.cache import cached_keyboard
+from app.keyboards.pagination import PagedView, page_filter, parse_page_callback
 from app.states.registration import StemNavigator
 from app.utils.google_sheets import ProfessionsGSheet
-from app.utils.test_content import QUESTIONS, SCORING_KEY, SCALES_INFO
+from app.utils.profession_index import Direction, DirectionsIndex
+from app.utils.records import Profession
+from app.utils.test_content import QUESTIONS, SCALES_INFO
+from app.utils.test_log import AnswerLog, pack_answer
+from app.utils.test_scoring import score_answers, top_scales
 
 router = Router()
 
-# ---  СПИСКИ ПОЛЕЙ  ---
+# ---  СПИСКИ ПОЛЕЙ (поля Profession, подписи — заголовки колонок)  ---
 PRIMARY_FIELDS = [
-    "О чём профессия?",
-    "Чем занимаются?",
-    "Какими качествами нужно обладать",
-    "Где учиться",
-    "Факультеты"
+    "about",
+    "duties",
+    "qualities",
+    "where_to_study",
+    "faculties"
 ]
 ADDITIONAL_FIELDS = [
-    "Живые примеры",
-    "Где можно работать",
-    "Сколько зарабатывают",
-    "Перспективы",
-    "Смежные профессии",
-    "Карьерный рост",
-    "Рабочая обстановка",
-    "Трудности",
-    "Знаменитые представители профессии"
+    "examples",
+    "workplaces",
+    "salary",
+    "prospects",
+    "related",
+    "career",
+    "environment",
+    "difficulties",
+    "famous"
 ]
 
 
 # --- ХЕЛПЕРЫ ---
 
+# В сессии хранится шкала, версия ее листа и индекс направления — не сами профессии
+CATALOG_EXPIRED_TEXT = "Список профессий обновился, пожалуйста, вернитесь назад."
+
+# Постраничные списки направлений шкалы и профессий направления
+SCALE_DIRECTIONS_PAGES = PagedView(
+    "view_profs", back_callback="back_to_results", per_page=8, back_text="⬅️ Назад к результатам"
+)
+SCALE_PROFESSIONS_PAGES = PagedView(
+    "show_prof", back_callback="back_to_results", per_page=8, back_text="⬅️ Назад к направлениям"
+)
+
+
+def profession_card(profession: Profession, field_names: list, separator: str = "\n") -> str:
+    """Карточка профессии: название и непустые поля из списка с подписями-заголовками."""
+    card_text = f"<b>{profession.name}</b>\n\n"
+    for field_name in field_names:
+        if value := getattr(profession, field_name):
+            card_text += f"<b>{Profession.header(field_name)}:</b> {value}{separator}"
+    return card_text
+
+
+def scale_directions_markup(scale_key: str, version, index: DirectionsIndex, page: int):
+    """Страница списка направлений шкалы (кнопки "view_profs_<позиция>")."""
+    return SCALE_DIRECTIONS_PAGES.markup(index.direction_names, page, key=(scale_key, version))
+
+
+def scale_professions_markup(user_data: dict, direction_index: int, direction: Direction, page: int):
+    """Страница списка профессий направления (кнопки "show_prof_<позиция>")."""
+    scale_key = user_data.get('current_scale_key')
+    return SCALE_PROFESSIONS_PAGES.markup(
+        direction.profession_names, page,
+        key=(scale_key, user_data.get('current_scale_version'), direction_index),
+        back_callback=f"view_directions_{scale_key}"
+    )
+
+
+def resolve_scale_direction(user_data: dict, professions_manager: ProfessionsGSheet, direction_index: int = None) -> Optional[Direction]:
+    """Направление шкалы из сессии (None, если версия каталога вытеснена или номера нет)."""
+    index = professions_manager.directions_index(
+        user_data.get('current_scale_key'), user_data.get('current_scale_version')
+    )
+    if direction_index is None:
+        direction_index = user_data.get('current_direction_index')
+    return index.direction(direction_index) if index else None
+
+
 def calculate_results(answers: list[str]) -> list[tuple[str, int]]:
     """Подсчитывает результаты теста."""
-    scores = collections.defaultdict(int)
-    for answer in answers:
-        for scale, keys in SCORING_KEY.items():
-            if answer in keys:
-                scores[scale] += 1
-    
-    sorted_scores = sorted(scores.items(), key=lambda item: item[1], reverse=True)
-    return sorted_scores[:3]
+    return top_scales(score_answers(answers))
 
 
+@cached_keyboard
 def get_about_test_keyboard(lexicon: dict, lang: str):
     """Возвращает клавиатуру для экрана 'О тесте'."""
     kb_lang = lexicon.get(lang, {})
@@ -59,6 +106,16 @@ def get_about_test_keyboard(lexicon: dict, lang: str):
     return builder.as_markup()
 
 
+@cached_keyboard(warm=[(index,) for index in range(len(QUESTIONS))])
+def get_question_keyboard(question_index: int):
+    """Варианты ответа на вопрос теста (по одному в строке)."""
+    builder = InlineKeyboardBuilder()
+    for answer in QUESTIONS[question_index]["answers"]:
+        builder.add(types.InlineKeyboardButton(text=answer["text"], callback_data=answer["data"]))
+    builder.adjust(1)
+    return builder.as_markup()
+
+
 async def show_test_results(callback: types.CallbackQuery, state: FSMContext, lexicon: dict):
     user_data = await state.get_data()
     lang = (await state.get_data()).get('language', 'ru')
@@ -111,44 +168,55 @@ async def show_test_results(callback: types.CallbackQuery, state: FSMContext, le
 # --- ОБРАБОТЧИКИ ТЕСТА ---
 
 @router.callback_query(F.data == "begin_stem_test")
-async def start_test_handler(callback: types.CallbackQuery, state: FSMContext):
+async def start_test_handler(callback: types.CallbackQuery, state: FSMContext, test_log: AnswerLog):
     """Начинает тест (вопрос 1)."""
     try:
         await callback.message.delete()
     except Exception:
         pass
 
+    # Ответы пишутся в журнал, в состоянии — только номер попытки и вопроса
+    session = await test_log.start_session(callback.from_user.id)
     await state.set_state(StemNavigator.taking_test)
-    await state.update_data(question_index=0, answers=[], test_results=None)
+    await state.update_data(question_index=0, test_session=session, answers=None, test_results=None)
     
-    question = QUESTIONS[0]
-    builder = InlineKeyboardBuilder()
-    for answer in question["answers"]:
-        builder.add(types.InlineKeyboardButton(text=answer["text"], callback_data=answer["data"]))
-    builder.adjust(1)
-
-    await callback.message.answer(question["text"], reply_markup=builder.as_markup())
+    await callback.message.answer(QUESTIONS[0]["text"], reply_markup=get_question_keyboard(0))
     await callback.answer()
 
-@router.callback_query(StemNavigator.taking_test)
-async def answer_handler(callback: types.CallbackQuery, state: FSMContext, lexicon: dict):
+@router.callback_query(StemNavigator.taking_test, F.data.func(lambda data: pack_answer(data) is not None))
+async def answer_handler(callback: types.CallbackQuery, state: FSMContext, lexicon: dict, test_log: AnswerLog):
     """Обрабатывает ответ на вопрос и показывает следующий или результат."""
     user_data = await state.get_data()
-    answers = user_data.get("answers", [])
-    answers.append(callback.data)
+    question_index = user_data.get("question_index", 0)
+    # Ответ на уже пройденный вопрос (повторное нажатие, старое сообщение) не засчитывается
+    if pack_answer(callback.data) >> 3 != question_index + 1:
+        await callback.answer()
+        return
+
+    session = user_data.get("test_session")
+    answers = user_data.get("answers") or []
+    if session is not None:
+        # Журнал принимает один ответ на вопрос: параллельное второе нажатие сюда не пройдет
+        if not await test_log.append(session, callback.data):
+            await callback.answer()
+            return
+    else:
+        # Тест начат до перехода на журнал ответов — ответы остаются в состоянии
+        answers.append(callback.data)
     
-    question_index = user_data.get("question_index", 0) + 1
-    await state.update_data(question_index=question_index, answers=answers)
+    question_index += 1
+    await state.update_data(question_index=question_index, answers=answers or None)
     
     if question_index < len(QUESTIONS):
-        question = QUESTIONS[question_index]
-        builder = InlineKeyboardBuilder()
-        for answer in question["answers"]:
-            builder.add(types.InlineKeyboardButton(text=answer["text"], callback_data=answer["data"]))
-        builder.adjust(1)
-        await callback.message.edit_text(question["text"], reply_markup=builder.as_markup())
+        await callback.message.edit_text(
+            QUESTIONS[question_index]["text"], reply_markup=get_question_keyboard(question_index)
+        )
     else:
         await callback.message.edit_text("⏳ Спасибо за ответы! Подсчитываю результаты...")
+        if session is not None:
+            answers = await test_log.session_answers(session)
+        if answers:
+            await state.update_data(test_results=calculate_results(answers))
         await show_test_results(callback, state, lexicon)
 
     await callback.answer()
@@ -161,29 +229,21 @@ async def view_directions_handler(callback: types.CallbackQuery, state: FSMConte
     """Показывает 'Направления' (e.g. 'Медицинское') для выбранной шкалы (e.g. 'human')."""
     scale_key = callback.data.replace("view_directions_", "")
 
-    professions = professions_manager.get_professions_by_scale(scale_key)
+    catalog = await professions_manager.get_catalog(scale_key)
+    index = professions_manager.directions_index(scale_key, catalog.version) if catalog else None
     
-    if not professions:
+    if not index or not index.directions:
         await callback.answer("Профессии для этого направления скоро будут добавлены.", show_alert=True)
         return
 
-    directions = sorted(list(set(prof.get('Направление') for prof in professions if prof.get('Направление'))))
-
     await state.update_data(
         current_scale_key=scale_key,
-        current_directions=directions,
-        current_scale_professions=professions 
+        current_scale_version=catalog.version
     )
     
-    builder = InlineKeyboardBuilder()
-    for index, direction in enumerate(directions):
-        builder.row(types.InlineKeyboardButton(text=direction, callback_data=f"view_profs_{index}"))
-    
-    builder.row(types.InlineKeyboardButton(text="⬅️ Назад к результатам", callback_data="back_to_results"))
-    
     await callback.message.edit_text(
         f"<b>{SCALES_INFO[scale_key]['title']}</b>\n\nВыберите направление:",
-        reply_markup=builder.as_markup()
+        reply_markup=scale_directions_markup(scale_key, catalog.version, index, 0)
     )
     await callback.answer()
 
@@ -194,59 +254,67 @@ async def view_professions_handler(callback: types.CallbackQuery, state: FSMCont
     direction_index = int(callback.data.replace("view_profs_", ""))
 
     user_data = await state.get_data()
-    directions = user_data.get('current_directions', [])
-    direction = directions[direction_index]
-    
-    all_professions_in_scale = user_data.get('current_scale_professions', [])
     scale_key = user_data.get('current_scale_key')
+    direction = resolve_scale_direction(user_data, professions_manager, direction_index)
+    if direction is None:
+        await callback.answer(CATALOG_EXPIRED_TEXT, show_alert=True)
+        return
     
-    filtered_professions = [prof for prof in all_professions_in_scale if prof.get('Направление') == direction]
-    
-    await state.update_data(current_filtered_professions=filtered_professions)
+    await state.update_data(current_direction_index=direction_index)
 
-    builder = InlineKeyboardBuilder()
-    for index, prof in enumerate(filtered_professions):
-        builder.row(types.InlineKeyboardButton(
-            text=prof.get('Название профессии'),
-            callback_data=f"show_prof_{index}" 
-        ))
-    
-    builder.row(types.InlineKeyboardButton(text="⬅️ Назад к направлениям", callback_data=f"view_directions_{scale_key}"))
-    
     await callback.message.edit_text(
-        f"<b>{direction}</b>\n\nВыберите профессию:",
-        reply_markup=builder.as_markup()
+        f"<b>{direction.name}</b>\n\nВыберите профессию:",
+        reply_markup=scale_professions_markup(user_data, direction_index, direction, 0)
     )
     await callback.answer()
 
+
+@router.callback_query(StemNavigator.viewing_results, page_filter(SCALE_DIRECTIONS_PAGES, SCALE_PROFESSIONS_PAGES))
+async def scale_pagination_handler(callback: types.CallbackQuery, state: FSMContext, professions_manager: ProfessionsGSheet):
+    """Листание списков направлений и профессий шкалы."""
+    view, page = parse_page_callback(callback.data)
+    user_data = await state.get_data()
+
+    if view == SCALE_DIRECTIONS_PAGES.view:
+        scale_key, version = user_data.get('current_scale_key'), user_data.get('current_scale_version')
+        index = professions_manager.directions_index(scale_key, version)
+        markup = scale_directions_markup(scale_key, version, index, page) if index else None
+    else:
+        direction = resolve_scale_direction(user_data, professions_manager)
+        markup = scale_professions_markup(
+            user_data, user_data.get('current_direction_index'), direction, page
+        ) if direction is not None else None
+
+    if markup is None:
+        await callback.answer(CATALOG_EXPIRED_TEXT, show_alert=True)
+        return
+    await callback.message.edit_reply_markup(reply_markup=markup)
+    await callback.answer()
+
 @router.callback_query(
     F.data.startswith("show_prof_"),
     StemNavigator.viewing_results 
 )
-async def show_profession_card_handler(callback: types.CallbackQuery, state: FSMContext):
+async def show_profession_card_handler(callback: types.CallbackQuery, state: FSMContext, lexicon: dict, professions_manager: ProfessionsGSheet):
     """Показывает КОРОТКУЮ карточку профессии."""
     prof_index = int(callback.data.replace("show_prof_", ""))
 
     user_data = await state.get_data()
 
-    filtered_professions = user_data.get('current_filtered_professions', [])
+    direction = resolve_scale_direction(user_data, professions_manager)
+    filtered_professions = direction.professions if direction else None
 
     if not filtered_professions or prof_index >= len(filtered_professions):
         await callback.answer("Произошла ошибка, пожалуйста, вернитесь назад.", show_alert=True)
 
-        await show_test_results(callback, state, lexicon=await state.get_data().get('lexicon', {}))
+        await show_test_results(callback, state, lexicon)
         return
         
     profession = filtered_professions[prof_index]
     
-    direction = profession.get('Направление')
-    directions = user_data.get('current_directions', [])
-    direction_index = directions.index(direction) if direction in directions else 0
-
-    card_text = f"<b>{profession.get('Название профессии')}</b>\n\n"
-    for field in PRIMARY_FIELDS:
-        if value := profession.get(field):
-            card_text += f"<b>{field}:</b> {value}\n"
+    direction_index = user_data.get('current_direction_index', 0)
+
+    card_text = profession_card(profession, PRIMARY_FIELDS)
             
     builder = InlineKeyboardBuilder()
     builder.row(types.InlineKeyboardButton(
@@ -264,30 +332,25 @@ async def show_profession_card_handler(callback: types.CallbackQuery, state: FSM
 
 
 @router.callback_query(StemNavigator.viewing_results, F.data.startswith("show_full_"))
-async def show_full_profession_card_handler(callback: types.CallbackQuery, state: FSMContext):
+async def show_full_profession_card_handler(callback: types.CallbackQuery, state: FSMContext, lexicon: dict, professions_manager: ProfessionsGSheet):
     """Показывает ПОЛНУЮ карточку профессии."""
     prof_index = int(callback.data.replace("show_full_", ""))
     
     user_data = await state.get_data()
-    filtered_professions = user_data.get('current_filtered_professions', [])
+    direction = resolve_scale_direction(user_data, professions_manager)
+    filtered_professions = direction.professions if direction else None
 
     if not filtered_professions or prof_index >= len(filtered_professions):
         await callback.answer("Произошла ошибка, пожалуйста, вернитесь назад.", show_alert=True)
 
-        await show_test_results(callback, state, lexicon=await state.get_data().get('lexicon', {}))
+        await show_test_results(callback, state, lexicon)
         return
         
     profession = filtered_professions[prof_index]
 
-    direction = profession.get('Направление')
-    directions = user_data.get('current_directions', [])
-    direction_index = directions.index(direction) if direction in directions else 0
+    direction_index = user_data.get('current_direction_index', 0)
 
-    card_text = f"<b>{profession.get('Название профессии')}</b>\n\n"
-    all_fields = PRIMARY_FIELDS + ADDITIONAL_FIELDS
-    for field in all_fields:
-        if value := profession.get(field):
-            card_text += f"<b>{field}:</b> {value}\n\n"
+    card_text = profession_card(profession, PRIMARY_FIELDS + ADDITIONAL_FIELDS, separator="\n\n")
 
     builder = InlineKeyboardBuilder()
     builder.row(types.InlineKeyboardButton(
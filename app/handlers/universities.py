@@ -2,24 +2,88 @@ from aiogram import Router, F, types, Dispatcher
 from aiogram.fsm.context import FSMContext
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
+from app.keyboards.cache import cached_keyboard
+from app.keyboards.pagination import PagedView, page_filter, parse_page_callback
 from app.states.registration import Universities 
 from app.utils.google_sheets import UniversitiesGSheet
+from app.utils.records import Program
 from app.utils.locations import CITIES_RU 
 from app.core.config import PRIVATE_UNIVERSITIES_SHEET_ID, FOREIGN_UNIVERSITIES_SHEET_ID
 
 router = Router()
-ITEMS_PER_PAGE = 5 
 
-# Поля для карточки программы
+# Постраничные списки: кнопки "uni_<позиция>", "faculty_<позиция>", "program_<позиция>"
+UNIVERSITIES_PAGES = PagedView("uni", back_callback="back_to_uni_type")
+FACULTIES_PAGES = PagedView("faculty", back_callback="back_to_universities")
+PROGRAMS_PAGES = PagedView("program", back_callback="back_to_faculties")
+
+# Поля для карточки программы (поля Program, подписи — заголовки колонок)
 VISIBLE_PROGRAM_FIELDS = [ 
-    "Название факультета", "Название программы", "Язык обучения", "Форма обучения", 
-    "Экзамены", "Стоимость", "Прием документов", "Минимальные баллы для поступления", 
-    "Продолжительность", "Заочное обучение", "Вечернее обучение", "Онлайн обучение", 
-    "Стипендия", "Наличие общежития", "Количество мест", "Квота на бюджет", "Квота на платное обучение" 
+    "faculty", "language", "study_form", 
+    "exams", "price", "admission", "min_score", 
+    "duration", "extramural", "evening", "online", 
+    "scholarship", "dormitory", "seats", "budget_quota", "paid_quota" 
 ]
 
+# Сессия хранит только ссылку на каталог (ID таблицы + версия) и выбранные индексы,
+# сами строки берутся из общего кэша каталогов
+CATALOG_EXPIRED_TEXT = "Каталог обновился. Пожалуйста, выберите вуз заново."
+
+# --- ХЕЛПЕРЫ ---
+# Навигация идет по индексу каталога (строится один раз на версию вкладки):
+# каждый шаг — поиск в словаре и срез заранее подготовленного списка названий
+
+def city_filter(user_data: dict):
+    """Город для фильтра вузов: таблицы частных и иностранных вузов общие для всех городов."""
+    return user_data.get("selected_city") if user_data.get("uni_type") in ["Частный", "Иностранный"] else None
+
+def resolve_universities(user_data: dict, universities_manager: UniversitiesGSheet):
+    """Список вузов, который видел пользователь (None, если версия каталога вытеснена)."""
+    index = universities_manager.universities_index(
+        user_data.get("current_sheet_id"), user_data.get("universities_version")
+    )
+    if index is None:
+        return None
+    return index.for_city(city_filter(user_data))
+
+def resolve_programs(user_data: dict, universities_manager: UniversitiesGSheet):
+    """Вуз и индекс его программ из сессии: (university, programs_index) или (None, None)."""
+    universities = resolve_universities(user_data, universities_manager)
+    uni_index = user_data.get("selected_university_index")
+    if universities is None or uni_index is None or uni_index >= len(universities.universities):
+        return None, None
+    university = universities.universities[uni_index]
+    programs_index = universities_manager.programs_index(
+        user_data.get("current_sheet_id"), university.sheet_name, user_data.get("programs_version")
+    )
+    return (university, programs_index) if programs_index is not None else (None, None)
+
+def resolve_faculty(user_data: dict, universities_manager: UniversitiesGSheet):
+    """Выбранный факультет (name, programs, program_names) или None."""
+    _, programs_index = resolve_programs(user_data, universities_manager)
+    if programs_index is None:
+        return None
+    return programs_index.faculty(user_data.get("selected_faculty_index"))
+
 # --- КЛАВИАТУРЫ ---
+# Таблицы страниц списков хранятся по версии каталога (и выбранному фильтру)
+
+def universities_markup(user_data: dict, universities, lexicon: dict, lang: str, page: int = 0):
+    """Страница списка вузов (кнопки "uni_<позиция>")."""
+    key = (user_data.get("universities_version"), city_filter(user_data))
+    return UNIVERSITIES_PAGES.markup(universities.names, page, lexicon, lang, key=key)
 
+def faculties_markup(user_data: dict, programs_index, lexicon: dict, lang: str, page: int = 0):
+    """Страница списка факультетов вуза (кнопки "faculty_<позиция>")."""
+    key = user_data.get("programs_version")
+    return FACULTIES_PAGES.markup(programs_index.faculty_names, page, lexicon, lang, key=key)
+
+def programs_markup(user_data: dict, faculty, lexicon: dict, lang: str, page: int = 0):
+    """Страница списка программ факультета (кнопки "program_<позиция>")."""
+    key = (user_data.get("programs_version"), user_data.get("selected_faculty_index"))
+    return PROGRAMS_PAGES.markup(faculty.program_names, page, lexicon, lang, key=key)
+
+@cached_keyboard
 def get_cities_keyboard(lexicon: dict, lang: str):
     builder = InlineKeyboardBuilder()
     for city_name in CITIES_RU:
@@ -27,6 +91,7 @@ def get_cities_keyboard(lexicon: dict, lang: str):
     builder.row(types.InlineKeyboardButton(text=lexicon.get(lang, {}).get('button-back', 'Back'), callback_data="back_to_main_menu"))
     return builder.as_markup()
 
+@cached_keyboard
 def get_uni_types_keyboard(lexicon: dict, lang: str):
     builder = InlineKeyboardBuilder()
     builder.row(types.InlineKeyboardButton(text="🎓 Государственные", callback_data="uni_type_Государственный"))
@@ -35,31 +100,6 @@ def get_uni_types_keyboard(lexicon: dict, lang: str):
     builder.row(types.InlineKeyboardButton(text=lexicon.get(lang, {}).get('button-back', 'Back'), callback_data="back_to_cities"))
     return builder.as_markup()
 
-def get_paginated_keyboard(items: list, page: int, data_prefix: str, back_callback: str, lexicon: dict, lang: str):
-    builder = InlineKeyboardBuilder()
-    start_index = page * ITEMS_PER_PAGE
-    end_index = start_index + ITEMS_PER_PAGE
-    
-    current_page_items = items[start_index:end_index]
-    
-    for item_name in current_page_items:
-        try:
-            actual_index = items.index(item_name, start_index, end_index + len(items))
-        except ValueError:
-            actual_index = start_index + current_page_items.index(item_name) 
-
-        builder.row(types.InlineKeyboardButton(text=str(item_name), callback_data=f"{data_prefix}_{actual_index}"))
-        
-    nav_buttons = []
-    if page > 0:
-        nav_buttons.append(types.InlineKeyboardButton(text="⬅️", callback_data=f"page_{data_prefix}_{page - 1}"))
-    if end_index < len(items):
-        nav_buttons.append(types.InlineKeyboardButton(text="➡️", callback_data=f"page_{data_prefix}_{page + 1}"))
-    
-    if nav_buttons: builder.row(*nav_buttons)
-    builder.row(types.InlineKeyboardButton(text=lexicon.get(lang, {}).get('button-back', 'Back'), callback_data=back_callback))
-    return builder.as_markup()
-
 # --- ОБРАБОТЧИКИ ---
 
 @router.message(F.text.in_({"🎓 Вузы", "🎓 OTMlar"}))
@@ -132,32 +172,25 @@ async def uni_type_selected_handler(
         await callback.answer(f"Ошибка: ID таблицы для '{selected_type}' не найден в .env", show_alert=True)
         return
 
-    city_filter = selected_city if selected_type in ["Частный", "Иностранный"] else None
-    
-    all_universities_in_file = universities_manager.get_universities_by_city_and_type(
-        sheet_id=selected_sheet_id,
-        city=city_filter 
-    )
+    catalog = await universities_manager.get_catalog(UniversitiesGSheet.UNIVERSITIES_WORKSHEET, selected_sheet_id)
+    session = {
+        "selected_city": selected_city,
+        "uni_type": selected_type, 
+        "current_sheet_id": selected_sheet_id, 
+        "universities_version": catalog.version if catalog else None
+    }
+    universities = resolve_universities(session, universities_manager) if catalog else None
 
-    if not all_universities_in_file:
+    if not universities or not universities.universities:
         await callback.answer(f"В г. {selected_city} не найдены вузы типа '{selected_type}'.", show_alert=True)
         return
         
     await state.set_state(Universities.choosing_university)
-    await state.update_data(
-        page=0, 
-        uni_type=selected_type, 
-        current_sheet_id=selected_sheet_id, 
-        filtered_universities=all_universities_in_file
-    )
-    
-    uni_names = [uni.get("Наименования ВОУ", "N/A") for uni in all_universities_in_file]
+    await state.update_data(page=0, **session)
     
     await callback.message.edit_text(
         f"<b>{selected_city} / {selected_type}</b>\n\nВыберите вуз:",
-        reply_markup=get_paginated_keyboard(
-            items=uni_names, page=0, data_prefix="uni", back_callback="back_to_uni_type", lexicon=lexicon, lang=lang
-        )
+        reply_markup=universities_markup(session, universities, lexicon, lang)
     )
     await callback.answer()
 
@@ -167,80 +200,73 @@ async def university_selected_handler(callback: types.CallbackQuery, state: FSMC
     user_data = await state.get_data()
     lang = user_data.get('language', 'ru')
     
-    selected_university = user_data.get("filtered_universities", [])[university_index]
+    universities = resolve_universities(user_data, universities_manager)
+    if universities is None or university_index >= len(universities.universities):
+        await callback.answer(CATALOG_EXPIRED_TEXT, show_alert=True)
+        return
+    selected_university = universities.universities[university_index]
     
-    sheet_name = selected_university.get('sheet_name')
+    sheet_name = selected_university.sheet_name
     if not sheet_name:
-        await callback.answer(f"Ошибка: Для ВУЗа '{selected_university.get('Наименования ВОУ')}' не указан 'sheet_name' в таблице.", show_alert=True)
+        await callback.answer(f"Ошибка: Для ВУЗа '{selected_university.name}' не указан 'sheet_name' в таблице.", show_alert=True)
         return
 
-    all_programs = universities_manager.get_faculties_by_sheet_name(sheet_name)
+    catalog = await universities_manager.get_catalog(sheet_name, user_data.get("current_sheet_id"))
     
-    if not all_programs:
+    if not catalog or not catalog.value:
         await callback.answer(f"Для этого вуза факультеты (на листе '{sheet_name}') еще не добавлены.", show_alert=True)
         return
         
-    unique_faculties = sorted(list(set(
-        p.get("Название факультета") for p in all_programs if p.get("Название факультета")
-    )))
+    programs_index = universities_manager.programs_index(user_data.get("current_sheet_id"), sheet_name, catalog.version)
     
-    if not unique_faculties:
+    if programs_index is None or not programs_index.faculty_names:
          await callback.answer(f"В таблице '{sheet_name}' не найдена колонка 'Название факультета' или она пуста.", show_alert=True)
          return
     
     await state.update_data(
-        all_programs=all_programs, 
-        unique_faculties=unique_faculties, 
+        programs_version=catalog.version, 
         selected_university_index=university_index
     )
     await state.set_state(Universities.choosing_faculty)
     
     await callback.message.edit_text(
-        f"<b>{selected_university.get('Наименования ВОУ')}</b>\n\nВыберите факультет:",
-        reply_markup=get_paginated_keyboard(
-            items=unique_faculties, page=0, data_prefix="faculty", back_callback="back_to_universities", lexicon=lexicon, lang=lang
-        )
+        f"<b>{selected_university.name}</b>\n\nВыберите факультет:",
+        reply_markup=faculties_markup({"programs_version": catalog.version}, programs_index, lexicon, lang)
     )
     await callback.answer()
 
 
 @router.callback_query(Universities.choosing_faculty, F.data.startswith("faculty_"))
-async def faculty_selected_handler(callback: types.CallbackQuery, state: FSMContext, lexicon: dict):
+async def faculty_selected_handler(callback: types.CallbackQuery, state: FSMContext, lexicon: dict, universities_manager: UniversitiesGSheet):
     faculty_index = int(callback.data.split('_')[1])
     user_data = await state.get_data()
     lang = user_data.get('language', 'ru')
     
-    selected_faculty_name = user_data.get("unique_faculties", [])[faculty_index]
-    all_programs = user_data.get("all_programs", [])
-    
-    programs_in_faculty = [
-        p for p in all_programs 
-        if p.get("Название факультета") == selected_faculty_name
-    ]
-    
-    program_names = [p.get("Название программы", "N/A") for p in programs_in_faculty]
+    faculty = resolve_faculty(dict(user_data, selected_faculty_index=faculty_index), universities_manager)
+    if faculty is None:
+        await callback.answer(CATALOG_EXPIRED_TEXT, show_alert=True)
+        return
     
-    await state.update_data(
-        programs_in_faculty=programs_in_faculty, 
-        selected_faculty_index=faculty_index
-    )
+    await state.update_data(selected_faculty_index=faculty_index)
     await state.set_state(Universities.choosing_program)
     
     await callback.message.edit_text(
-        f"<b>{selected_faculty_name}</b>\n\nВыберите программу обучения:",
-        reply_markup=get_paginated_keyboard(
-            items=program_names, page=0, data_prefix="program", back_callback="back_to_faculties", lexicon=lexicon, lang=lang
-        )
+        f"<b>{faculty.name}</b>\n\nВыберите программу обучения:",
+        reply_markup=programs_markup(dict(user_data, selected_faculty_index=faculty_index), faculty, lexicon, lang)
     )
     await callback.answer()
 
 @router.callback_query(Universities.choosing_program, F.data.startswith("program_"))
-async def program_selected_handler(callback: types.CallbackQuery, state: FSMContext, lexicon: dict):
+async def program_selected_handler(callback: types.CallbackQuery, state: FSMContext, lexicon: dict, universities_manager: UniversitiesGSheet):
     program_index = int(callback.data.split('_')[1])
     user_data = await state.get_data()
     lang = user_data.get('language', 'ru')
     
-    program = user_data.get("programs_in_faculty", [])[program_index]
+    faculty = resolve_faculty(user_data, universities_manager)
+    if faculty is None:
+        await callback.answer(CATALOG_EXPIRED_TEXT, show_alert=True)
+        return
+    program = faculty.programs[program_index] if program_index < len(faculty.programs) else None
     
     if not program:
         await callback.answer("Не удалось найти информацию о программе.", show_alert=True)
@@ -248,17 +274,16 @@ async def program_selected_handler(callback: types.CallbackQuery, state: FSMCont
 
     await state.set_state(Universities.viewing_faculty) 
     
-    card_parts = [f"<b>{program.get('Название программы')}</b>\n"]
+    card_parts = [f"<b>{program.name}</b>\n"]
     for field_name in VISIBLE_PROGRAM_FIELDS:
-        if field_name == "Название программы": continue 
-        value = program.get(field_name)
+        value = getattr(program, field_name)
         if value: 
-            card_parts.append(f"<b>{field_name}:</b> {value}")
+            card_parts.append(f"<b>{Program.header(field_name)}:</b> {value}")
             
     card_text = "\n".join(card_parts)
     
     builder = InlineKeyboardBuilder()
-    if program.get("Список документов"):
+    if program.documents:
         builder.row(types.InlineKeyboardButton(text="📄 Список документов", callback_data=f"show_docs_{program_index}"))
 
     builder.row(types.InlineKeyboardButton(text=lexicon[lang]['button-back'], callback_data="back_to_faculties"))
@@ -301,22 +326,22 @@ async def back_to_universities_handler(
     callback: types.CallbackQuery, 
     state: FSMContext, 
     lexicon: dict, 
+    universities_manager: UniversitiesGSheet
 ):
 
     user_data = await state.get_data()
     lang = user_data.get('language', 'ru')
     selected_city = user_data.get("selected_city")
     selected_type = user_data.get("uni_type")
-    all_universities_in_file = user_data.get("filtered_universities", [])
-    
-    uni_names = [uni.get("Наименования ВОУ", "N/A") for uni in all_universities_in_file]
+    universities = resolve_universities(user_data, universities_manager)
+    if universities is None:
+        await callback.answer(CATALOG_EXPIRED_TEXT, show_alert=True)
+        return
     
     await state.set_state(Universities.choosing_university)
     await callback.message.edit_text(
         f"<b>{selected_city} / {selected_type}</b>\n\nВыберите вуз:",
-        reply_markup=get_paginated_keyboard(
-            items=uni_names, page=0, data_prefix="uni", back_callback="back_to_uni_type", lexicon=lexicon, lang=lang
-        )
+        reply_markup=universities_markup(user_data, universities, lexicon, lang)
     )
     await callback.answer()
 
@@ -325,87 +350,78 @@ async def back_to_faculties_handler(callback: types.CallbackQuery, state: FSMCon
     user_data = await state.get_data()
     lang = user_data.get('language', 'ru')
     
-    uni_index = user_data.get("selected_university_index")
-    selected_university = user_data.get("filtered_universities", [])[uni_index]
-    unique_faculties = user_data.get("unique_faculties", []) 
+    selected_university, programs_index = resolve_programs(user_data, universities_manager)
+    if programs_index is None:
+        await callback.answer(CATALOG_EXPIRED_TEXT, show_alert=True)
+        return
 
     await state.set_state(Universities.choosing_faculty)
     await callback.message.edit_text(
-        f"<b>{selected_university.get('Наименования ВОУ')}</b>\n\nВыберите факультет:",
-        reply_markup=get_paginated_keyboard(
-            items=unique_faculties, page=0, data_prefix="faculty", back_callback="back_to_universities", lexicon=lexicon, lang=lang
-        )
+        f"<b>{selected_university.name}</b>\n\nВыберите факультет:",
+        reply_markup=faculties_markup(user_data, programs_index, lexicon, lang)
     )
     await callback.answer()
     
 @router.callback_query(F.data == "back_to_programs")
-async def back_to_programs_handler(callback: types.CallbackQuery, state: FSMContext, lexicon: dict):
+async def back_to_programs_handler(callback: types.CallbackQuery, state: FSMContext, lexicon: dict, universities_manager: UniversitiesGSheet):
     user_data = await state.get_data()
     lang = user_data.get('language', 'ru')
 
-    faculty_index = user_data.get("selected_faculty_index")
-    selected_faculty_name = user_data.get("unique_faculties", [])[faculty_index]
-    programs_in_faculty = user_data.get("programs_in_faculty", [])
-    program_names = [p.get("Название программы", "N/A") for p in programs_in_faculty]
+    faculty = resolve_faculty(user_data, universities_manager)
+    if faculty is None:
+        await callback.answer(CATALOG_EXPIRED_TEXT, show_alert=True)
+        return
 
     await state.set_state(Universities.choosing_program)
     await callback.message.edit_text(
-        f"<b>{selected_faculty_name}</b>\n\nВыберите программу обучения:",
-        reply_markup=get_paginated_keyboard(
-            items=program_names, page=0, data_prefix="program", back_callback="back_to_faculties", lexicon=lexicon, lang=lang
-        )
+        f"<b>{faculty.name}</b>\n\nВыберите программу обучения:",
+        reply_markup=programs_markup(user_data, faculty, lexicon, lang)
     )
     await callback.answer()
 
 # --- ПАГИНАЦИЯ (ОБЩАЯ) ---
 
-@router.callback_query(F.data.startswith("page_"))
-async def pagination_handler(callback: types.CallbackQuery, state: FSMContext, lexicon: dict):
-    parts = callback.data.split('_')
-    data_prefix = parts[1]
-    page = int(parts[2])
+@router.callback_query(page_filter(UNIVERSITIES_PAGES, FACULTIES_PAGES, PROGRAMS_PAGES))
+async def pagination_handler(callback: types.CallbackQuery, state: FSMContext, lexicon: dict, universities_manager: UniversitiesGSheet):
+    view, page = parse_page_callback(callback.data)
     
     await state.update_data(page=page)
     user_data = await state.get_data()
     lang = user_data.get('language', 'ru')
     
-    items_list = []
-    back_callback = ""
-    
-    if data_prefix == 'uni':
-        items_list = [uni.get("Наименования ВОУ", "N/A") for uni in user_data.get("filtered_universities", [])]
-        back_callback = "back_to_uni_type"
-    elif data_prefix == 'faculty':
-        items_list = user_data.get("unique_faculties", [])
-        back_callback = "back_to_universities"
-    elif data_prefix == 'program':
-        items_list = [p.get("Название программы", "N/A") for p in user_data.get("programs_in_faculty", [])]
-        back_callback = "back_to_faculties"
+    if view == UNIVERSITIES_PAGES.view:
+        universities = resolve_universities(user_data, universities_manager)
+        markup = universities_markup(user_data, universities, lexicon, lang, page) if universities and universities.names else None
+    elif view == FACULTIES_PAGES.view:
+        programs_index = resolve_programs(user_data, universities_manager)[1]
+        markup = faculties_markup(user_data, programs_index, lexicon, lang, page) if programs_index and programs_index.faculty_names else None
+    else:
+        faculty = resolve_faculty(user_data, universities_manager)
+        markup = programs_markup(user_data, faculty, lexicon, lang, page) if faculty and faculty.program_names else None
+
+    if markup is None:
+        await callback.answer(CATALOG_EXPIRED_TEXT, show_alert=True)
+        return
     
-    await callback.message.edit_reply_markup(
-        reply_markup=get_paginated_keyboard(
-            items=items_list, 
-            page=page, 
-            data_prefix=data_prefix, 
-            back_callback=back_callback, 
-            lexicon=lexicon, 
-            lang=lang
-        )
-    )
+    await callback.message.edit_reply_markup(reply_markup=markup)
     await callback.answer()
 
 
 # --- ОБРАБОТЧИК ДОКУМЕНТОВ ---
 
 @router.callback_query(Universities.viewing_faculty, F.data.startswith("show_docs_"))
-async def show_documents_handler(callback: types.CallbackQuery, state: FSMContext, lexicon: dict): 
+async def show_documents_handler(callback: types.CallbackQuery, state: FSMContext, lexicon: dict, universities_manager: UniversitiesGSheet): 
     try:
         program_index = int(callback.data.split("_", 2)[2])
         user_data = await state.get_data()
         lang = user_data.get('language', 'ru')
         
-        program = user_data.get("programs_in_faculty", [])[program_index]
-        documents_text = program.get("Список документов")
+        faculty = resolve_faculty(user_data, universities_manager)
+        if faculty is None:
+            await callback.answer(CATALOG_EXPIRED_TEXT, show_alert=True)
+            return
+        program = faculty.programs[program_index]
+        documents_text = program.documents
         
         if documents_text:
             await callback.message.delete()
@@ -426,6 +442,6 @@ async def show_documents_handler(callback: types.CallbackQuery, state: FSMContex
     await callback.answer()
 
 @router.callback_query(Universities.viewing_faculty, F.data.startswith("program_"))
-async def back_to_program_card_handler(callback: types.CallbackQuery, state: FSMContext, lexicon: dict):
-    await program_selected_handler(callback, state, lexicon)
+async def back_to_program_card_handler(callback: types.CallbackQuery, state: FSMContext, lexicon: dict, universities_manager: UniversitiesGSheet):
+    await program_selected_handler(callback, state, lexicon, universities_manager)
 
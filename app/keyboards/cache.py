@@ -0,0 +1,136 @@
+"""
+Кэш готовых клавиатур.
+
+Статичные меню одинаковы для всех пользователей с одним языком, поэтому
+разметка строится один раз на (функция, язык, аргументы) и дальше отдается
+готовым объектом. Объекты общие для всех обновлений — их нельзя изменять
+(нужна другая клавиатура — строится своя, как календарь с ручным вводом).
+Кэш прогревается при старте по языкам из texts.json: warm_keyboards(lexicon).
+"""
+
+import inspect
+import logging
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Аргументы прогрева по умолчанию: один вызов (lexicon, lang) на язык
+_WARM_DEFAULT = ((),)
+
+
+class KeyboardCache:
+    """LRU-кэш разметки: ключ — (функция, словарь текстов, аргументы)."""
+
+    def __init__(self, maxsize: int = 2048):
+        self.maxsize = maxsize
+        self._markups: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, build: Callable[[], Any]) -> Any:
+        markup = self._markups.get(key)
+        if markup is not None:
+            self._markups.move_to_end(key)
+            self.hits += 1
+            return markup
+        self.misses += 1
+        markup = build()
+        self._markups[key] = markup
+        if len(self._markups) > self.maxsize:
+            self._markups.popitem(last=False)
+        return markup
+
+    def clear(self):
+        self._markups.clear()
+
+    def __len__(self) -> int:
+        return len(self._markups)
+
+
+keyboard_cache = KeyboardCache()
+
+# Функции для прогрева: (клавиатура, принимает lexicon, принимает lang, наборы аргументов)
+_warmers: List[Tuple[Callable, bool, bool, Tuple[tuple, ...]]] = []
+
+
+def _freeze(value):
+    """Аргумент -> часть ключа кэша (множества и списки сравниваются по содержимому)."""
+    if isinstance(value, (set, frozenset)):
+        return frozenset(value)
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def cached_keyboard(
+    func: Optional[Callable] = None,
+    *,
+    warm: Optional[Iterable[tuple]] = None,
+    normalize: Optional[Dict[str, Callable[[Any], Any]]] = None,
+):
+    """
+    Кэширует клавиатуру по аргументам. lexicon в ключ входит по идентичности —
+    словарь текстов загружается один раз на процесс. Ключ строится по всем
+    параметрам с учетом значений по умолчанию, поэтому позиционный, именованный
+    и пропущенный аргумент дают одну запись.
+
+    warm — наборы аргументов после (lexicon, lang) для прогрева при старте;
+    по умолчанию прогреваются клавиатуры без других обязательных аргументов.
+    normalize — {параметр: функция} для значений, равнозначных для клавиатуры
+    (например, None и пустое множество выбранных пунктов).
+    """
+    if func is None:
+        return lambda f: cached_keyboard(f, warm=warm, normalize=normalize)
+
+    signature = inspect.signature(func)
+    parameters = signature.parameters
+    normalize = normalize or {}
+    takes_lexicon = 'lexicon' in parameters
+    takes_lang = 'lang' in parameters
+    if warm is None:
+        required = [
+            name for name, parameter in parameters.items()
+            if parameter.default is parameter.empty and name not in ('lexicon', 'lang')
+        ]
+        warm = () if required else _WARM_DEFAULT
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        arguments: Dict[str, Any] = dict(bound.arguments)
+        lexicon = arguments.pop('lexicon', None)
+        try:
+            key = (func, id(lexicon), tuple(
+                (name, _freeze(normalize[name](value) if name in normalize else value))
+                for name, value in arguments.items()
+            ))
+            hash(key)
+        except TypeError:
+            # Аргументы без хэша (например, словарь данных) — строим без кэша
+            return func(*args, **kwargs)
+        return keyboard_cache.get(key, lambda: func(*args, **kwargs))
+
+    warm = tuple(warm)
+    if warm:
+        _warmers.append((wrapper, takes_lexicon, takes_lang, warm))
+    return wrapper
+
+
+def warm_keyboards(lexicon: dict) -> int:
+    """Строит зарегистрированные клавиатуры для всех языков словаря. Возвращает число клавиатур."""
+    before = len(keyboard_cache)
+    for func, takes_lexicon, takes_lang, warm in _warmers:
+        for lang in (lexicon if takes_lang else [None]):
+            for extra in warm:
+                args = ((lexicon,) if takes_lexicon else ()) + ((lang,) if takes_lang else ()) + tuple(extra)
+                try:
+                    func(*args)
+                except Exception as e:
+                    # Нет текста кнопки в языке: клавиатура построится (и упадет) при первом вызове
+                    logger.warning(f"Keyboard {func.__qualname__} ({lang}) not warmed: {e!r}")
+    built = len(keyboard_cache) - before
+    logger.info(f"Keyboards warmed: {built} markups for languages {list(lexicon)}")
+    return built
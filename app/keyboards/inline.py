@@ -3,10 +3,15 @@ from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram_calendar import SimpleCalendar
 
+from app.keyboards.cache import cached_keyboard
 from app.utils.locations import CITIES_RU, CITIES_UZ
 
+# Статичные клавиатуры строятся один раз на язык и аргументы (см. app/keyboards/cache.py),
+# поэтому возвращаемую разметку нельзя изменять
+
 # --- ОБЩИЕ КЛАВИАТУРЫ ---
 
+@cached_keyboard
 def get_language_keyboard():
     builder = InlineKeyboardBuilder()
     builder.row(
@@ -15,6 +20,7 @@ def get_language_keyboard():
     )
     return builder.as_markup()
 
+@cached_keyboard
 def get_role_keyboard(lexicon: dict, lang: str):
     builder = InlineKeyboardBuilder()
     builder.row(
@@ -24,6 +30,7 @@ def get_role_keyboard(lexicon: dict, lang: str):
     builder.row(InlineKeyboardButton(text=lexicon[lang]['button-back'], callback_data="back_to_lang_select"))
     return builder.as_markup()
 
+@cached_keyboard
 def get_profile_creation_keyboard(lexicon: dict, lang: str):
     builder = InlineKeyboardBuilder()
     builder.row(
@@ -34,6 +41,7 @@ def get_profile_creation_keyboard(lexicon: dict, lang: str):
     builder.row(InlineKeyboardButton(text=lexicon[lang]['button-back'], callback_data="back_to_role_select"))
     return builder.as_markup()
 
+@cached_keyboard
 def get_city_keyboard(lang: str):
     cities_list = CITIES_UZ if lang == 'uz' else CITIES_RU
     builder = InlineKeyboardBuilder()
@@ -55,6 +63,7 @@ async def get_calendar_with_manual_input_keyboard(lexicon: dict, lang: str):
 
 # --- КЛАВИАТУРЫ ДЛЯ СЦЕНАРИЕВ ---
 
+@cached_keyboard
 def get_skip_keyboard(lexicon: dict, lang: str):
     builder = InlineKeyboardBuilder()
     builder.row(
@@ -63,6 +72,7 @@ def get_skip_keyboard(lexicon: dict, lang: str):
     builder.row(InlineKeyboardButton(text=lexicon[lang]['button-back'], callback_data="back_to_phone_input"))
     return builder.as_markup()
 
+@cached_keyboard
 def get_profile_confirmation_keyboard(lexicon: dict, lang: str):
     builder = InlineKeyboardBuilder()
     builder.row(
@@ -72,6 +82,7 @@ def get_profile_confirmation_keyboard(lexicon: dict, lang: str):
     builder.row(InlineKeyboardButton(text=lexicon[lang]['button-back'], callback_data="back_to_city_input"))
     return builder.as_markup()
 
+@cached_keyboard
 def get_add_child_keyboard(lexicon: dict, lang: str):
     builder = InlineKeyboardBuilder()
     builder.row(
@@ -85,6 +96,7 @@ def get_add_child_keyboard(lexicon: dict, lang: str):
     builder.row(InlineKeyboardButton(text=lexicon[lang]['button-back'], callback_data="back_to_profile_confirmation"))
     return builder.as_markup()
 
+@cached_keyboard(warm=[(set(),)], normalize={'chosen_interests': lambda chosen: frozenset(chosen or ())})
 def get_interests_keyboard(lexicon: dict, lang: str, chosen_interests: set = None) -> InlineKeyboardMarkup:
     """(ИСПРАВЛЕНО) Клавиатура для выбора интересов с кнопкой 'Назад'."""
     if chosen_interests is None:
@@ -114,6 +126,7 @@ def get_interests_keyboard(lexicon: dict, lang: str, chosen_interests: set = Non
     )  
     return builder.as_markup()
 
+@cached_keyboard
 def get_child_confirmation_keyboard(lexicon: dict, lang: str):
     builder = InlineKeyboardBuilder()
     builder.row(
@@ -126,6 +139,7 @@ def get_child_confirmation_keyboard(lexicon: dict, lang: str):
     builder.row(InlineKeyboardButton(text=lexicon[lang]['button-back'], callback_data="back_to_interests"))
     return builder.as_markup()
 
+@cached_keyboard
 def get_quick_benefit_keyboard(lexicon: dict, lang: str):
     builder = InlineKeyboardBuilder()
     builder.row(
@@ -134,6 +148,7 @@ def get_quick_benefit_keyboard(lexicon: dict, lang: str):
     )
     return builder.as_markup()
 
+@cached_keyboard
 def get_student_welcome_keyboard(lexicon: dict, lang: str):
     builder = InlineKeyboardBuilder()
     builder.row(
@@ -144,6 +159,7 @@ def get_student_welcome_keyboard(lexicon: dict, lang: str):
     builder.row(InlineKeyboardButton(text=lexicon[lang]['button-back'], callback_data="back_to_role_select"))
     return builder.as_markup()
 
+@cached_keyboard
 def get_student_goal_keyboard(lexicon: dict, lang: str):
     builder = InlineKeyboardBuilder()
     builder.row(InlineKeyboardButton(text=lexicon[lang]['button-goal-university'], callback_data="goal_university"))
@@ -152,12 +168,14 @@ def get_student_goal_keyboard(lexicon: dict, lang: str):
     builder.row(InlineKeyboardButton(text=lexicon[lang]['button-goal-explore'], callback_data="goal_explore"))
     return builder.as_markup()
 
+@cached_keyboard
 def get_student_skip_keyboard(lexicon: dict, lang: str):
     builder = InlineKeyboardBuilder()
     builder.row(InlineKeyboardButton(text=lexicon[lang]['button-skip'], callback_data="skip_parent_contact"))
     builder.row(InlineKeyboardButton(text=lexicon[lang]['button-back'], callback_data="back_to_phone_input"))
     return builder.as_markup()
 
+@cached_keyboard
 def get_student_profile_confirmation_keyboard(lexicon: dict, lang: str):
     builder = InlineKeyboardBuilder()
     builder.row(InlineKeyboardButton(text=lexicon[lang]['button-confirm'], callback_data="student_confirm_profile"))
@@ -165,6 +183,7 @@ def get_student_profile_confirmation_keyboard(lexicon: dict, lang: str):
     builder.row(InlineKeyboardButton(text=lexicon[lang]['button-back'], callback_data="back_to_parent_contact"))
     return builder.as_markup()
 
+@cached_keyboard
 def get_improve_grades_keyboard(lexicon: dict, lang: str):
     builder = InlineKeyboardBuilder()
     builder.row(
@@ -176,6 +195,7 @@ def get_improve_grades_keyboard(lexicon: dict, lang: str):
     )
     return builder.as_markup()
     
+@cached_keyboard
 def get_explore_courses_keyboard(lexicon: dict, lang: str):
     builder = InlineKeyboardBuilder()
     builder.row(
@@ -188,6 +208,7 @@ def get_explore_courses_keyboard(lexicon: dict, lang: str):
 
 # --- КЛАВИАТУРЫ ДЛЯ ПРОФИЛЯ И РЕДАКТИРОВАНИЯ ---
 
+@cached_keyboard(warm=[(True,), (False,)])
 def get_profile_keyboard(lexicon: dict, lang: str, is_parent: bool):
     builder = InlineKeyboardBuilder()
     builder.row(InlineKeyboardButton(text=lexicon[lang]['button-edit-profile'], callback_data="edit_profile_action"))
@@ -199,6 +220,7 @@ def get_profile_keyboard(lexicon: dict, lang: str, is_parent: bool):
     return builder.as_markup()
     
 
+@cached_keyboard
 def get_edit_profile_keyboard(lexicon: dict, lang: str):
     builder = InlineKeyboardBuilder()
     builder.row(InlineKeyboardButton(text="Имя", callback_data="edit_field_parent_Имя"))
@@ -211,6 +233,7 @@ def get_edit_profile_keyboard(lexicon: dict, lang: str):
     return builder.as_markup()
 
     
+@cached_keyboard
 def get_student_edit_profile_keyboard(lexicon: dict, lang: str):
     builder = InlineKeyboardBuilder()
     builder.row(
@@ -239,9 +262,7 @@ def get_edit_profile_choices_keyboard(lexicon: dict, lang: str, is_parent: bool)
 def get_children_list_keyboard(children: list, lexicon: dict, lang: str):
     builder = InlineKeyboardBuilder()
     for index, child in enumerate(children):
-        child_name = f"{child.get('Имя ребенка', '')} {child.get('Фамилия ребенка', '')}".strip()
-        if not child_name:
-            child_name = "Имя не указано"
+        child_name = child.full_name or "Имя не указано"
         
         builder.row(InlineKeyboardButton(
             text=child_name, 
@@ -255,6 +276,7 @@ def get_children_list_keyboard(children: list, lexicon: dict, lang: str):
     return builder.as_markup()
 
 
+@cached_keyboard
 def get_back_to_children_list_keyboard(lexicon: dict, lang: str):
     builder = InlineKeyboardBuilder()
     builder.row(InlineKeyboardButton(text=lexicon[lang]['button-back'], callback_data="back_to_children_list"))
@@ -263,6 +285,7 @@ def get_back_to_children_list_keyboard(lexicon: dict, lang: str):
 
 # --- КЛАВИАТУРЫ ДЛЯ STEM-НАВИГАТОРА ---
 
+@cached_keyboard(warm=[(False,), (True,)])
 def get_start_test_keyboard(lexicon: dict, lang: str, from_profession_branch: bool = False):
     builder = InlineKeyboardBuilder()
     start_button_text = lexicon[lang]['button-pass-test'] if from_profession_branch else lexicon[lang]['button-start-test-now']
@@ -271,6 +294,7 @@ def get_start_test_keyboard(lexicon: dict, lang: str, from_profession_branch: bo
     builder.row(InlineKeyboardButton(text=lexicon[lang]['button-back'], callback_data="back_to_goal_select"))
     return builder.as_markup()
 
+@cached_keyboard
 def get_about_test_keyboard(lexicon: dict, lang: str):
     builder = InlineKeyboardBuilder()
     builder.row(
@@ -294,6 +318,7 @@ def get_professions_list_keyboard(professions: list, scale_key: str, subcat_key:
     builder.row(InlineKeyboardButton(text="⬅️ Назад к категориям", callback_data=f"view_professions_{scale_key}"))
     return builder.as_markup()
 
+@cached_keyboard
 def get_profession_card_keyboard(website_link: str, scale_key: str, subcat_key: str):
     builder = InlineKeyboardBuilder()
     builder.row(InlineKeyboardButton(text="🔗 Узнать больше на сайте", url=website_link))
@@ -301,6 +326,7 @@ def get_profession_card_keyboard(website_link: str, scale_key: str, subcat_key:
     return builder.as_markup()
 
 
+@cached_keyboard
 def get_yes_no_keyboard(lexicon: dict, lang: str, yes_callback: str = "yes", no_callback: str = "no"):
     """Creates a universal Yes/No keyboard with customizable callback_data."""
     builder = InlineKeyboardBuilder()
@@ -310,6 +336,7 @@ def get_yes_no_keyboard(lexicon: dict, lang: str, yes_callback: str = "yes", no_
     )
     return builder.as_markup()
 
+@cached_keyboard
 def get_consent_keyboard(lexicon: dict, lang: str):
     """Создает клавиатуру для получения согласия на создание профиля в Exode."""
     builder = InlineKeyboardBuilder()
@@ -329,6 +356,7 @@ def get_consent_keyboard(lexicon: dict, lang: str):
 
 # --- КЛАВИАТУРЫ ДЛЯ РАЗДЕЛОВ ГЛАВНОГО МЕНЮ ---
 
+@cached_keyboard
 def get_section_keyboard(lexicon: dict, lang: str, section: str, is_parent: bool = False): 
     builder = InlineKeyboardBuilder()
     
@@ -354,6 +382,7 @@ def add_back_button(builder: InlineKeyboardBuilder, lexicon: dict, lang: str, ca
     return builder
 
 
+@cached_keyboard
 def get_parent_start_test_keyboard(lexicon: dict, lang: str):
     builder = InlineKeyboardBuilder()
     builder.row(InlineKeyboardButton(
@@ -367,6 +396,7 @@ def get_parent_start_test_keyboard(lexicon: dict, lang: str):
     return builder.as_markup()
 
 # --- 1. Клавиатура для Категорий (Программирование, Математика) ---
+@cached_keyboard
 def get_course_categories_keyboard(categories: list, lexicon: dict, lang: str):
     """Создает клавиатуру со списком категорий (Программирование, Математика)."""
     builder = InlineKeyboardBuilder()
@@ -377,6 +407,7 @@ def get_course_categories_keyboard(categories: list, lexicon: dict, lang: str):
 
 
 # --- 2. Клавиатура для Подкатегорий (Python, C++) ---
+@cached_keyboard
 def get_course_subcategories_keyboard(subcategories: list, lexicon: dict, lang: str):
     """Создает клавиатуру со списком подкатегорий (Python, C++, Web)."""
     builder = InlineKeyboardBuilder()
@@ -386,15 +417,7 @@ def get_course_subcategories_keyboard(subcategories: list, lexicon: dict, lang:
     return builder.as_markup()
 
 
-# --- 3. Клавиатура для конкретных Курсов (Python Базовый, Python Средний) ---
-def get_specific_courses_keyboard(courses: list, lexicon: dict, lang: str):
-    """Создает клавиатуру со списком конкретных курсов."""
-    builder = InlineKeyboardBuilder()
-    for i, course in enumerate(courses):
-        builder.row(types.InlineKeyboardButton(text=course['Название курса'], callback_data=f"course_{i}"))
-    builder.row(types.InlineKeyboardButton(text=lexicon[lang]['button-back'], callback_data="back_to_subcategories"))
-    return builder.as_markup()
-
+@cached_keyboard
 def get_course_card_keyboard(lexicon: dict, lang: str, course_id: str):
     """Эта функция нужна для финальной карточки курса."""
     builder = InlineKeyboardBuilder()
@@ -0,0 +1,147 @@
+"""
+Постраничные списки кнопок для каталогов (вузы, факультеты, программы, профессии, курсы).
+
+Вид списка (PagedView) задает префикс callback_data кнопок и кнопку «Назад».
+Для каждого списка один раз строится таблица смещений страниц; разметка
+страницы строится при первом показе и дальше берется из кэша по
+(вид, ключ списка, страница, язык). Ключ списка включает версию каталога,
+поэтому после обновления каталога строится новая таблица. Кнопка элемента несет его позицию в полном
+списке, поэтому одинаковые названия не путаются.
+
+Листание: callback_data "page_<вид>_<страница>", разбирается parse_page_callback(),
+роутеру нужен фильтр page_filter(<виды>).
+"""
+
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional, Sequence, Tuple, Union
+
+from aiogram import F, types
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+
+ITEMS_PER_PAGE = 5
+PAGE_CALLBACK_PREFIX = "page_"
+
+# Подписи кнопок списка или функция, которая их строит
+Items = Union[Sequence[str], Callable[[], Sequence[str]]]
+
+# Зарегистрированные виды: id -> вид (id входит в callback_data и должен быть уникальным)
+_views: Dict[str, 'PagedView'] = {}
+
+
+class PageTable:
+    """Список с таблицей смещений страниц и уже построенной разметкой страниц."""
+    __slots__ = ('items', 'offsets', 'markups')
+
+    def __init__(self, items: Sequence[str], per_page: int):
+        self.items = items
+        # Начало каждой страницы и конец списка: страница p — items[offsets[p]:offsets[p + 1]]
+        self.offsets: Tuple[int, ...] = tuple(range(0, len(items), per_page)) + (len(items),)
+        self.markups: Dict[tuple, types.InlineKeyboardMarkup] = {}
+
+    @property
+    def page_count(self) -> int:
+        return len(self.offsets) - 1
+
+    def clamp(self, page: int) -> int:
+        """Номер существующей страницы (после обновления каталога старый номер может выйти за край)."""
+        return min(max(page, 0), max(self.page_count - 1, 0))
+
+
+class PagedView:
+    """
+    Вид постраничного списка: кнопки "<view>_<позиция>", листание "page_<view>_<страница>".
+    Таблицы страниц хранятся для последних max_lists списков.
+    """
+
+    def __init__(
+        self,
+        view: str,
+        back_callback: str,
+        per_page: int = ITEMS_PER_PAGE,
+        back_text: Optional[str] = None,
+        max_lists: int = 256,
+    ):
+        if view in _views:
+            raise ValueError(f"Paged view '{view}' is already registered")
+        _views[view] = self
+        self.view = view
+        self.back_callback = back_callback
+        self.per_page = per_page
+        # Без back_text подпись берется из texts.json ('button-back')
+        self.back_text = back_text
+        self.max_lists = max_lists
+        self._tables: OrderedDict = OrderedDict()
+
+    def page_callback(self, page: int) -> str:
+        return f"{PAGE_CALLBACK_PREFIX}{self.view}_{page}"
+
+    def table(self, items: Items, key: Hashable) -> PageTable:
+        """
+        Таблица страниц списка. key — версия списка (версия каталога и фильтры): один key —
+        один и тот же список. items можно передать функцией — список будет построен
+        только для новой таблицы.
+        """
+        table = self._tables.get(key)
+        if table is None:
+            table = PageTable(items() if callable(items) else items, self.per_page)
+            self._tables[key] = table
+            if len(self._tables) > self.max_lists:
+                self._tables.popitem(last=False)
+        else:
+            self._tables.move_to_end(key)
+        return table
+
+    def markup(
+        self,
+        items: Items,
+        page: int,
+        lexicon: Optional[dict] = None,
+        lang: Optional[str] = None,
+        *,
+        key: Hashable,
+        back_callback: Optional[str] = None,
+    ) -> types.InlineKeyboardMarkup:
+        """Разметка страницы списка (общий объект из кэша — не изменять)."""
+        table = self.table(items, key)
+        page = table.clamp(page)
+        back_callback = back_callback or self.back_callback
+        markup_key = (page, lang, back_callback)
+        markup = table.markups.get(markup_key)
+        if markup is None:
+            markup = table.markups[markup_key] = self._build(table, page, lexicon, lang, back_callback)
+        return markup
+
+    def _build(self, table: PageTable, page: int, lexicon: Optional[dict], lang: Optional[str], back_callback: str) -> types.InlineKeyboardMarkup:
+        builder = InlineKeyboardBuilder()
+        start = table.offsets[page]
+        end = table.offsets[page + 1] if page < table.page_count else start
+        for index in range(start, end):
+            builder.row(types.InlineKeyboardButton(text=str(table.items[index]), callback_data=f"{self.view}_{index}"))
+
+        nav_buttons = []
+        if page > 0:
+            nav_buttons.append(types.InlineKeyboardButton(text="⬅️", callback_data=self.page_callback(page - 1)))
+        if page + 1 < table.page_count:
+            nav_buttons.append(types.InlineKeyboardButton(text="➡️", callback_data=self.page_callback(page + 1)))
+        if nav_buttons:
+            builder.row(*nav_buttons)
+
+        back_text = self.back_text or (lexicon or {}).get(lang, {}).get('button-back', 'Back')
+        builder.row(types.InlineKeyboardButton(text=back_text, callback_data=back_callback))
+        return builder.as_markup()
+
+
+def parse_page_callback(data: Optional[str]) -> Optional[Tuple[str, int]]:
+    """Разбирает "page_<вид>_<страница>": (вид, страница) или None для чужих данных."""
+    if not data or not data.startswith(PAGE_CALLBACK_PREFIX):
+        return None
+    view, _, page = data[len(PAGE_CALLBACK_PREFIX):].rpartition('_')
+    if view not in _views or not page.isdigit():
+        return None
+    return view, int(page)
+
+
+def page_filter(*views: PagedView):
+    """Фильтр роутера: листание одного из указанных видов."""
+    names = {view.view for view in views}
+    return F.data.func(lambda data: (parsed := parse_page_callback(data)) is not None and parsed[0] in names)
@@ -1,6 +1,9 @@
 from aiogram import types
 from aiogram.utils.keyboard import ReplyKeyboardBuilder
 
+from app.keyboards.cache import cached_keyboard
+
+@cached_keyboard
 def get_share_phone_keyboard(lexicon: dict, lang: str) -> types.ReplyKeyboardMarkup:
     builder = ReplyKeyboardBuilder()
     builder.row(
@@ -11,6 +14,7 @@ def get_share_phone_keyboard(lexicon: dict, lang: str) -> types.ReplyKeyboardMar
     )
     return builder.as_markup(resize_keyboard=True, one_time_keyboard=True)
 
+@cached_keyboard
 def get_parent_main_menu_keyboard(lexicon: dict, lang: str) -> types.ReplyKeyboardMarkup:
     """Создает клавиатуру главного меню для РОДИТЕЛЯ."""
     print("--- СОЗДАЕТСЯ МЕНЮ ДЛЯ РОДИТЕЛЯ ---")
@@ -32,6 +36,7 @@ def get_parent_main_menu_keyboard(lexicon: dict, lang: str) -> types.ReplyKeyboa
     )
     return builder.as_markup(resize_keyboard=True, is_persistent=True)
 
+@cached_keyboard
 def get_student_main_menu_keyboard(lexicon: dict, lang: str) -> types.ReplyKeyboardMarkup:
     """Создает клавиатуру главного меню для УЧЕНИКА."""
     print("--- СОЗДАЕТСЯ МЕНЮ ДЛЯ УЧЕНИКА ---")
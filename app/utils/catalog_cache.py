@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from app.utils.sheets_scheduler import background_priority
+
+logger = logging.getLogger(__name__)
+
+CacheKey = Tuple[str, str]
+Loader = Callable[[], Awaitable[Any]]
+
+
+@dataclass
+class CacheEntry:
+    """Закэшированное содержимое одной вкладки каталога."""
+    value: Any
+    loaded_at: float
+    version: int
+    # Собственный TTL записи (например, для данных из снимка); None — общий TTL кэша
+    ttl: Optional[float] = None
+
+
+class CatalogCache:
+    """
+    In-process кэш вкладок-каталогов, ключ — (sheet_id, worksheet).
+
+    Свежие данные отдаются из памяти. Устаревшие (старше ttl) тоже отдаются
+    сразу, а обновление запускается в фоне (stale-while-revalidate).
+    Сеть на горячем пути трогается только при самом первом обращении к вкладке.
+
+    Каждая загрузка получает номер версии. Несколько предыдущих версий
+    (keep_versions) хранятся, чтобы сессии, открытые до обновления,
+    могли дочитать свои строки по (версия, индекс).
+    """
+
+    def __init__(self, ttl: float, keep_versions: int = 2):
+        self.ttl = ttl
+        self.keep_versions = keep_versions
+        self._entries: Dict[CacheKey, CacheEntry] = {}
+        self._previous: Dict[CacheKey, Deque[CacheEntry]] = {}
+        self._locks: Dict[CacheKey, asyncio.Lock] = {}
+        self._refresh_tasks: Dict[CacheKey, asyncio.Task] = {}
+        self._version = 0
+
+    async def get(self, sheet_id: str, worksheet: str, loader: Loader) -> Any:
+        """Возвращает данные вкладки, при необходимости загружая их через loader."""
+        return (await self.get_entry(sheet_id, worksheet, loader)).value
+
+    async def get_entry(self, sheet_id: str, worksheet: str, loader: Loader) -> CacheEntry:
+        """То же, что get(), но вместе с номером версии данных."""
+        key = (sheet_id, worksheet)
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = await self._load_once(key, loader)
+        elif time.monotonic() - entry.loaded_at > (self.ttl if entry.ttl is None else entry.ttl):
+            self._schedule_refresh(key, loader)
+        return entry
+
+    def put(self, sheet_id: str, worksheet: str, value: Any, ttl: Optional[float] = None, stale: bool = False) -> CacheEntry:
+        """
+        Кладет готовые данные вкладки (например, из массовой загрузки или снимка).
+        stale=True — данные отдаются сразу, но первое же обращение запустит обновление.
+        """
+        entry = self._store((sheet_id, worksheet), value)
+        entry.ttl = ttl
+        if stale:
+            entry.loaded_at = float('-inf')
+        return entry
+
+    def export(self) -> Dict[CacheKey, Any]:
+        """Текущие данные всех вкладок: {(sheet_id, worksheet): value}."""
+        return {key: entry.value for key, entry in self._entries.items()}
+
+    def get_version(self, sheet_id: str, worksheet: str, version: int) -> Optional[Any]:
+        """Данные конкретной версии вкладки или None, если она уже вытеснена."""
+        key = (sheet_id, worksheet)
+        current = self._entries.get(key)
+        if current is not None and current.version == version:
+            return current.value
+        for entry in self._previous.get(key, ()):
+            if entry.version == version:
+                return entry.value
+        return None
+
+    def peek(self, sheet_id: str, worksheet: str) -> Optional[CacheEntry]:
+        """Текущая запись кэша без загрузки (None, если вкладка еще не загружена)."""
+        return self._entries.get((sheet_id, worksheet))
+
+    def invalidate(self, sheet_id: Optional[str] = None, worksheet: Optional[str] = None) -> int:
+        """
+        Сбрасывает записи кэша. Без аргументов — весь кэш,
+        только с sheet_id — все вкладки таблицы. Возвращает число сброшенных записей.
+        """
+        keys = [
+            key for key in self._entries
+            if (sheet_id is None or key[0] == sheet_id) and (worksheet is None or key[1] == worksheet)
+        ]
+        for key in keys:
+            del self._entries[key]
+            self._previous.pop(key, None)
+        if keys:
+            logger.info(f"Catalog cache invalidated: {len(keys)} entries (sheet={sheet_id}, worksheet={worksheet})")
+        return len(keys)
+
+    async def _load_once(self, key: CacheKey, loader: Loader) -> CacheEntry:
+        # Холодный промах: грузим вкладку один раз, остальные ждут на замке
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._store(key, await loader())
+            return entry
+
+    def _store(self, key: CacheKey, value: Any) -> CacheEntry:
+        current = self._entries.get(key)
+        if current is not None and current.value == value:
+            # Данные не изменились — версия остается прежней, открытые сессии не теряют ссылки
+            current.loaded_at = time.monotonic()
+            return current
+        self._version += 1
+        entry = CacheEntry(value=value, loaded_at=time.monotonic(), version=self._version)
+        if key in self._entries and self.keep_versions:
+            self._previous.setdefault(key, deque(maxlen=self.keep_versions)).appendleft(self._entries[key])
+        self._entries[key] = entry
+        return entry
+
+    def _schedule_refresh(self, key: CacheKey, loader: Loader):
+        if key in self._refresh_tasks:
+            return
+        task = asyncio.create_task(self._refresh(key, loader))
+        self._refresh_tasks[key] = task
+        task.add_done_callback(lambda _: self._refresh_tasks.pop(key, None))
+
+    async def _refresh(self, key: CacheKey, loader: Loader):
+        try:
+            # Фоновое обновление пропускает вперед запросы пользователей
+            with background_priority():
+                value = await loader()
+            self._store(key, value)
+            logger.info(f"Catalog cache refreshed: {key[1]} ({key[0]})")
+        except Exception as e:
+            # Оставляем устаревшие данные, следующее обращение попробует снова
+            logger.error(f"Failed to refresh catalog cache for {key[1]} ({key[0]}): {e}")
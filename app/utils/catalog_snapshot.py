@@ -0,0 +1,158 @@
+"""
+Локальный снимок вкладок-каталогов (курсы, профессии по шкалам, вузы и программы).
+
+Снимок позволяет боту после перезапуска сразу отвечать из последних известных
+данных, а обновление из Google идет в фоне. Собрать файл заранее (например,
+при деплое) или посмотреть, что в нем лежит:
+    python -m app.utils.catalog_snapshot build
+    python -m app.utils.catalog_snapshot info
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from app.utils.helpers import json_dumps
+
+logger = logging.getLogger(__name__)
+
+WorksheetKey = Tuple[str, str]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    version INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    content_hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS snapshot_worksheets (
+    version INTEGER NOT NULL,
+    sheet_id TEXT NOT NULL,
+    worksheet TEXT NOT NULL,
+    records TEXT NOT NULL,
+    PRIMARY KEY (version, sheet_id, worksheet)
+);
+"""
+
+# Сколько байт файла SQLite читать через mmap, а не через read()
+_MMAP_SIZE = 256 * 1024 * 1024
+
+
+@dataclass
+class Snapshot:
+    """Содержимое вкладок-каталогов на момент загрузки."""
+    version: int
+    created_at: float
+    content_hash: str
+    worksheets: Dict[WorksheetKey, List[Dict]]
+
+
+def content_hash(worksheets: Dict[WorksheetKey, List[Dict]]) -> str:
+    """Хэш содержимого снимка, не зависящий от порядка вкладок."""
+    payload = json_dumps([[sheet_id, worksheet, worksheets[(sheet_id, worksheet)]] for sheet_id, worksheet in sorted(worksheets)])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class CatalogSnapshotStore:
+    """
+    Версионированный локальный снимок вкладок-каталогов в файле SQLite.
+
+    Каждое сохранение создает новую версию целиком (в одной транзакции),
+    поэтому читатель всегда видит согласованный снимок. Если содержимое
+    не изменилось (тот же хэш), новая версия не создается. Хранится
+    несколько последних версий, более старые удаляются. Файл читается
+    через mmap, поэтому подъем снимка при старте не копирует его целиком.
+    """
+
+    def __init__(self, path: str, keep_versions: int = 2):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.keep_versions = keep_versions
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(f"PRAGMA mmap_size={_MMAP_SIZE}")
+        self._db.executescript(_SCHEMA)
+
+    def latest(self) -> Optional[Tuple[int, float, str]]:
+        """(версия, время создания, хэш) последнего снимка без загрузки данных."""
+        return self._db.execute(
+            "SELECT version, created_at, content_hash FROM snapshots ORDER BY version DESC LIMIT 1"
+        ).fetchone()
+
+    def save(self, worksheets: Dict[WorksheetKey, List[Dict]]) -> int:
+        """Сохраняет новую версию снимка (если содержимое изменилось). Возвращает ее номер."""
+        digest = content_hash(worksheets)
+        latest = self.latest()
+        if latest and latest[2] == digest:
+            return latest[0]
+        with self._db:
+            self._db.execute("BEGIN")
+            version = self._db.execute(
+                "INSERT INTO snapshots (created_at, content_hash) VALUES (?, ?)", (time.time(), digest)
+            ).lastrowid
+            self._db.executemany(
+                "INSERT INTO snapshot_worksheets (version, sheet_id, worksheet, records) VALUES (?, ?, ?, ?)",
+                [(version, sheet_id, worksheet, json_dumps(records)) for (sheet_id, worksheet), records in worksheets.items()]
+            )
+            self._db.execute(
+                "DELETE FROM snapshots WHERE version <= ?", (version - self.keep_versions,)
+            )
+            self._db.execute(
+                "DELETE FROM snapshot_worksheets WHERE version NOT IN (SELECT version FROM snapshots)"
+            )
+        logger.info(f"Catalog snapshot v{version} saved: {len(worksheets)} worksheets, hash {digest[:12]} ({self.path})")
+        return version
+
+    def load(self, version: Optional[int] = None) -> Optional[Snapshot]:
+        """Снимок указанной версии (по умолчанию последней) или None, если снимков нет."""
+        if version is None:
+            row = self.latest()
+        else:
+            row = self._db.execute(
+                "SELECT version, created_at, content_hash FROM snapshots WHERE version = ?", (version,)
+            ).fetchone()
+        if row is None:
+            return None
+        rows = self._db.execute(
+            "SELECT sheet_id, worksheet, records FROM snapshot_worksheets WHERE version = ?", (row[0],)
+        ).fetchall()
+        return Snapshot(
+            version=row[0],
+            created_at=row[1],
+            content_hash=row[2],
+            worksheets={(sheet_id, worksheet): json.loads(records) for sheet_id, worksheet, records in rows}
+        )
+
+    def close(self):
+        self._db.close()
+
+
+if __name__ == '__main__':
+    import argparse
+    import asyncio
+
+    from app.core.config import CATALOG_SNAPSHOT_PATH
+    from app.utils.google_sheets import build_catalog_snapshot
+
+    parser = argparse.ArgumentParser(description='Catalog snapshot for fast bot start')
+    parser.add_argument('command', choices=['build', 'info'])
+    parser.add_argument('--path', default=CATALOG_SNAPSHOT_PATH)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(name)s - %(message)s')
+
+    store = CatalogSnapshotStore(args.path)
+    if args.command == 'build':
+        asyncio.run(build_catalog_snapshot(store))
+    latest = store.latest()
+    if latest is None:
+        print(f"{args.path}: no snapshots")
+    else:
+        snapshot = store.load(latest[0])
+        print(f"{args.path}: v{snapshot.version}, {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(snapshot.created_at))}, "
+              f"sha256 {snapshot.content_hash}, {len(snapshot.worksheets)} worksheets")
+    store.close()
@@ -1,17 +1,29 @@
 """
 Exode API Integration Module for Telegram Bot
-Complete implementation with all necessary functions for user management
+Async client with a shared keep-alive connection pool for user management
 """
 
-import requests
+import asyncio
+import copy
 import json
 import logging
-from typing import Dict, Optional, Any
+import random
+import time
+from typing import Dict, Iterable, Optional, Any, Tuple
+
+import aiohttp
+
 from app.core.config import (
     EXODE_API_BASE_URL,
     EXODE_TOKEN,
     SELLER_ID,
-    SCHOOL_ID
+    SCHOOL_ID,
+    EXODE_TIMEOUT,
+    EXODE_CONNECT_TIMEOUT,
+    EXODE_MAX_RETRIES,
+    EXODE_POOL_SIZE,
+    EXODE_LOOKUP_TTL,
+    EXODE_NEGATIVE_LOOKUP_TTL
 )
 
 # Configure logging
@@ -21,34 +33,36 @@ logger = logging.getLogger(__name__)
 def _get_headers() -> Dict[str, str]:
     """
     Get headers for Exode API requests.
-    
+
     Returns:
         Dict with required headers for API authentication
     """
-    return {
+    headers = {
         'Authorization': f'Bearer {EXODE_TOKEN}',
         'Seller-Id': SELLER_ID,
         'School-Id': SCHOOL_ID,
         'Content-Type': 'application/json'
     }
+    # aiohttp does not accept None header values
+    return {key: value for key, value in headers.items() if value is not None}
 
 
 def _format_phone(phone: str) -> str:
     """
     Format phone number to international format.
-    
+
     Args:
         phone: Phone number in any format
-        
+
     Returns:
         Formatted phone number with + prefix
     """
     if not phone:
         return phone
-    
+
     # Remove all non-digit characters except +
     phone = ''.join(c for c in phone if c.isdigit() or c == '+')
-    
+
     # Add + if not present
     if not phone.startswith('+'):
         # Check if it's Uzbek number
@@ -59,448 +73,581 @@ def _format_phone(phone: str) -> str:
             phone = '+998' + phone
         else:
             phone = '+' + phone
-    
+
     return phone
 
 
-def find_user_by_phone(phone: str) -> Optional[Dict[str, Any]]:
+def _clean_login_fields(payload: Dict[str, Any]):
+    """Format phone and replace empty login fields with None (in place)."""
+    if payload.get('phone'):
+        payload['phone'] = _format_phone(payload['phone'])
+    if payload.get('email') == '':
+        payload['email'] = None
+    if payload.get('phone') == '':
+        payload['phone'] = None
+
+
+class _LookupCache:
     """
-    Find user in Exode by phone number.
-    
-    Args:
-        phone: Phone number to search for
-        
-    Returns:
-        User data dict or None if not found/error
+    Short-lived cache of /user/find results, keyed by 'phone:<formatted phone>' or 'tg:<tgId>'.
+    "Not found" answers are cached too, with their own (shorter) TTL.
     """
-    try:
-        # Format phone number
-        phone = _format_phone(phone)
-        
-        if not phone:
-            logger.error("Empty phone number provided")
-            return None
-        
-        url = f'{EXODE_API_BASE_URL}/user/find'
-        headers = _get_headers()
-        params = {'login': phone}
-        
-        logger.info(f"Searching for user with phone: {phone}")
-        
-        response = requests.get(url, params=params, headers=headers, timeout=10)
-        
-        if response.status_code == 200:
-            result = response.json()
-            if result.get('success'):
-                payload = result.get('payload')
-                if payload:
-                    logger.info(f"User found with phone: {phone}")
-                    return payload
+
+    def __init__(self, ttl: float, negative_ttl: float, max_size: int = 10000):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        self._entries: Dict[str, Tuple[float, Optional[Dict[str, Any]]]] = {}
+
+    def get(self, key: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """Returns (hit, value); value is None for a cached "not found"."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return False, None
+        return True, copy.deepcopy(value)
+
+    def set(self, key: str, value: Optional[Dict[str, Any]]):
+        ttl = self.ttl if value is not None else self.negative_ttl
+        if ttl <= 0:
+            return
+        if len(self._entries) >= self.max_size:
+            # Drop the oldest entry (dicts keep insertion order)
+            self._entries.pop(next(iter(self._entries)))
+        self._entries[key] = (time.monotonic() + ttl, copy.deepcopy(value))
+
+    def invalidate(self, keys: Iterable[str] = (), user_id: Optional[int] = None):
+        """Drop the given keys and every positive entry that points to user_id."""
+        for key in keys:
+            self._entries.pop(key, None)
+        if user_id is not None:
+            stale = [
+                key for key, (_, value) in self._entries.items()
+                if value and (value.get('user') or {}).get('id') == user_id
+            ]
+            for key in stale:
+                del self._entries[key]
+
+
+def _phone_key(phone: Optional[str]) -> str:
+    return f'phone:{_format_phone(phone)}'
+
+
+def _tg_key(tg_id: Any) -> str:
+    return f'tg:{tg_id}'
+
+
+class ExodeClient:
+    """
+    Async Exode API client.
+
+    All requests share one aiohttp session, so TCP/TLS connections are kept
+    alive and reused from a bounded pool. Idempotent calls (GET/PUT) are
+    retried on timeouts, connection errors and 5xx responses with jittered
+    exponential backoff. POST calls (create, auth token) are retried only
+    when the connection could not be established, so a request the server
+    may already have processed is never sent twice.
+    Create one client per process and close it on shutdown.
+
+    User lookups are cached for a short time (including "not found");
+    create/update/upsert drop the affected entries.
+    """
+
+    def __init__(
+        self,
+        base_url: str = EXODE_API_BASE_URL,
+        timeout: float = EXODE_TIMEOUT,
+        connect_timeout: float = EXODE_CONNECT_TIMEOUT,
+        max_retries: int = EXODE_MAX_RETRIES,
+        pool_size: int = EXODE_POOL_SIZE,
+        backoff_base: float = 0.5,
+        lookup_ttl: float = EXODE_LOOKUP_TTL,
+        negative_lookup_ttl: float = EXODE_NEGATIVE_LOOKUP_TTL
+    ):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=connect_timeout)
+        self.max_retries = max_retries
+        self.pool_size = pool_size
+        self.backoff_base = backoff_base
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._lookups = _LookupCache(lookup_ttl, negative_lookup_ttl)
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Session is created lazily, inside the running event loop
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, ttl_dns_cache=300, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=self.timeout,
+                headers=_get_headers()
+            )
+        return self._session
+
+    async def close(self):
+        """Close the connection pool."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def __aenter__(self) -> "ExodeClient":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def _invalidate_lookups(self, payload: Dict[str, Any], result: Optional[Dict[str, Any]] = None, user_id: Optional[int] = None):
+        """Forget cached lookups for the phone/tgId of a written user."""
+        user = (result or {}).get('user') or {}
+        keys = []
+        for source in (payload, user):
+            if source.get('phone'):
+                keys.append(_phone_key(source['phone']))
+            if source.get('tgId'):
+                keys.append(_tg_key(source['tgId']))
+        self._lookups.invalidate(keys, user_id if user_id is not None else user.get('id'))
+
+    def _backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff delay for the given attempt."""
+        return random.uniform(0, self.backoff_base * (2 ** attempt))
+
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        json_data: Optional[Dict[str, Any]] = None,
+        idempotent: Optional[bool] = None
+    ) -> Tuple[int, Optional[Dict[str, Any]], str]:
+        """
+        Send a request with retries.
+
+        Args:
+            idempotent: Whether the call may be repeated after a timeout or 5xx.
+                Defaults to True for GET/PUT and False for other methods,
+                which are retried only on connect errors.
+
+        Returns:
+            Tuple of (status code, parsed JSON body or None, raw body text)
+
+        Raises:
+            asyncio.TimeoutError / aiohttp.ClientError when all attempts failed
+        """
+        url = f'{self.base_url}{path}'
+        if idempotent is None:
+            idempotent = method in ('GET', 'PUT')
+        # A non-idempotent request is repeated only if it never reached the server
+        retry_errors = (asyncio.TimeoutError, aiohttp.ClientConnectionError) if idempotent else aiohttp.ClientConnectorError
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self._get_session().request(method, url, params=params, json=json_data) as response:
+                    text = await response.text()
+                    if idempotent and response.status >= 500 and attempt < self.max_retries:
+                        logger.warning(f"Exode {method} {path} returned {response.status}, retrying")
+                    else:
+                        try:
+                            data = json.loads(text) if text else None
+                        except ValueError:
+                            data = None
+                        return response.status, data, text
+            except retry_errors as e:
+                if attempt >= self.max_retries:
+                    raise
+                logger.warning(f"Exode {method} {path} failed ({e.__class__.__name__}), retrying")
+            await asyncio.sleep(self._backoff(attempt))
+
+    async def find_user_by_phone(self, phone: str) -> Optional[Dict[str, Any]]:
+        """
+        Find user in Exode by phone number.
+
+        Args:
+            phone: Phone number to search for
+
+        Returns:
+            User data dict or None if not found/error
+        """
+        try:
+            # Format phone number
+            phone = _format_phone(phone)
+
+            if not phone:
+                logger.error("Empty phone number provided")
+                return None
+
+            hit, cached = self._lookups.get(_phone_key(phone))
+            if hit:
+                return cached
+
+            logger.info(f"Searching for user with phone: {phone}")
+
+            status, result, _ = await self._request('GET', '/user/find', params={'login': phone})
+
+            if status == 200 and result is not None:
+                if result.get('success'):
+                    payload = result.get('payload')
+                    self._lookups.set(_phone_key(phone), payload or None)
+                    if payload:
+                        logger.info(f"User found with phone: {phone}")
+                        return payload
+                    else:
+                        logger.info(f"No user found with phone: {phone}")
+                        return None
                 else:
-                    logger.info(f"No user found with phone: {phone}")
+                    logger.error(f"API error: {result.get('message', 'Unknown error')}")
                     return None
+            elif status == 401:
+                logger.error("Authentication failed - check EXODE_API_TOKEN")
+                return None
+            elif status == 403:
+                logger.error("Access denied - check SELLER_ID and SCHOOL_ID")
+                return None
             else:
-                logger.error(f"API error: {result.get('message', 'Unknown error')}")
+                logger.error(f"Unexpected status code: {status}")
                 return None
-        elif response.status_code == 401:
-            logger.error("Authentication failed - check EXODE_API_TOKEN")
+
+        except aiohttp.ClientConnectionError:
+            logger.error("Connection error - check internet connection")
             return None
-        elif response.status_code == 403:
-            logger.error("Access denied - check SELLER_ID and SCHOOL_ID")
+        except asyncio.TimeoutError:
+            logger.error("Request timeout - Exode API might be slow")
             return None
-        else:
-            logger.error(f"Unexpected status code: {response.status_code}")
+        except Exception as e:
+            logger.error(f"Unexpected error in find_user_by_phone: {e}")
             return None
-            
-    except requests.exceptions.ConnectionError:
-        logger.error("Connection error - check internet connection")
-        return None
-    except requests.exceptions.Timeout:
-        logger.error("Request timeout - Exode API might be slow")
-        return None
-    except Exception as e:
-        logger.error(f"Unexpected error in find_user_by_phone: {e}")
-        return None
 
+    async def find_user_by_telegram_id(self, tg_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Find user in Exode by Telegram ID.
 
-def find_user_by_telegram_id(tg_id: int) -> Optional[Dict[str, Any]]:
-    """
-    Find user in Exode by Telegram ID.
-    
-    Args:
-        tg_id: Telegram user ID
-        
-    Returns:
-        User data dict or None if not found/error
-    """
-    try:
-        url = f'{EXODE_API_BASE_URL}/user/find'
-        headers = _get_headers()
-        params = {'tgId': tg_id}
-        
-        logger.info(f"Searching for user with Telegram ID: {tg_id}")
-        
-        response = requests.get(url, params=params, headers=headers, timeout=10)
-        
-        if response.status_code == 200:
-            result = response.json()
-            if result.get('success'):
-                payload = result.get('payload')
-                if payload:
-                    logger.info(f"User found with Telegram ID: {tg_id}")
-                    return payload
+        Args:
+            tg_id: Telegram user ID
+
+        Returns:
+            User data dict or None if not found/error
+        """
+        try:
+            hit, cached = self._lookups.get(_tg_key(tg_id))
+            if hit:
+                return cached
+
+            logger.info(f"Searching for user with Telegram ID: {tg_id}")
+
+            status, result, _ = await self._request('GET', '/user/find', params={'tgId': tg_id})
+
+            if status == 200 and result is not None:
+                if result.get('success'):
+                    payload = result.get('payload')
+                    self._lookups.set(_tg_key(tg_id), payload or None)
+                    if payload:
+                        logger.info(f"User found with Telegram ID: {tg_id}")
+                        return payload
+                    else:
+                        logger.info(f"No user found with Telegram ID: {tg_id}")
+                        return None
                 else:
-                    logger.info(f"No user found with Telegram ID: {tg_id}")
+                    logger.error(f"API error: {result.get('message', 'Unknown error')}")
                     return None
             else:
-                logger.error(f"API error: {result.get('message', 'Unknown error')}")
+                logger.error(f"Unexpected status code: {status}")
                 return None
-        else:
-            logger.error(f"Unexpected status code: {response.status_code}")
+
+        except Exception as e:
+            logger.error(f"Unexpected error in find_user_by_telegram_id: {e}")
             return None
-            
-    except Exception as e:
-        logger.error(f"Unexpected error in find_user_by_telegram_id: {e}")
-        return None
 
+    async def create_user(self, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Create new user in Exode.
 
-def create_user(payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-    """
-    Create new user in Exode.
-    
-    Args:
-        payload: User data including profile
-        
-    Returns:
-        Created user data or None if failed
-    """
-    try:
-        url = f'{EXODE_API_BASE_URL}/user/create'
-        headers = _get_headers()
-        
-        # Validate that we have at least one login method
-        has_login = any([
-            payload.get('email'),
-            payload.get('phone'),
-            payload.get('tgId')
-        ])
-        
-        if not has_login:
-            logger.error("User must have email, phone, or tgId")
-            return None
-        
-        # Format phone if present
-        if payload.get('phone'):
-            payload['phone'] = _format_phone(payload['phone'])
-        
-        # Clean empty strings
-        if payload.get('email') == '':
-            payload['email'] = None
-        if payload.get('phone') == '':
-            payload['phone'] = None
-        
-        logger.info(f"Creating user with data: {json.dumps(payload, ensure_ascii=False)}")
-        
-        response = requests.post(url, json=payload, headers=headers, timeout=10)
-        
-        if response.status_code in [200, 201]:
-            result = response.json()
-            if result.get('success'):
-                logger.info("User created successfully")
-                return result.get('payload')
+        Args:
+            payload: User data including profile
+
+        Returns:
+            Created user data or None if failed
+        """
+        try:
+            # Validate that we have at least one login method
+            has_login = any([
+                payload.get('email'),
+                payload.get('phone'),
+                payload.get('tgId')
+            ])
+
+            if not has_login:
+                logger.error("User must have email, phone, or tgId")
+                return None
+
+            _clean_login_fields(payload)
+
+            logger.info(f"Creating user with data: {json.dumps(payload, ensure_ascii=False)}")
+
+            # Drop cached lookups before and after the write: a failed write may still have been applied
+            self._invalidate_lookups(payload)
+            status, result, text = await self._request('POST', '/user/create', json_data=payload, idempotent=False)
+            self._invalidate_lookups(payload, (result or {}).get('payload'))
+
+            if status in [200, 201] and result is not None:
+                if result.get('success'):
+                    logger.info("User created successfully")
+                    return result.get('payload')
+                else:
+                    logger.error(f"API error: {result.get('message', 'Unknown error')}")
+                    return None
+            elif status == 400:
+                logger.error(f"Validation error: {result or text}")
+                # Check if it's duplicate user error
+                if 'EmailIsBusy' in text or 'PhoneIsBusy' in text:
+                    logger.warning("User already exists, consider using upsert instead")
+                return None
             else:
-                logger.error(f"API error: {result.get('message', 'Unknown error')}")
+                logger.error(f"Failed to create user. Status: {status}, Response: {text}")
                 return None
-        elif response.status_code == 400:
-            error_data = response.json()
-            logger.error(f"Validation error: {error_data}")
-            # Check if it's duplicate user error
-            if 'EmailIsBusy' in str(error_data) or 'PhoneIsBusy' in str(error_data):
-                logger.warning("User already exists, consider using upsert instead")
-            return None
-        else:
-            logger.error(f"Failed to create user. Status: {response.status_code}, Response: {response.text}")
+
+        except Exception as e:
+            logger.error(f"Unexpected error in create_user: {e}")
             return None
-            
-    except Exception as e:
-        logger.error(f"Unexpected error in create_user: {e}")
-        return None
 
+    async def update_user(self, user_id: int, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Update existing user in Exode.
 
-def update_user(user_id: int, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-    """
-    Update existing user in Exode.
-    
-    Args:
-        user_id: Exode user ID
-        payload: Data to update
-        
-    Returns:
-        Updated user data or None if failed
-    """
-    try:
-        url = f'{EXODE_API_BASE_URL}/user/{user_id}/update'
-        headers = _get_headers()
-        
-        # Format phone if present
-        if payload.get('phone'):
-            payload['phone'] = _format_phone(payload['phone'])
-        
-        logger.info(f"Updating user {user_id} with data: {json.dumps(payload, ensure_ascii=False)}")
-        
-        response = requests.put(url, json=payload, headers=headers, timeout=10)
-        
-        if response.status_code == 200:
-            result = response.json()
-            if result.get('success'):
-                logger.info(f"User {user_id} updated successfully")
-                return result.get('payload')
+        Args:
+            user_id: Exode user ID
+            payload: Data to update
+
+        Returns:
+            Updated user data or None if failed
+        """
+        try:
+            # Format phone if present
+            if payload.get('phone'):
+                payload['phone'] = _format_phone(payload['phone'])
+
+            logger.info(f"Updating user {user_id} with data: {json.dumps(payload, ensure_ascii=False)}")
+
+            self._invalidate_lookups(payload, user_id=user_id)
+            status, result, text = await self._request('PUT', f'/user/{user_id}/update', json_data=payload)
+            self._invalidate_lookups(payload, (result or {}).get('payload'), user_id=user_id)
+
+            if status == 200 and result is not None:
+                if result.get('success'):
+                    logger.info(f"User {user_id} updated successfully")
+                    return result.get('payload')
+                else:
+                    logger.error(f"API error: {result.get('message', 'Unknown error')}")
+                    return None
+            elif status == 404:
+                logger.error(f"User {user_id} not found")
+                return None
             else:
-                logger.error(f"API error: {result.get('message', 'Unknown error')}")
+                logger.error(f"Failed to update user. Status: {status}, Response: {text}")
                 return None
-        elif response.status_code == 404:
-            logger.error(f"User {user_id} not found")
-            return None
-        else:
-            logger.error(f"Failed to update user. Status: {response.status_code}, Response: {response.text}")
+
+        except Exception as e:
+            logger.error(f"Unexpected error in update_user: {e}")
             return None
-            
-    except Exception as e:
-        logger.error(f"Unexpected error in update_user: {e}")
-        return None
 
+    async def upsert_user(self, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Create or update user in Exode (upsert operation).
+        If user exists (found by email/phone/tgId), updates it.
+        If user doesn't exist, creates new one.
 
-def upsert_user(payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-    """
-    Create or update user in Exode (upsert operation).
-    If user exists (found by email/phone/tgId), updates it.
-    If user doesn't exist, creates new one.
-    
-    Args:
-        payload: User data including profile
-        
-    Returns:
-        User data with 'isCreated' flag or None if failed
-    """
-    try:
-        url = f'{EXODE_API_BASE_URL}/user/upsert'
-        headers = _get_headers()
-        
-        # Validate that we have at least one identifier
-        has_identifier = any([
-            payload.get('email'),
-            payload.get('phone'),
-            payload.get('tgId')
-        ])
-        
-        if not has_identifier:
-            logger.error("Upsert requires email, phone, or tgId")
-            return None
-        
-        # Format phone if present
-        if payload.get('phone'):
-            payload['phone'] = _format_phone(payload['phone'])
-        
-        # Clean empty strings
-        if payload.get('email') == '':
-            payload['email'] = None
-        if payload.get('phone') == '':
-            payload['phone'] = None
-        
-        logger.info(f"Upserting user with data: {json.dumps(payload, ensure_ascii=False)}")
-        
-        response = requests.put(url, json=payload, headers=headers, timeout=10)
-        
-        if response.status_code in [200, 201]:
-            result = response.json()
-            if result.get('success'):
-                is_created = result['payload'].get('isCreated', False)
-                action = "created" if is_created else "updated"
-                logger.info(f"User successfully {action}")
-                return result.get('payload')
+        Args:
+            payload: User data including profile
+
+        Returns:
+            User data with 'isCreated' flag or None if failed
+        """
+        try:
+            # Validate that we have at least one identifier
+            has_identifier = any([
+                payload.get('email'),
+                payload.get('phone'),
+                payload.get('tgId')
+            ])
+
+            if not has_identifier:
+                logger.error("Upsert requires email, phone, or tgId")
+                return None
+
+            _clean_login_fields(payload)
+
+            logger.info(f"Upserting user with data: {json.dumps(payload, ensure_ascii=False)}")
+
+            # Drop cached lookups before and after the write: a failed write may still have been applied
+            self._invalidate_lookups(payload)
+            status, result, text = await self._request('PUT', '/user/upsert', json_data=payload)
+            self._invalidate_lookups(payload, (result or {}).get('payload'))
+
+            if status in [200, 201] and result is not None:
+                if result.get('success'):
+                    is_created = result['payload'].get('isCreated', False)
+                    action = "created" if is_created else "updated"
+                    logger.info(f"User successfully {action}")
+                    return result.get('payload')
+                else:
+                    logger.error(f"API error: {result.get('message', 'Unknown error')}")
+                    return None
+            elif status == 400:
+                logger.error(f"Validation error: {result or text}")
+                return None
             else:
-                logger.error(f"API error: {result.get('message', 'Unknown error')}")
+                logger.error(f"Failed to upsert user. Status: {status}, Response: {text}")
                 return None
-        elif response.status_code == 400:
-            error_data = response.json()
-            logger.error(f"Validation error: {error_data}")
-            return None
-        else:
-            logger.error(f"Failed to upsert user. Status: {response.status_code}, Response: {response.text}")
+
+        except Exception as e:
+            logger.error(f"Unexpected error in upsert_user: {e}")
             return None
-            
-    except Exception as e:
-        logger.error(f"Unexpected error in upsert_user: {e}")
-        return None
 
+    async def create_session_token(self, user_id: int, force_create: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Create or get session token for user.
 
-def create_session_token(user_id: int, force_create: bool = False) -> Optional[Dict[str, Any]]:
-    """
-    Create or get session token for user.
-    
-    Args:
-        user_id: Exode user ID
-        force_create: Force create new session even if one exists
-        
-    Returns:
-        Session data with token or None if failed
-    """
-    try:
-        url = f'{EXODE_API_BASE_URL}/user/session/auth-token'
-        headers = _get_headers()
-        data = {
-            'userId': user_id,
-            'forceCreate': force_create
-        }
-        
-        logger.info(f"Creating session token for user {user_id}")
-        
-        response = requests.post(url, json=data, headers=headers, timeout=10)
-        
-        if response.status_code == 200:
-            result = response.json()
-            if result.get('success'):
-                is_created = result['payload'].get('isCreated', False)
-                action = "created" if is_created else "retrieved"
-                logger.info(f"Session {action} successfully")
-                return result.get('payload')
+        Args:
+            user_id: Exode user ID
+            force_create: Force create new session even if one exists
+
+        Returns:
+            Session data with token or None if failed
+        """
+        try:
+            data = {
+                'userId': user_id,
+                'forceCreate': force_create
+            }
+
+            logger.info(f"Creating session token for user {user_id}")
+
+            status, result, _ = await self._request('POST', '/user/session/auth-token', json_data=data, idempotent=False)
+
+            if status == 200 and result is not None:
+                if result.get('success'):
+                    is_created = result['payload'].get('isCreated', False)
+                    action = "created" if is_created else "retrieved"
+                    logger.info(f"Session {action} successfully")
+                    return result.get('payload')
+                else:
+                    logger.error(f"API error: {result.get('message', 'Unknown error')}")
+                    return None
             else:
-                logger.error(f"API error: {result.get('message', 'Unknown error')}")
+                logger.error(f"Failed to create session. Status: {status}")
                 return None
-        else:
-            logger.error(f"Failed to create session. Status: {response.status_code}")
+
+        except Exception as e:
+            logger.error(f"Unexpected error in create_session_token: {e}")
             return None
-            
-    except Exception as e:
-        logger.error(f"Unexpected error in create_session_token: {e}")
-        return None
 
+    async def get_user_state(self, user_id: int, key: str) -> Optional[Any]:
+        """
+        Get user state by key.
 
-def get_user_state(user_id: int, key: str) -> Optional[Any]:
-    """
-    Get user state by key.
-    
-    Args:
-        user_id: Exode user ID
-        key: State key
-        
-    Returns:
-        State value or None if not found/error
-    """
-    try:
-        url = f'{EXODE_API_BASE_URL}/user/{user_id}/state/get'
-        headers = _get_headers()
-        params = {'key': key}
-        
-        logger.info(f"Getting state for user {user_id}, key: {key}")
-        
-        response = requests.get(url, params=params, headers=headers, timeout=10)
-        
-        if response.status_code == 200:
-            result = response.json()
-            if result.get('success'):
-                return result['payload'].get('value')
+        Args:
+            user_id: Exode user ID
+            key: State key
+
+        Returns:
+            State value or None if not found/error
+        """
+        try:
+            logger.info(f"Getting state for user {user_id}, key: {key}")
+
+            status, result, _ = await self._request('GET', f'/user/{user_id}/state/get', params={'key': key})
+
+            if status == 200 and result is not None:
+                if result.get('success'):
+                    return result['payload'].get('value')
+                else:
+                    logger.error(f"API error: {result.get('message', 'Unknown error')}")
+                    return None
             else:
-                logger.error(f"API error: {result.get('message', 'Unknown error')}")
+                logger.error(f"Failed to get state. Status: {status}")
                 return None
-        else:
-            logger.error(f"Failed to get state. Status: {response.status_code}")
+
+        except Exception as e:
+            logger.error(f"Unexpected error in get_user_state: {e}")
             return None
-            
-    except Exception as e:
-        logger.error(f"Unexpected error in get_user_state: {e}")
-        return None
 
+    async def set_user_state(self, user_id: int, key: str, value: Any) -> bool:
+        """
+        Set user state by key.
 
-def set_user_state(user_id: int, key: str, value: Any) -> bool:
-    """
-    Set user state by key.
-    
-    Args:
-        user_id: Exode user ID
-        key: State key
-        value: Value to set
-        
-    Returns:
-        True if successful, False otherwise
-    """
-    try:
-        url = f'{EXODE_API_BASE_URL}/user/{user_id}/state/set'
-        headers = _get_headers()
-        params = {'key': key}
-        data = {'value': value}
-        
-        logger.info(f"Setting state for user {user_id}, key: {key}, value: {value}")
-        
-        response = requests.put(url, params=params, json=data, headers=headers, timeout=10)
-        
-        if response.status_code == 200:
-            result = response.json()
-            if result.get('success'):
-                logger.info("State set successfully")
-                return result['payload'].get('set', False)
+        Args:
+            user_id: Exode user ID
+            key: State key
+            value: Value to set
+
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            logger.info(f"Setting state for user {user_id}, key: {key}, value: {value}")
+
+            status, result, _ = await self._request(
+                'PUT', f'/user/{user_id}/state/set', params={'key': key}, json_data={'value': value}
+            )
+
+            if status == 200 and result is not None:
+                if result.get('success'):
+                    logger.info("State set successfully")
+                    return result['payload'].get('set', False)
+                else:
+                    logger.error(f"API error: {result.get('message', 'Unknown error')}")
+                    return False
             else:
-                logger.error(f"API error: {result.get('message', 'Unknown error')}")
+                logger.error(f"Failed to set state. Status: {status}")
                 return False
-        else:
-            logger.error(f"Failed to set state. Status: {response.status_code}")
+
+        except Exception as e:
+            logger.error(f"Unexpected error in set_user_state: {e}")
             return False
-            
-    except Exception as e:
-        logger.error(f"Unexpected error in set_user_state: {e}")
-        return False
 
+    # Helper function to generate auth link
+    async def generate_auth_link(self, user_id: int, base_url: str = "https://my-school.com/education") -> Optional[str]:
+        """
+        Generate automatic authentication link for user.
 
-# Helper function to generate auth link
-def generate_auth_link(user_id: int, base_url: str = "https://my-school.com/education") -> Optional[str]:
-    """
-    Generate automatic authentication link for user.
-    
-    Args:
-        user_id: Exode user ID
-        base_url: Base URL of the application
-        
-    Returns:
-        Auth link or None if failed
-    """
-    session = create_session_token(user_id)
-    if session and session.get('session'):
-        token = session['session'].get('token')
-        if token:
-            return f"{base_url}?___uat={token}"
-    return None
+        Args:
+            user_id: Exode user ID
+            base_url: Base URL of the application
 
+        Returns:
+            Auth link or None if failed
+        """
+        session = await self.create_session_token(user_id)
+        if session and session.get('session'):
+            token = session['session'].get('token')
+            if token:
+                return f"{base_url}?___uat={token}"
+        return None
 
-# Test function for debugging
-def test_connection() -> bool:
-    """
-    Test Exode API connection.
-    
-    Returns:
-        True if connection successful, False otherwise
-    """
-    try:
-        headers = _get_headers()
-        
-        # Try to find a non-existent user to test auth
-        url = f'{EXODE_API_BASE_URL}/user/find'
-        params = {'login': 'test@nonexistent.com'}
-        
-        response = requests.get(url, params=params, headers=headers, timeout=5)
-        
-        if response.status_code == 200:
-            logger.info("Exode API connection successful")
-            return True
-        elif response.status_code == 401:
-            logger.error("Authentication failed - check API token")
-            return False
-        elif response.status_code == 403:
-            logger.error("Access denied - check seller/school IDs")
-            return False
-        else:
-            logger.error(f"Unexpected status: {response.status_code}")
+    # Test function for debugging
+    async def test_connection(self) -> bool:
+        """
+        Test Exode API connection.
+
+        Returns:
+            True if connection successful, False otherwise
+        """
+        try:
+            # Try to find a non-existent user to test auth
+            status, _, _ = await self._request('GET', '/user/find', params={'login': 'test@nonexistent.com'})
+
+            if status == 200:
+                logger.info("Exode API connection successful")
+                return True
+            elif status == 401:
+                logger.error("Authentication failed - check API token")
+                return False
+            elif status == 403:
+                logger.error("Access denied - check seller/school IDs")
+                return False
+            else:
+                logger.error(f"Unexpected status: {status}")
+                return False
+
+        except Exception as e:
+            logger.error(f"Connection test failed: {e}")
             return False
-            
-    except Exception as e:
-        logger.error(f"Connection test failed: {e}")
-        return False
\ No newline at end of file
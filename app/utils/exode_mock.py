@@ -0,0 +1,144 @@
+"""
+Local mock of the Exode API for development and manual testing.
+
+Implements the endpoints used by ExodeClient with an in-memory user store.
+Failures can be injected to exercise retries: `fail_next` answers the next
+N requests with 503, and `delay` slows every response down.
+
+Run it and point the bot at it:
+    python -m app.utils.exode_mock --port 8081
+    EXODE_API_BASE_URL=http://127.0.0.1:8081 python bot.py
+"""
+
+import argparse
+import asyncio
+import itertools
+import uuid
+from typing import Any, Dict, Optional
+
+from aiohttp import web
+
+
+class ExodeMockServer:
+    """In-memory Exode API served by aiohttp.web."""
+
+    def __init__(self, fail_next: int = 0, delay: float = 0.0):
+        self.users: Dict[int, Dict[str, Any]] = {}
+        self.states: Dict[tuple, Any] = {}
+        self.fail_next = fail_next
+        self.delay = delay
+        self.request_count = 0
+        self._ids = itertools.count(1)
+        self._runner: Optional[web.AppRunner] = None
+        self.app = web.Application(middlewares=[self._faults])
+        self.app.add_routes([
+            web.get('/user/find', self.find_user),
+            web.post('/user/create', self.create_user),
+            web.put('/user/upsert', self.upsert_user),
+            web.put('/user/{user_id}/update', self.update_user),
+            web.post('/user/session/auth-token', self.auth_token),
+            web.get('/user/{user_id}/state/get', self.get_state),
+            web.put('/user/{user_id}/state/set', self.set_state),
+        ])
+
+    @web.middleware
+    async def _faults(self, request: web.Request, handler):
+        self.request_count += 1
+        if self.fail_next > 0:
+            self.fail_next -= 1
+            response = web.json_response({'success': False, 'message': 'Injected failure'}, status=503)
+        else:
+            response = await handler(request)
+        # The request is already applied: a client timeout here looks like a lost response
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return response
+
+    @staticmethod
+    def _ok(payload: Any, status: int = 200) -> web.Response:
+        return web.json_response({'success': True, 'payload': payload}, status=status)
+
+    def _find(self, login: Optional[str] = None, tg_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        for user in self.users.values():
+            if login and login in (user.get('phone'), user.get('email')):
+                return user
+            if tg_id and str(user.get('tgId')) == str(tg_id):
+                return user
+        return None
+
+    def _create(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        user_id = next(self._ids)
+        user = {
+            'id': user_id,
+            'phone': data.get('phone'),
+            'email': data.get('email'),
+            'tgId': data.get('tgId'),
+            'profile': data.get('profile') or {}
+        }
+        self.users[user_id] = user
+        return user
+
+    async def find_user(self, request: web.Request) -> web.Response:
+        user = self._find(request.query.get('login'), request.query.get('tgId'))
+        return self._ok({'user': user} if user else None)
+
+    async def create_user(self, request: web.Request) -> web.Response:
+        data = await request.json()
+        for field, error in (('phone', 'PhoneIsBusy'), ('email', 'EmailIsBusy')):
+            if data.get(field) and self._find(login=data[field]):
+                return web.json_response({'success': False, 'message': error}, status=400)
+        return self._ok({'user': self._create(data)}, status=201)
+
+    async def upsert_user(self, request: web.Request) -> web.Response:
+        data = await request.json()
+        user = self._find(data.get('phone') or data.get('email'), data.get('tgId'))
+        if user is None:
+            return self._ok({'user': self._create(data), 'isCreated': True})
+        profile = dict(user['profile'], **(data.get('profile') or {}))
+        user.update({key: value for key, value in data.items() if value is not None}, profile=profile)
+        return self._ok({'user': user, 'isCreated': False})
+
+    async def update_user(self, request: web.Request) -> web.Response:
+        user = self.users.get(int(request.match_info['user_id']))
+        if user is None:
+            return web.json_response({'success': False, 'message': 'UserNotFound'}, status=404)
+        user.update(await request.json())
+        return self._ok({'user': user})
+
+    async def auth_token(self, request: web.Request) -> web.Response:
+        data = await request.json()
+        if int(data.get('userId', 0)) not in self.users:
+            return web.json_response({'success': False, 'message': 'UserNotFound'}, status=404)
+        return self._ok({'session': {'token': uuid.uuid4().hex}, 'isCreated': True})
+
+    async def get_state(self, request: web.Request) -> web.Response:
+        key = (request.match_info['user_id'], request.query.get('key'))
+        return self._ok({'value': self.states.get(key)})
+
+    async def set_state(self, request: web.Request) -> web.Response:
+        key = (request.match_info['user_id'], request.query.get('key'))
+        self.states[key] = (await request.json()).get('value')
+        return self._ok({'set': True})
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """Start serving in the current event loop. Returns the base URL."""
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_port = self._runner.addresses[0][1]
+        return f'http://{host}:{bound_port}'
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local Exode API mock')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--delay', type=float, default=0.0, help='Seconds to wait before every response')
+    args = parser.parse_args()
+    web.run_app(ExodeMockServer(delay=args.delay).app, host=args.host, port=args.port)
@@ -0,0 +1,176 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseEventIsolation, BaseStorage, StateType, StorageKey
+from aiogram.fsm.storage.memory import DisabledEventIsolation, MemoryStorage
+
+from app.core.config import FSM_STORAGE, FSM_STORAGE_PATH, FSM_STORAGE_TTL, REDIS_URL
+from app.utils.helpers import json_dumps
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fsm (
+    key TEXT PRIMARY KEY,
+    state TEXT,
+    data TEXT,
+    expires_at REAL
+)
+"""
+
+# Как часто (в записях) удалять просроченные сессии из файла
+_PURGE_EVERY = 500
+
+
+def _build_key(key: StorageKey) -> str:
+    return f"{key.bot_id}:{key.chat_id}:{key.user_id}:{key.thread_id or ''}:{key.destiny}"
+
+
+class SQLiteStorage(BaseStorage):
+    """
+    Хранилище FSM в локальном файле SQLite.
+
+    Состояние переживает перезапуск бота, а файл в режиме WAL можно
+    разделить между несколькими процессами на одной машине.
+    Каждая запись продлевает TTL ключа; брошенные сессии считаются
+    пустыми после истечения TTL и периодически удаляются.
+    Обращения из бота выполняются в отдельном потоке по одному, чтобы
+    ожидание диска (и блокировки файла другим процессом) не останавливало event loop.
+    """
+
+    def __init__(self, path: str, ttl: Optional[int] = None):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.ttl = ttl
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(_SCHEMA)
+        self._writes = 0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fsm-sqlite")
+
+    async def _run(self, func: Callable, *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def _expires_at(self) -> Optional[float]:
+        return time.time() + self.ttl if self.ttl else None
+
+    def _read(self, key: StorageKey, column: str) -> Optional[str]:
+        row = self._db.execute(
+            f"SELECT {column}, expires_at FROM fsm WHERE key = ?", (_build_key(key),)
+        ).fetchone()
+        if row is None or (row[1] is not None and row[1] < time.time()):
+            return None
+        return row[0]
+
+    def _write(self, key: StorageKey, column: str, value: Optional[str]):
+        storage_key = _build_key(key)
+        expired = self._db.execute(
+            "SELECT 1 FROM fsm WHERE key = ? AND expires_at < ?", (storage_key, time.time())
+        ).fetchone()
+        if expired:
+            # Просроченную сессию начинаем с чистого листа, а не продлеваем
+            self._db.execute("DELETE FROM fsm WHERE key = ?", (storage_key,))
+        self._db.execute(
+            f"INSERT INTO fsm (key, {column}, expires_at) VALUES (?, ?, ?) "
+            f"ON CONFLICT(key) DO UPDATE SET {column} = excluded.{column}, expires_at = excluded.expires_at",
+            (storage_key, value, self._expires_at())
+        )
+        self._writes += 1
+        if self._writes % _PURGE_EVERY == 0:
+            self.purge_expired()
+
+    def purge_expired(self) -> int:
+        """Удаляет просроченные и пустые сессии. Возвращает число удаленных записей."""
+        cursor = self._db.execute(
+            "DELETE FROM fsm WHERE expires_at < ? OR (state IS NULL AND data IS NULL)", (time.time(),)
+        )
+        return cursor.rowcount
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        await self._run(self._write, key, 'state', state.state if isinstance(state, State) else state)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return await self._run(self._read, key, 'state')
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        await self._run(self._write, key, 'data', json_dumps(data) if data else None)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        value = await self._run(self._read, key, 'data')
+        return json.loads(value) if value else {}
+
+    def iter_data(self) -> Iterator[Tuple[str, str]]:
+        """
+        (ключ, данные в JSON) всех непросроченных сессий с данными — для офлайн-обработки
+        (как и replace_data_many, синхронно: вызывается из CLI, а не из бота).
+        """
+        yield from self._db.execute(
+            "SELECT key, data FROM fsm WHERE data IS NOT NULL AND (expires_at IS NULL OR expires_at >= ?)",
+            (time.time(),)
+        )
+
+    def replace_data_many(self, updates: List[Tuple[str, str, Dict[str, Any]]]) -> int:
+        """
+        Пакетная замена данных сессий одной транзакцией: (ключ, прежний JSON, новые данные).
+        Сессия, изменившаяся после чтения (бот работает параллельно), пропускается; TTL не продлевается.
+        Возвращает число обновленных сессий.
+        """
+        with self._db:
+            self._db.execute("BEGIN")
+            updated = 0
+            for storage_key, old_value, data in updates:
+                updated += self._db.execute(
+                    "UPDATE fsm SET data = ? WHERE key = ? AND data = ?",
+                    (json_dumps(data), storage_key, old_value)
+                ).rowcount
+        return updated
+
+    async def close(self) -> None:
+        await self._run(self._db.close)
+        self._executor.shutdown(wait=False)
+
+
+def create_storage() -> BaseStorage:
+    """
+    Хранилище FSM по настройке FSM_STORAGE:
+    memory — в памяти процесса (как раньше), sqlite — локальный файл,
+    redis — любой сервер с протоколом Redis (нужен пакет redis), общий для нескольких воркеров.
+    """
+    backend = FSM_STORAGE.lower()
+    if backend == 'memory':
+        return MemoryStorage()
+    if backend == 'sqlite':
+        logger.info(f"FSM storage: SQLite ({FSM_STORAGE_PATH})")
+        return SQLiteStorage(FSM_STORAGE_PATH, ttl=FSM_STORAGE_TTL or None)
+    if backend == 'redis':
+        try:
+            from aiogram.fsm.storage.redis import DefaultKeyBuilder, RedisStorage
+        except ImportError as e:
+            raise RuntimeError("FSM_STORAGE=redis требует пакет redis (pip install redis)") from e
+        logger.info(f"FSM storage: Redis ({REDIS_URL})")
+        return RedisStorage.from_url(
+            REDIS_URL,
+            key_builder=DefaultKeyBuilder(with_destiny=True),
+            state_ttl=FSM_STORAGE_TTL or None,
+            data_ttl=FSM_STORAGE_TTL or None,
+            json_dumps=json_dumps,
+        )
+    raise ValueError(f"Unknown FSM_STORAGE backend: {FSM_STORAGE}")
+
+
+def create_event_isolation(storage: BaseStorage) -> BaseEventIsolation:
+    """
+    Изоляция событий одного пользователя. Для Redis — распределенная блокировка,
+    чтобы два воркера не обрабатывали апдейты одного чата одновременно.
+    """
+    if hasattr(storage, 'create_isolation'):
+        return storage.create_isolation()
+    return DisabledEventIsolation()
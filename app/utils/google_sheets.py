@@ -1,9 +1,32 @@
+import asyncio
+import functools
+import hashlib
+import json
 import logging
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime 
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Awaitable, Callable, Iterable, Tuple, Type, Union
 import gspread
+from gspread.utils import absolute_range_name, fill_gaps, numericise_all, rowcol_to_a1
 from google.oauth2.service_account import Credentials
-from app.core.config import GOOGLE_SHEETS_CREDENTIALS_PATH
+from app.core.config import (
+    GOOGLE_SHEETS_CREDENTIALS_PATH, GSHEETS_MAX_WORKERS, CATALOG_CACHE_TTL, GSHEETS_MAX_OPEN_SPREADSHEETS,
+    GSHEETS_BULK_CONCURRENCY, REGISTRATION_SYNC_INTERVAL, REGISTRATION_FULL_SYNC_INTERVAL, GSHEETS_READS_PER_MINUTE, GSHEETS_WRITES_PER_MINUTE, GSHEETS_BURST, COURSES_SHEET_ID, PROFESSIONS_SHEET_ID, PRIVATE_UNIVERSITIES_SHEET_ID,
+    FOREIGN_UNIVERSITIES_SHEET_ID, STATE_UNIVERSITIES_BY_CITY
+)
+from app.utils.catalog_cache import CacheEntry, CatalogCache
+from app.utils.catalog_snapshot import CatalogSnapshotStore, Snapshot
+from app.utils.records import Child, Course, Parent, Profession, Program, R, RecordReader, Student, University, reader_for
+from app.utils.sheets_scheduler import PRIORITY_USER, SheetsScheduler, background_priority, current_priority
+from app.utils.single_flight import SingleFlight
+from app.utils.profession_index import DirectionsIndex, build_directions_index
+from app.utils.university_index import ProgramsIndex, UniversitiesIndex, build_programs_index, build_universities_index
+from app.utils.write_queue import WriteBehindQueue, normalize_row
 
 try:
     from app.utils.test_content import SCALES_INFO
@@ -18,40 +41,216 @@ SCOPES = [
     'https://www.googleapis.com/auth/drive'
 ]
 
+# Отдельный пул потоков для блокирующих HTTP-вызовов gspread,
+# чтобы медленный ответ Google не останавливал event loop бота.
+_executor = ThreadPoolExecutor(max_workers=GSHEETS_MAX_WORKERS, thread_name_prefix="gsheets")
 
-class GoogleSheetsManager:
-    """Базовый класс для работы с Google Sheets."""
-    
-    def __init__(self, sheet_id: str):
-        self.sheet_id = sheet_id
-        self.client = None
-        self.sheet = None
-        if sheet_id: 
-            self._connect()
-    
-    def _connect(self):
-        """Подключение к Google Sheets."""
-        try:
+# Результат update_user_fields: строка обновлена в таблице / правка внесена в очередь записи
+UPDATE_WRITTEN = 'written'
+UPDATE_QUEUED = 'queued'
+
+
+async def run_blocking(func: Callable, *args, **kwargs) -> Any:
+    """Выполняет блокирующий вызов в пуле потоков Google Sheets."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+
+# Все обращения к Google Sheets API идут через общие планировщики чтения и записи:
+# они держат частоту запросов в пределах квоты и ставят запросы в очередь, а не роняют их
+read_scheduler = SheetsScheduler(
+    'reads', GSHEETS_READS_PER_MINUTE, run=run_blocking, burst=GSHEETS_BURST, max_concurrency=GSHEETS_MAX_WORKERS
+)
+write_scheduler = SheetsScheduler(
+    'writes', GSHEETS_WRITES_PER_MINUTE, run=run_blocking, burst=GSHEETS_BURST, max_concurrency=GSHEETS_MAX_WORKERS
+)
+
+# Одновременные чтения одного (таблица, вкладка, диапазон) выполняются одним запросом
+read_flights = SingleFlight()
+
+
+# Один авторизованный клиент gspread на процесс: файл ключа читается
+# и токен запрашивается один раз, а не в каждом менеджере
+_client: Optional[gspread.Client] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> gspread.Client:
+    """Общий авторизованный клиент Google Sheets (создается при первом обращении)."""
+    global _client
+    with _client_lock:
+        if _client is None:
             creds = Credentials.from_service_account_file(
                 GOOGLE_SHEETS_CREDENTIALS_PATH,
                 scopes=SCOPES
             )
-            self.client = gspread.authorize(creds)
-            self.sheet = self.client.open_by_key(self.sheet_id)
-            logger.info(f"Successfully connected to Google Sheet: {self.sheet_id}")
-        except Exception as e:
-            logger.error(f"Failed to connect to Google Sheets: {e}")
-            raise
+            _client = gspread.authorize(creds)
+            logger.info("Google Sheets client authorized")
+        return _client
+
+
+@dataclass
+class SpreadsheetHandle:
+    """Открытая таблица и ее вкладки по имени."""
+    spreadsheet: gspread.Spreadsheet
+    worksheets: Dict[str, gspread.Worksheet]
+
+
+class SpreadsheetHandles:
+    """
+    Потокобезопасный LRU-кэш открытых таблиц: sheet_id -> таблица и метаданные вкладок.
+
+    Таблица открывается один раз; дальше переход между таблицами ничего не стоит
+    и не меняет общего состояния, так что пользователи не мешают друг другу.
+    Все методы блокирующие — вызывать через run_blocking.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._handles: "OrderedDict[str, SpreadsheetHandle]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._open_locks: Dict[str, threading.Lock] = {}
+
+    def spreadsheet(self, sheet_id: str) -> gspread.Spreadsheet:
+        return self._get_handle(sheet_id).spreadsheet
+
+    def worksheet(self, sheet_id: str, title: Optional[str] = None) -> gspread.Worksheet:
+        """Вкладка по имени (без имени — первая вкладка)."""
+        handle = self._get_handle(sheet_id)
+        if title is None:
+            return handle.spreadsheet.get_worksheet(0)
+        worksheet = handle.worksheets.get(title)
+        if worksheet is None:
+            # Вкладку могли добавить после открытия — перечитываем метаданные
+            worksheet = self._refresh_worksheets(handle).get(title)
+            if worksheet is None:
+                raise gspread.exceptions.WorksheetNotFound(title)
+        return worksheet
+
+    def worksheet_titles(self, sheet_id: str, refresh: bool = True) -> List[str]:
+        """Список вкладок таблицы; с refresh=True метаданные запрашиваются заново."""
+        handle = self._get_handle(sheet_id)
+        return list(self._refresh_worksheets(handle) if refresh else handle.worksheets)
+
+    def invalidate(self, sheet_id: Optional[str] = None):
+        with self._lock:
+            if sheet_id is None:
+                self._handles.clear()
+            else:
+                self._handles.pop(sheet_id, None)
+
+    @staticmethod
+    def _refresh_worksheets(handle: SpreadsheetHandle) -> Dict[str, gspread.Worksheet]:
+        handle.worksheets = {worksheet.title: worksheet for worksheet in handle.spreadsheet.worksheets()}
+        return handle.worksheets
+
+    def _get_handle(self, sheet_id: str) -> SpreadsheetHandle:
+        with self._lock:
+            handle = self._handles.get(sheet_id)
+            if handle is not None:
+                self._handles.move_to_end(sheet_id)
+                return handle
+            open_lock = self._open_locks.setdefault(sheet_id, threading.Lock())
+
+        # Одну таблицу открывает один поток; разные таблицы открываются параллельно
+        with open_lock:
+            with self._lock:
+                handle = self._handles.get(sheet_id)
+            if handle is not None:
+                return handle
+            try:
+                spreadsheet = get_client().open_by_key(sheet_id)
+            except Exception as e:
+                logger.error(f"Failed to open Google Sheet {sheet_id}: {e}")
+                raise
+            handle = SpreadsheetHandle(spreadsheet, {})
+            self._refresh_worksheets(handle)
+            logger.info(f"Successfully connected to Google Sheet: {sheet_id}")
+            with self._lock:
+                self._handles[sheet_id] = handle
+                while len(self._handles) > self.max_size:
+                    self._handles.popitem(last=False)
+            return handle
+
+
+spreadsheet_handles = SpreadsheetHandles(max_size=GSHEETS_MAX_OPEN_SPREADSHEETS)
+
+
+async def _shared_read(key: tuple, call: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Чтение через read_flights. Приоритет входит в ключ: пользовательское чтение не
+    присоединяется к фоновому (иначе ждало бы за всей фоновой очередью), а фоновое
+    присоединяется к уже идущему пользовательскому.
+    """
+    priority = current_priority()
+    if priority != PRIORITY_USER and read_flights.running(key + (PRIORITY_USER,)):
+        priority = PRIORITY_USER
+    return await read_flights.do(key + (priority,), call)
+
+
+async def read_values(sheet_id: str, worksheet_name: Optional[str], range_name: Optional[str] = None) -> List[List]:
+    """
+    Значения вкладки (или диапазона A1 внутри нее) через планировщик чтения.
+    Одновременные чтения того же диапазона разделяют один запрос — результат нельзя изменять.
+    """
+    def fetch() -> List[List]:
+        return spreadsheet_handles.worksheet(sheet_id, worksheet_name).get_values(range_name)
+
+    return await _shared_read((sheet_id, worksheet_name, range_name), lambda: read_scheduler.submit(fetch))
+
+
+async def read_many_values(sheet_id: str, worksheet_names: List[str]) -> Dict[str, List[List]]:
+    """
+    Значения нескольких вкладок одной таблицы одним запросом values_batch_get.
+    Строки дополняются до одной длины, как в read_values. Результат нельзя изменять.
+    """
+    if not worksheet_names:
+        return {}
+    ranges = [absolute_range_name(name) for name in worksheet_names]
+    response = await _shared_read(
+        (sheet_id, None, tuple(ranges)),
+        lambda: read_scheduler.submit(lambda: spreadsheet_handles.spreadsheet(sheet_id).values_batch_get(ranges))
+    )
+    values = [value_range.get('values', []) for value_range in response.get('valueRanges', [])]
+    return {name: fill_gaps(rows) if rows else [] for name, rows in zip(worksheet_names, values)}
+
+
+# Общий кэш вкладок-каталогов (курсы, профессии) для всех менеджеров
+catalog_cache = CatalogCache(ttl=CATALOG_CACHE_TTL)
+
+
+class GoogleSheetsManager:
+    """Базовый класс для работы с Google Sheets."""
+    
+    def __init__(self, sheet_id: Optional[str]):
+        self.sheet_id = sheet_id
+        # Индексы и модели строятся один раз на версию вкладки: (sheet_id, вкладка, версия, builder) -> индекс
+        self._indexes: Dict[tuple, Any] = {}
+
+    @property
+    def client(self) -> gspread.Client:
+        return get_client()
+
+    @property
+    def sheet(self) -> Optional[gspread.Spreadsheet]:
+        """Таблица менеджера. Открывается при первом обращении — блокирующий вызов."""
+        return spreadsheet_handles.spreadsheet(self.sheet_id) if self.sheet_id else None
+
+    async def open(self):
+        """Открывает таблицу заранее, в пуле потоков."""
+        await read_scheduler.submit(lambda: self.sheet)
     
-    def get_all_records(self, worksheet_name: Optional[str] = None) -> List[Dict]:
+    def _get_worksheet(self, worksheet_name: Optional[str] = None):
+        """
+        Возвращает вкладку по имени (или первую вкладку). Блокирующий вызов.
+        Таблица и ее вкладки берутся из общего кэша открытых таблиц.
+        """
+        return spreadsheet_handles.worksheet(self.sheet_id, worksheet_name)
+
+    async def get_all_records(self, worksheet_name: Optional[str] = None) -> List[Dict]:
         """Получение всех записей из листа."""
         try:
-            if worksheet_name:
-                worksheet = self.sheet.worksheet(worksheet_name)
-            else:
-                worksheet = self.sheet.get_worksheet(0) 
-            
-            return worksheet.get_all_records()
+            return await self._read_records(self.sheet_id, worksheet_name)
         except gspread.exceptions.WorksheetNotFound:
              logger.error(f"Worksheet (вкладка) с именем '{worksheet_name}' не найдена.")
              return []
@@ -59,57 +258,457 @@ class GoogleSheetsManager:
             logger.error(f"Error getting records from {worksheet_name or 'default sheet'}: {e}")
             return []
     
-    def append_row(self, values: List, worksheet_name: Optional[str] = None):
-        """Добавление новой строки в таблицу."""
+    async def _read_records(self, sheet_id: str, worksheet_name: Optional[str]) -> List[Dict]:
+        """Записи вкладки по ID таблицы (в том же виде, что get_all_records())."""
+        return _to_records(await read_values(sheet_id, worksheet_name))
+
+    async def _write(self, worksheet_name: Optional[str], func: Callable) -> Any:
+        """
+        Запись через планировщик. После записи чтения этой вкладки, начатые раньше,
+        больше не разделяются с новыми вызывающими — те увидят свежие данные.
+        """
+        try:
+            return await write_scheduler.submit(func)
+        finally:
+            read_flights.forget(self.sheet_id, worksheet_name)
+            # Пакетные чтения нескольких вкладок (ключ без имени вкладки)
+            read_flights.forget(self.sheet_id, None)
+
+    async def get_catalog(self, worksheet_name: str, sheet_id: Optional[str] = None) -> Optional[CacheEntry]:
+        """
+        Вкладка-каталог из общего кэша вместе с номером версии (None при ошибке).
+        По умолчанию читается таблица менеджера, sheet_id позволяет указать другую.
+        """
+        try:
+            return await self._load_catalog(worksheet_name, sheet_id)
+        except gspread.exceptions.WorksheetNotFound:
+             logger.error(f"Worksheet (вкладка) с именем '{worksheet_name}' не найдена.")
+             return None
+        except Exception as e:
+            logger.error(f"Error getting cached records from {worksheet_name}: {e}")
+            return None
+
+    async def _load_catalog(self, worksheet_name: str, sheet_id: Optional[str] = None) -> CacheEntry:
+        """То же, что get_catalog(), но ошибка чтения пробрасывается (для загрузчиков составных каталогов)."""
+        sheet_id = sheet_id or self.sheet_id
+        return await catalog_cache.get_entry(
+            sheet_id, worksheet_name,
+            lambda: self._read_records(sheet_id, worksheet_name)
+        )
+
+    def resolve_catalog(self, worksheet_name: str, version: int, sheet_id: Optional[str] = None) -> Optional[List[Dict]]:
+        """Строки вкладки той версии, которую видел пользователь (None, если версия уже вытеснена)."""
+        return catalog_cache.get_version(sheet_id or self.sheet_id, worksheet_name, version)
+
+    def resolve_models(self, model: Type[R], worksheet_name: str, version: int, sheet_id: Optional[str] = None) -> Optional[List[R]]:
+        """Строки вкладки нужной версии в виде моделей (None, если версия уже вытеснена)."""
+        return self._get_index(sheet_id or self.sheet_id, worksheet_name, version, model.from_records)
+
+    def _get_index(self, sheet_id: str, worksheet_name: str, version: int, builder: Callable):
+        rows = self.resolve_catalog(worksheet_name, version, sheet_id)
+        if rows is None:
+            return None
+        key = (sheet_id, worksheet_name, version, builder)
+        index = self._indexes.get(key)
+        if index is None:
+            index = self._indexes[key] = builder(rows)
+            # Индексы вытесненных версий больше не понадобятся
+            for stale_key in [k for k in self._indexes if catalog_cache.get_version(*k[:3]) is None]:
+                del self._indexes[stale_key]
+        return index
+
+    async def get_cached_records(self, worksheet_name: str) -> List[Dict]:
+        """Получение записей листа-каталога через общий кэш."""
+        entry = await self.get_catalog(worksheet_name)
+        return entry.value if entry else []
+
+    def invalidate_cache(self, worksheet_name: Optional[str] = None) -> int:
+        """Сброс кэша каталога для этой таблицы (или одной ее вкладки)."""
+        return catalog_cache.invalidate(self.sheet_id, worksheet_name)
+    
+    async def append_row(self, values: List, worksheet_name: Optional[str] = None) -> Optional[Dict]:
+        """Добавление новой строки в таблицу. Возвращает ответ API (None при ошибке)."""
         try:
-            worksheet = self.sheet.worksheet(worksheet_name) if worksheet_name else self.sheet.get_worksheet(0)
-            worksheet.append_row(values)
+            response = await self._write(worksheet_name, lambda: self._get_worksheet(worksheet_name).append_row(values))
             logger.info(f"Row appended to {worksheet_name or 'default sheet'}")
+            return response
         except Exception as e:
             logger.error(f"Error appending row to {worksheet_name or 'default sheet'}: {e}")
+            return None
     
-    def update_cell(self, row: int, col: int, value: Any, worksheet_name: Optional[str] = None):
+    async def update_cell(self, row: int, col: int, value: Any, worksheet_name: Optional[str] = None):
         """Обновление конкретной ячейки."""
         try:
-            worksheet = self.sheet.worksheet(worksheet_name) if worksheet_name else self.sheet.get_worksheet(0)
-            worksheet.update_cell(row, col, value)
+            await self._write(worksheet_name, lambda: self._get_worksheet(worksheet_name).update_cell(row, col, value))
             logger.info(f"Cell ({row}, {col}) updated in {worksheet_name or 'default sheet'}")
         except Exception as e:
             logger.error(f"Error updating cell in {worksheet_name or 'default sheet'}: {e}")
 
 
+def _row_from_append_response(response: Optional[Dict]) -> Optional[int]:
+    """Номер строки, в которую API записал добавленные данные ('Лист'!A15:K15 -> 15)."""
+    updated_range = ((response or {}).get('updates') or {}).get('updatedRange', '')
+    match = re.search(r'![A-Z]+(\d+)', updated_range)
+    return int(match.group(1)) if match else None
+
+
+@functools.lru_cache(maxsize=256)
+def _duplicate_headers(headers: Tuple) -> Tuple:
+    """Повторяющиеся непустые заголовки (проверка один раз на набор заголовков)."""
+    counts = Counter(headers)
+    return tuple(header for header, count in counts.items() if header != '' and count > 1)
+
+
+def _check_headers(headers: List) -> None:
+    """
+    Как get_all_records(): повторяющийся заголовок — ошибка, иначе колонки молча
+    перезаписали бы друг друга в записи. Пустые заголовки (лишние колонки) допускаются.
+    """
+    duplicates = _duplicate_headers(tuple(headers))
+    if duplicates:
+        raise gspread.exceptions.GSpreadException(f"the header row in the worksheet contains duplicates: {list(duplicates)}")
+
+
+def _to_record(headers: List[str], row: List) -> Dict:
+    """Строка листа -> словарь в том же виде, что отдает get_all_records()."""
+    cells = ['' if value is None else str(value) for value in row]
+    cells += [''] * (len(headers) - len(cells))
+    return dict(zip(headers, numericise_all(cells[:len(headers)])))
+
+
+def _to_records(values: List[List]) -> List[Dict]:
+    """Значения вкладки (первая строка — заголовки) -> записи как у get_all_records()."""
+    if not values:
+        return []
+    _check_headers(values[0])
+    return [_to_record(values[0], row) for row in values[1:]]
+
+
+@dataclass
+class IndexedUser:
+    """
+    Запись индекса пользователей: роль, номер строки на листе и сама строка.
+    row равен None, пока строка ждет записи в очереди отложенной записи.
+    """
+    role: str
+    row: Optional[int]
+    record: Dict
+
+
+@dataclass
+class ProfileBundle:
+    """
+    Данные экрана профиля: строка пользователя, дети — для родителя,
+    контакт родителя — для ученика.
+    """
+    telegram_id: str
+    role: str
+    user: Union[Parent, Student]
+    children: List[Child]
+    parent_contact: Optional[str] = None
+
+
+def _rows_checksum(rows: List[List]) -> str:
+    cells = [['' if value is None else str(value) for value in row] for row in rows]
+    return hashlib.sha1(json.dumps(cells, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+@dataclass
+class WorksheetMirror:
+    """
+    Локальная копия листа, который только дописывается: заголовки и строки данных.
+    Новые строки подтягиваются чтением диапазона после последней известной строки.
+    """
+    headers: List[str]
+    rows: List[List]
+
+    @classmethod
+    def from_values(cls, values: List[List]) -> 'WorksheetMirror':
+        if values:
+            _check_headers(values[0])
+        return cls(headers=list(values[0]) if values else [], rows=[list(row) for row in values[1:]])
+
+    def matches(self, values: List[List]) -> bool:
+        """Совпадает ли копия с полным содержимым листа (сравнение контрольных сумм)."""
+        headers = list(values[0]) if values else []
+        return headers == self.headers and _rows_checksum(values[1:]) == _rows_checksum(self.rows)
+
+    @property
+    def next_row(self) -> int:
+        """Номер первой строки листа, которой еще нет в копии (заголовок — строка 1)."""
+        return len(self.rows) + 2
+
+    def new_rows_range(self) -> str:
+        last_column = re.sub(r'\d+', '', rowcol_to_a1(1, max(len(self.headers), 1)))
+        return f"A{self.next_row}:{last_column}"
+
+    def set_cells(self, row_number: int, cells: Dict[int, Any]):
+        """
+        Правка ячеек строки копии после записи в таблицу (номер строки листа, колонки с 1),
+        чтобы копия и ее контрольная сумма не расходились с листом.
+        """
+        index = row_number - 2
+        if not 0 <= index < len(self.rows):
+            return
+        row = self.rows[index]
+        for column, value in cells.items():
+            row.extend([''] * (column - len(row)))
+            row[column - 1] = '' if value is None else str(value)
+        # API не возвращает пустые ячейки в конце строки
+        while row and row[-1] == '':
+            row.pop()
+
+    def record(self, row: List) -> Dict:
+        return _to_record(self.headers, row)
+
+    def reader(self, model: Type[R]) -> RecordReader:
+        """Читатель строк копии в модель (заголовки сверяются один раз)."""
+        return reader_for(model, tuple(self.headers))
+
+
+# Sheet ID -> менеджер регистрации: индекс пользователей и очередь записи общие на процесс
+_registration_managers: Dict[str, 'RegistrationGSheet'] = {}
+
+
 class RegistrationGSheet(GoogleSheetsManager):
     """Класс для работы с таблицей регистрации пользователей."""
     
-    def __init__(self, sheet_id: str):
+    def __init__(self, sheet_id: str, write_queue: Optional[WriteBehindQueue] = None):
         super().__init__(sheet_id)
+        self.write_queue = write_queue
         self.parent_worksheet = 'Родитель'
         self.student_worksheet = 'Ученик'
         self.children_worksheet = 'Родитель-Ребенок'
+        # Индекс Telegram ID -> IndexedUser, строится один раз и поддерживается при записи
+        self._users_index: Optional[Dict[str, IndexedUser]] = None
+        self._headers: Dict[str, List[str]] = {}
+        self._header_columns: Dict[str, Dict[str, int]] = {}
+        self._index_lock = asyncio.Lock()
+        # Локальные копии листов регистрации; листы только дописываются,
+        # поэтому между полными сверками читаются лишь новые строки
+        self._mirrors: Dict[str, WorksheetMirror] = {}
+        self._full_synced_at = 0.0
+        self._sync_task: Optional[asyncio.Task] = None
+        # Parent Telegram ID -> записи детей; строки из очереди учитываются сразу,
+        # а при появлении в таблице узнаются по содержимому и не дублируются
+        self._children_index: Dict[str, List[Child]] = {}
+        self._queued_children: Dict[tuple, int] = {}
+        # Первый менеджер таблицы (обычно тот, что создал бот) обслуживает и функции-обертки ниже
+        _registration_managers.setdefault(sheet_id, self)
+
+    @property
+    def _roles(self) -> Dict[str, str]:
+        # Родители имеют приоритет над учениками, как и при прежнем поиске
+        return {self.parent_worksheet: 'parent', self.student_worksheet: 'student'}
+
+    async def build_index(self):
+        """
+        Полное чтение листов регистрации и построение индекса пользователей.
+        Если индекс уже построен (в том числе, пока вызов ждал замок), листы не перечитываются —
+        дальше индекс поддерживает фоновая синхронизация.
+        """
+        async with self._index_lock:
+            if self._users_index is None:
+                await self._full_sync()
+
+    async def _full_sync(self) -> bool:
+        """
+        Полная сверка копий с таблицей (вызывать под _index_lock).
+        Индекс перестраивается, только если содержимое листов изменилось.
+        """
+        worksheet_names = [self.parent_worksheet, self.student_worksheet, self.children_worksheet]
+        all_values = await read_many_values(self.sheet_id, worksheet_names)
+        changed = False
+        for worksheet_name, values in all_values.items():
+            mirror = self._mirrors.get(worksheet_name)
+            if mirror is None or not mirror.matches(values):
+                self._mirrors[worksheet_name] = WorksheetMirror.from_values(values)
+                changed = True
+        self._full_synced_at = time.monotonic()
+        if changed or self._users_index is None:
+            self._rebuild_index()
+        return changed
+
+    def _rebuild_index(self):
+        index: Dict[str, IndexedUser] = {}
+        for worksheet_name, role in self._roles.items():
+            mirror = self._mirrors[worksheet_name]
+            self._headers[worksheet_name] = mirror.headers
+            for row_number, row in enumerate(mirror.rows, start=2):
+                self._add_to_index(index, role, row_number, mirror.record(row))
+            # Строки из очереди, которые еще не дошли до таблицы
+            for row in self._pending_rows(worksheet_name):
+                self._add_to_index(index, role, None, mirror.record(row))
+        self._users_index = index
+        self._header_columns.clear()
+
+        children = self._mirrors[self.children_worksheet]
+        self._children_index = {}
+        self._queued_children = {}
+        # Сначала строки из очереди: если какая-то уже дошла до таблицы, она не задвоится
+        self._index_children(self._pending_rows(self.children_worksheet), queued=True)
+        self._index_children(children.rows)
+        logger.info(f"Users index built: {len(index)} users, {len(children.rows)} children")
+
+    def _index_children(self, rows: List[List], queued: bool = False):
+        reader = self._mirrors[self.children_worksheet].reader(Child)
+        for row in rows:
+            key = normalize_row(row)
+            if not queued and self._queued_children.get(key):
+                # Строка из очереди дошла до таблицы — она уже в индексе
+                self._queued_children[key] -= 1
+                continue
+            if queued:
+                self._queued_children[key] = self._queued_children.get(key, 0) + 1
+            child = reader.from_row(row)
+            self._children_index.setdefault(child.parent_id.strip(), []).append(child)
+
+    async def _sync_new_rows(self, worksheet_name: str) -> int:
+        """Дочитывает строки, появившиеся после последней известной (вызывать под _index_lock)."""
+        mirror = self._mirrors.get(worksheet_name)
+        if mirror is None:
+            return 0
+        first_row = mirror.next_row
+        rows = await read_values(self.sheet_id, worksheet_name, mirror.new_rows_range())
+        if not rows:
+            return 0
+        mirror.rows.extend(list(row) for row in rows)
+        if worksheet_name == self.children_worksheet:
+            self._index_children(rows)
+        role = self._roles.get(worksheet_name)
+        if role and self._users_index is not None:
+            for offset, row in enumerate(rows):
+                record = mirror.record(row)
+                entry = self._users_index.get(str(record.get('Telegram ID', '')).strip())
+                if entry and entry.role == role and entry.row is None:
+                    # Наша строка из очереди дошла до таблицы
+                    entry.row = first_row + offset
+                else:
+                    self._add_to_index(self._users_index, role, first_row + offset, record)
+        logger.info(f"Registration sync: {len(rows)} new rows in '{worksheet_name}'")
+        return len(rows)
+
+    async def _mirror_appended(self, worksheet_name: str, first_row: Optional[int], rows: List[List]):
+        """Добавляет записанные ботом строки в копию листа без повторного чтения."""
+        async with self._index_lock:
+            mirror = self._mirrors.get(worksheet_name)
+            if mirror is None:
+                return
+            if first_row == mirror.next_row:
+                new_rows = [['' if value is None else str(value) for value in row] for row in rows]
+                mirror.rows.extend(new_rows)
+                if worksheet_name == self.children_worksheet:
+                    self._index_children(new_rows)
+            else:
+                # Перед нашими строками есть чужие — дочитываем все новое
+                await self._sync_new_rows(worksheet_name)
+
+    async def start_sync(self, interval: float = REGISTRATION_SYNC_INTERVAL, full_interval: float = REGISTRATION_FULL_SYNC_INTERVAL):
+        """Запускает фоновую синхронизацию: новые строки раз в interval, полная сверка раз в full_interval."""
+        if self._sync_task is None:
+            with background_priority():
+                self._sync_task = asyncio.create_task(self._sync_loop(interval, full_interval))
+
+    async def stop_sync(self):
+        if self._sync_task:
+            self._sync_task.cancel()
+            try:
+                await self._sync_task
+            except asyncio.CancelledError:
+                pass
+            self._sync_task = None
+
+    async def _sync_loop(self, interval: float, full_interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                async with self._index_lock:
+                    if time.monotonic() - self._full_synced_at >= full_interval:
+                        if await self._full_sync():
+                            logger.info("Registration sync: sheets were edited, users index rebuilt")
+                    else:
+                        for worksheet_name in list(self._mirrors):
+                            await self._sync_new_rows(worksheet_name)
+            except Exception as e:
+                logger.error(f"Registration sync failed: {e}")
+
+    async def _ensure_index(self) -> Dict[str, IndexedUser]:
+        if self._users_index is None:
+            await self.build_index()
+        return self._users_index
+
+    @staticmethod
+    def _add_to_index(index: Dict[str, IndexedUser], role: str, row: Optional[int], record: Dict):
+        telegram_id = str(record.get('Telegram ID', '')).strip()
+        # Первая найденная строка выигрывает, родитель — приоритетнее ученика
+        if telegram_id and telegram_id not in index:
+            index[telegram_id] = IndexedUser(role=role, row=row, record=record)
+
+    def _pending_rows(self, worksheet_name: str) -> List[List]:
+        return self.write_queue.pending_rows(worksheet_name) if self.write_queue else []
+
+    async def _write_user_row(self, role: str, worksheet_name: str, values: List) -> bool:
+        """
+        Записывает строку пользователя и добавляет ее в индекс.
+        С очередью строка только фиксируется в журнале, номер строки появится после записи.
+        """
+        await self._ensure_index()
+        if self.write_queue:
+            # Одна строка на пользователя: повторная отправка формы не задвоит ее
+            await self.write_queue.enqueue(worksheet_name, values, identity=[values[0]])
+            row = None
+        else:
+            response = await self.append_row(values, worksheet_name)
+            if response is None:
+                return False
+            row = _row_from_append_response(response)
+        record = _to_record(self._headers.get(worksheet_name, []), values)
+        self._add_to_index(self._users_index, role, row, record)
+        if row is not None:
+            await self._mirror_appended(worksheet_name, row, [values])
+        return True
+
+    async def start_write_behind(self):
+        """Запускает фоновую запись строк из очереди (если очередь подключена)."""
+        if self.write_queue:
+            # Фоновая запись уступает очередь запросам пользователей
+            with background_priority():
+                await self.write_queue.start(self._append_queued_rows, self._read_worksheet_values)
+
+    async def stop_write_behind(self):
+        """Дописывает оставшиеся строки и закрывает очередь."""
+        if self.write_queue:
+            await self.write_queue.stop()
+
+    async def _read_worksheet_values(self, worksheet_name: str) -> List[List]:
+        return await read_values(self.sheet_id, worksheet_name)
+
+    async def _append_queued_rows(self, worksheet_name: str, rows: List[List]):
+        """Пакетная запись строк из очереди; проставляет номера строк в индексе."""
+        response = await self._write(worksheet_name, lambda: self._get_worksheet(worksheet_name).append_rows(rows))
+        first_row = _row_from_append_response(response)
+        role = self._roles.get(worksheet_name)
+        if first_row is not None and role is not None and self._users_index is not None:
+            for offset, values in enumerate(rows):
+                entry = self._users_index.get(str(values[0]).strip())
+                if entry and entry.role == role and entry.row is None:
+                    entry.row = first_row + offset
+        # До отметки строк как записанных — иначе они на миг пропали бы и из очереди, и из копии
+        await self._mirror_appended(worksheet_name, first_row, rows)
     
-    def get_user_by_id(self, telegram_id: int) -> Optional[Dict]:
-        """Поиск пользователя по Telegram ID."""
+    async def get_user_by_id(self, telegram_id: int) -> Optional[Dict]:
+        """Поиск пользователя по Telegram ID (O(1) по индексу)."""
         try:
-            # Ищем среди родителей
-            parents = self.get_all_records(self.parent_worksheet)
-            for parent in parents:
-                if str(parent.get('Telegram ID')) == str(telegram_id):
-                    parent['role'] = 'parent'
-                    return parent
-            
-            # Ищем среди студентов
-            students = self.get_all_records(self.student_worksheet)
-            for student in students:
-                if str(student.get('Telegram ID')) == str(telegram_id):
-                    student['role'] = 'student'
-                    return student
-                    
-            return None
+            index = await self._ensure_index()
+            entry = index.get(str(telegram_id))
+            if not entry:
+                return None
+            return dict(entry.record, role=entry.role)
         except Exception as e:
             logger.error(f"Error getting user by ID: {e}")
             return None
     
-    def add_parent(self, data: Dict) -> bool:
+    async def add_parent(self, data: Dict) -> bool:
         """Добавление нового родителя."""
         try:
             # Убеждаемся, что 'role' есть в словаре
@@ -128,13 +727,12 @@ class RegistrationGSheet(GoogleSheetsManager):
                 data.get('role', 'parent'),          # Колонка G: role
                 datetime.now().strftime("%Y-%m-%d %H:%M:%S") # Колонка H: Время
             ]
-            self.append_row(values, self.parent_worksheet)
-            return True
+            return await self._write_user_row('parent', self.parent_worksheet, values)
         except Exception as e:
             logger.error(f"Error adding parent: {e}")
             return False
 
-    def add_student(self, data: Dict) -> bool:
+    async def add_student(self, data: Dict) -> bool:
         """Добавление нового студента."""
         try:
             # Убеждаемся, что 'role' есть в словаре
@@ -156,13 +754,12 @@ class RegistrationGSheet(GoogleSheetsManager):
                 data.get('Имя родителя', data.get('parent_name', '')), # J
                 data.get('Телефон родителя', data.get('parent_phone', '')) # K
             ]
-            self.append_row(values, self.student_worksheet)
-            return True
+            return await self._write_user_row('student', self.student_worksheet, values)
         except Exception as e:
             logger.error(f"Error adding student: {e}")
             return False
     
-    def add_child(self, parent_id: int, data: Dict) -> bool:
+    async def add_child(self, parent_id: int, data: Dict) -> bool:
         """Добавление ребенка к родителю."""
         try:
             # Приводим дату к ДД.ММ.ГГГГ, если она YYYY-MM-DD
@@ -189,67 +786,126 @@ class RegistrationGSheet(GoogleSheetsManager):
                 data.get('exode_user_id', ''), # 'Exode ID'
                 data.get('child_phone', '') # 'Телефон ребенка'
             ]
-            self.append_row(values, self.children_worksheet)
+            if self.write_queue:
+                await self._ensure_index()
+                # Ребенок определяется родителем, именем и датой рождения (без времени регистрации)
+                if await self.write_queue.enqueue(self.children_worksheet, values, identity=values[:4]):
+                    self._index_children([values], queued=True)
+                return True
+            response = await self.append_row(values, self.children_worksheet)
+            if response is None:
+                return False
+            await self._mirror_appended(self.children_worksheet, _row_from_append_response(response), [values])
             return True
         except Exception as e:
             logger.error(f"Error adding child: {e}")
             return False
     
 
-    def get_children_by_parent_id(self, parent_id: int) -> List[Dict]:
+    async def get_children_by_parent_id(self, parent_id: int) -> List[Child]:
         """Получение списка детей родителя."""
         try:
-            children = self.get_all_records(self.children_worksheet)
-            return [
-                child for child in children 
-
-                if str(child.get('Parent Telegram ID')) == str(parent_id)
-            ]
+            await self._ensure_index()
+            # Из индекса в памяти, включая детей, которые еще ждут записи в очереди
+            return list(self._children_index.get(str(parent_id), []))
         except Exception as e:
             logger.error(f"Error getting children: {e}")
             return []
 
     
-    def update_user_data(self, user_id: int, field_name: str, new_value: str) -> bool:
-        """Обновление данных пользователя."""
+    async def update_user_data(self, user_id: int, field_name: str, new_value: str) -> Optional[str]:
+        """Обновление одного поля пользователя (один запрос к API)."""
+        return await self.update_user_fields(user_id, {field_name: new_value})
+
+    async def update_user_fields(self, user_id: int, fields: Dict[str, Any]) -> Optional[str]:
+        """
+        Обновление нескольких полей пользователя одним пакетным запросом.
+        Строка берется из индекса, колонки — из кэша заголовков листа.
+        Возвращает UPDATE_WRITTEN, UPDATE_QUEUED (строка еще в очереди, таблица
+        недоступна — правка внесена в очередь) или None при ошибке.
+        """
         try:
-            user_data = self.get_user_by_id(user_id)
-            if not user_data:
-                return False
-            
-            worksheet_name = self.parent_worksheet if user_data['role'] == 'parent' else self.student_worksheet
-            worksheet = self.sheet.worksheet(worksheet_name)
-            
-            records = worksheet.get_all_records()
-            row_index = None
-            
-            for i, record in enumerate(records, start=2):
-                if str(record.get('Telegram ID')) == str(user_id):
-                    row_index = i
-                    break
-            
-            if row_index:
-                headers = worksheet.row_values(1)
-                if field_name in headers:
-                    col_index = headers.index(field_name) + 1
-                    worksheet.update_cell(row_index, col_index, new_value)
-                    return True
-                    
-            return False
+            index = await self._ensure_index()
+            entry = index.get(str(user_id))
+            if not entry or not fields:
+                return None
+
+            worksheet_name = self.parent_worksheet if entry.role == 'parent' else self.student_worksheet
+            columns = self._columns_for(worksheet_name)
+            if any(field_name not in columns for field_name in fields):
+                return None
+
+            if entry.row is None and self.write_queue:
+                # Строка еще в очереди — сначала дописываем ее, чтобы узнать номер
+                identity = [user_id]
+                if not await self.write_queue.flush_entry(worksheet_name, identity):
+                    changes = {columns[field_name] - 1: value for field_name, value in fields.items()}
+                    if not await self.write_queue.update_pending(worksheet_name, identity, changes):
+                        return None
+                    entry.record.update(fields)
+                    return UPDATE_QUEUED
+            if entry.row is None:
+                return None
+
+            data = [
+                {'range': rowcol_to_a1(entry.row, columns[field_name]), 'values': [[value]]}
+                for field_name, value in fields.items()
+            ]
+            await self._write(
+                worksheet_name,
+                lambda: self._get_worksheet(worksheet_name).batch_update(data, value_input_option='USER_ENTERED')
+            )
+            entry.record.update(fields)
+            mirror = self._mirrors.get(worksheet_name)
+            if mirror is not None:
+                mirror.set_cells(entry.row, {columns[field_name]: value for field_name, value in fields.items()})
+            return UPDATE_WRITTEN
         except Exception as e:
             logger.error(f"Error updating user data: {e}")
-            return False
+            return None
+
+    def _columns_for(self, worksheet_name: str) -> Dict[str, int]:
+        """Кэшированная карта 'заголовок -> номер колонки' (с 1) для листа."""
+        if worksheet_name not in self._header_columns:
+            headers = self._headers.get(worksheet_name, [])
+            self._header_columns[worksheet_name] = {
+                header: i for i, header in reversed(list(enumerate(headers, start=1)))
+            }
+        return self._header_columns[worksheet_name]
     
-    def get_student_parent_contact(self, student_id: int) -> Optional[str]:
+    async def load_profile_bundle(self, telegram_id: int) -> Optional[ProfileBundle]:
+        """
+        Все данные экрана профиля за один раз: из индекса в памяти, без чтений таблицы.
+        Если индекс еще не построен — одно пакетное чтение всех вкладок регистрации.
+        """
+        try:
+            index = await self._ensure_index()
+            key = str(telegram_id)
+            entry = index.get(key)
+            if not entry:
+                return None
+            model = Student if entry.role == 'student' else Parent
+            user = reader_for(model, tuple(entry.record)).from_record(entry.record)
+            bundle = ProfileBundle(telegram_id=key, role=entry.role, user=user, children=[])
+            if entry.role == 'parent':
+                bundle.children = list(self._children_index.get(key, []))
+            elif entry.role == 'student':
+                bundle.parent_contact = user.parent_contact
+            return bundle
+        except Exception as e:
+            logger.error(f"Error loading profile bundle: {e}")
+            return None
+
+    async def get_student_parent_contact(self, student_id: int) -> Optional[str]:
         """Получение контакта родителя студента."""
         try:
-            students = self.get_all_records(self.student_worksheet)
-            for student in students:
-                if str(student.get('Telegram ID')) == str(student_id):
-                    parent_name = student.get('Имя родителя', '')
-                    parent_phone = student.get('Телефон родителя', '')
-                    if parent_name or parent_phone:
-                        return f"{parent_name} {parent_phone}".strip()
+            await self._ensure_index()
+            mirror = self._mirrors[self.student_worksheet]
+            reader = mirror.reader(Student)
+            for row in mirror.rows + self._pending_rows(self.student_worksheet):
+                student = reader.from_row(row)
+                if student.telegram_id.strip() == str(student_id):
+                    return student.parent_contact
             return None
         except Exception as e:
             logger.error(f"Error getting parent contact: {e}")
@@ -258,85 +914,84 @@ class RegistrationGSheet(GoogleSheetsManager):
 
 class UniversitiesGSheet(GoogleSheetsManager):
 
+    UNIVERSITIES_WORKSHEET = 'Universities'
     
-    def __init__(self, sheet_id: str):
-        # Инициализируем клиент, но не открываем конкретный sheet
-        self.client = None
-        if sheet_id: # sheet_id здесь - "фиктивный", для инициализации
-            try:
-                creds = Credentials.from_service_account_file(
-                    GOOGLE_SHEETS_CREDENTIALS_PATH,
-                    scopes=SCOPES
-                )
-                self.client = gspread.authorize(creds)
-                # Открываем "фиктивную" таблицу (e.g., REGISTRATION_SHEET_ID)
-                self.sheet = self.client.open_by_key(sheet_id) 
-                logger.info(f"UniversitiesGSheet manager initialized with base sheet: {sheet_id}")
-            except Exception as e:
-                logger.error(f"Failed to initialize UniversitiesGSheet manager: {e}")
-                raise
-    
-    def _open_sheet_by_id(self, sheet_id: str):
-        """Внутренний метод для открытия (или переключения) таблицы по ID."""
-        try:
-            self.sheet = self.client.open_by_key(sheet_id)
-            logger.info(f"Switched to Google Sheet: {sheet_id}")
-            return True
-        except gspread.exceptions.SpreadsheetNotFound:
-             logger.error(f"Spreadsheet with ID {sheet_id} not found or no access.")
-             self.sheet = None
-             return False
-        except Exception as e:
-            logger.error(f"Failed to open sheet by ID {sheet_id}: {e}")
-            self.sheet = None # Сбрасываем, если не удалось
-            return False
-    
-    def get_universities_by_city_and_type(self, sheet_id: str, city: str = None) -> List[Dict]:
+    def __init__(self):
+        # Своей таблицы нет: ID таблицы вузов передается в каждый метод явно
+        super().__init__(None)
 
-        try:
-            # <-- Переключаемся на нужную таблицу (e.g., Tashkent)
-            if not self._open_sheet_by_id(sheet_id): 
-                return []
+    def universities_index(self, sheet_id: str, version: int) -> Optional[UniversitiesIndex]:
+        """Индекс вузов таблицы для версии каталога (None, если версия уже вытеснена)."""
+        return self._get_index(sheet_id, self.UNIVERSITIES_WORKSHEET, version, build_universities_index)
 
-            universities = self.get_all_records("Universities") 
+    def programs_index(self, sheet_id: str, sheet_name: str, version: int) -> Optional[ProgramsIndex]:
+        """Индекс факультетов и программ вуза (вкладка sheet_name) для версии каталога."""
+        return self._get_index(sheet_id, sheet_name, version, build_programs_index)
 
-            
-            if city:
-                # Фильтруем по городу (важно для Частных и Иностранных)
-                universities = [
-                    uni for uni in universities 
-                    if uni.get('Город', '').lower() == city.lower()
-                ]
-            
-            return universities
-        except Exception as e:
-            logger.error(f"Error getting universities: {e}")
-            return []
-    
+    async def load_all(self, sheet_ids: Iterable[str], concurrency: int = GSHEETS_BULK_CONCURRENCY) -> Dict[tuple, List[Dict]]:
+        """
+        Массовая загрузка каталога: вкладка 'Universities' и все вкладки программ
+        каждой таблицы через values_batch_get (по два запроса на таблицу).
+        Таблицы грузятся параллельно, не больше concurrency одновременно.
+        Возвращает {(sheet_id, вкладка): записи}; таблицы с ошибкой пропускаются.
+        """
+        sheet_ids = list(dict.fromkeys(sheet_id for sheet_id in sheet_ids if sheet_id))
+        semaphore = asyncio.Semaphore(concurrency)
 
-    def get_faculties_by_sheet_name(self, sheet_name: str) -> List[Dict]:
+        async def load(sheet_id: str) -> Dict[tuple, List[Dict]]:
+            async with semaphore:
+                return await self._load_spreadsheet(sheet_id)
 
-        if not self.sheet:
-            logger.error("No sheet is currently open. Call get_universities... first.")
-            return []
-            
-        try:
-            # Ищем вкладку (worksheet) по ее ИМЕНИ (e.g., "НацУнивер")
-            worksheet = self.sheet.worksheet(sheet_name)
-            # Получаем все строки из этой вкладки
-            faculties_and_programs = worksheet.get_all_records()
-            logger.info(f"Successfully loaded {len(faculties_and_programs)} programs from worksheet '{sheet_name}'")
-            
-            # Возвращаем список словарей (1 строка = 1 программа)
-            return faculties_and_programs
-            
-        except gspread.exceptions.WorksheetNotFound:
-            logger.error(f"Worksheet (вкладка) с именем '{sheet_name}' не найдена в файле {self.sheet.title}.")
-            return []
-        except Exception as e:
-            logger.error(f"Error getting faculties from worksheet '{sheet_name}': {e}")
-            return []
+        results = await asyncio.gather(*(load(sheet_id) for sheet_id in sheet_ids), return_exceptions=True)
+        worksheets: Dict[tuple, List[Dict]] = {}
+        for sheet_id, result in zip(sheet_ids, results):
+            if isinstance(result, Exception):
+                logger.error(f"Bulk load of universities sheet {sheet_id} failed: {result}")
+                continue
+            worksheets.update(result)
+        return worksheets
+
+    async def _load_spreadsheet(self, sheet_id: str) -> Dict[tuple, List[Dict]]:
+        universities = (await self._batch_get(sheet_id, [self.UNIVERSITIES_WORKSHEET]))[self.UNIVERSITIES_WORKSHEET]
+        titles = set(await read_scheduler.submit(spreadsheet_handles.worksheet_titles, sheet_id, False))
+        program_sheets = list(dict.fromkeys(
+            str(uni['sheet_name']) for uni in universities if uni.get('sheet_name')
+        ))
+        missing = [name for name in program_sheets if name not in titles]
+        if missing:
+            logger.warning(f"Universities sheet {sheet_id}: program tabs not found: {missing}")
+        programs = await self._batch_get(sheet_id, [name for name in program_sheets if name in titles])
+
+        worksheets = {(sheet_id, self.UNIVERSITIES_WORKSHEET): universities}
+        worksheets.update({(sheet_id, name): records for name, records in programs.items()})
+        logger.info(f"Universities sheet {sheet_id} loaded: {len(programs)} program tabs")
+        return worksheets
 
+    async def _batch_get(self, sheet_id: str, titles: List[str]) -> Dict[str, List[Dict]]:
+        """Несколько вкладок одним запросом (повторы при превышении квоты — в планировщике)."""
+        all_values = await read_many_values(sheet_id, titles)
+        return {title: _to_records(values) for title, values in all_values.items()}
+
+    async def refresh_all(self, sheet_ids: Iterable[str], ttl: Optional[float] = None) -> int:
+        """
+        Перезагружает все таблицы вузов в общий кэш. Возвращает число загруженных вкладок.
+        Вкладки таблиц, которые не удалось загрузить, остаются в кэше прежними.
+        """
+        worksheets = await self.load_all(sheet_ids)
+        for (sheet_id, worksheet_name), records in worksheets.items():
+            catalog_cache.put(sheet_id, worksheet_name, records, ttl=ttl)
+        return len(worksheets)
+
+    async def get_universities_by_city_and_type(self, sheet_id: str, city: str = None) -> List[University]:
+        """Вузы из вкладки 'Universities' таблицы sheet_id (с фильтром по городу)."""
+        entry = await self.get_catalog(self.UNIVERSITIES_WORKSHEET, sheet_id)
+        index = self.universities_index(sheet_id, entry.version) if entry else None
+        return index.for_city(city).universities if index else []
+
+    async def get_faculties_by_sheet_name(self, sheet_id: str, sheet_name: str) -> List[Program]:
+        """Программы вуза: вкладка sheet_name в таблице sheet_id (1 строка = 1 программа)."""
+        entry = await self.get_catalog(sheet_name, sheet_id)
+        return (self.resolve_models(Program, sheet_name, entry.version, sheet_id) or []) if entry else []
 
 
 class CoursesGSheet(GoogleSheetsManager):
@@ -348,30 +1003,38 @@ class CoursesGSheet(GoogleSheetsManager):
         self.worksheet_name = 'Courses' 
 
 
-    def get_courses(self, category: str = None, subcategory: str = None, language: str = None) -> List[Dict]:
+    async def warm_up(self):
+        """Предзагрузка каталога курсов в кэш."""
+        await self.get_cached_records(self.worksheet_name)
+
+    def courses(self, version: int) -> Optional[List[Course]]:
+        """Курсы той версии каталога, которую видел пользователь (None, если версия вытеснена)."""
+        return self.resolve_models(Course, self.worksheet_name, version)
+
+    async def get_courses(self, category: str = None, subcategory: str = None, language: str = None) -> List[Course]:
         """Получение списка курсов с фильтрацией."""
         try:
-            courses = self.get_all_records(self.worksheet_name) # Используем self.worksheet_name
+            catalog = await self.get_catalog(self.worksheet_name)
+            courses = (self.courses(catalog.version) or []) if catalog else []
             
             # Применяем фильтры
             if category:
-                courses = [c for c in courses if c.get('Категория') == category]
+                courses = [c for c in courses if c.category == category]
             if subcategory:
-                courses = [c for c in courses if c.get('Подкатегория') == subcategory]
+                courses = [c for c in courses if c.subcategory == subcategory]
             if language:
-                courses = [c for c in courses if c.get('language') == language]
+                courses = [c for c in courses if c.language == language]
             
             return courses
         except Exception as e:
             logger.error(f"Error getting courses: {e}")
             return []
     
-    def get_course_by_id(self, course_id: str) -> Optional[Dict]:
+    async def get_course_by_id(self, course_id: str) -> Optional[Course]:
         """Получение курса по ID."""
         try:
-            courses = self.get_all_records(self.worksheet_name) # Используем self.worksheet_name
-            for course in courses:
-                if str(course.get('course_id')) == str(course_id):
+            for course in await self.get_courses():
+                if course.course_id == str(course_id):
                     return course
             return None
         except Exception as e:
@@ -381,64 +1044,91 @@ class CoursesGSheet(GoogleSheetsManager):
 
 class ProfessionsGSheet(GoogleSheetsManager):
 
-    def get_professions_by_scale(self, scale_key: str) -> List[Dict]:
+    # Ключи кэша для списка вкладок таблицы профессий и для объединенного каталога
+    WORKSHEET_TITLES_KEY = '__worksheets__'
+    ALL_PROFESSIONS_KEY = '__all_professions__'
+
+    async def warm_up(self):
+        """Предзагрузка всех листов со шкалами в кэш каталога."""
+        await self.get_all_professions()
+
+    def professions(self, worksheet_name: str, version: int) -> Optional[List[Profession]]:
+        """
+        Профессии листа-шкалы (или объединенного каталога ALL_PROFESSIONS_KEY) той версии,
+        которую видел пользователь. None, если версия вытеснена.
+        """
+        return self.resolve_models(Profession, worksheet_name, version)
+
+    def directions_index(self, worksheet_name: str, version: int) -> Optional[DirectionsIndex]:
+        """Направления листа-шкалы (или общего каталога) с их профессиями для версии каталога."""
+        return self._get_index(self.sheet_id, worksheet_name, version, build_directions_index)
+
+    async def _get_professions(self, worksheet_name: str) -> List[Profession]:
+        entry = await self.get_catalog(worksheet_name)
+        return (self.professions(worksheet_name, entry.version) or []) if entry else []
+
+    async def get_professions_by_scale(self, scale_key: str) -> List[Profession]:
         """
         Получение профессий по ключу шкалы (scale_key ИСПОЛЬЗУЕТСЯ КАК ИМЯ ЛИСТА).
         """
         try:
             # Используем scale_key (e.g., "human", "tech") как имя листа (worksheet_name)
-            professions = self.get_all_records(worksheet_name=scale_key)
-            return professions
+            return await self._get_professions(scale_key)
         except Exception as e:
             # Если лист не найден (например, 'sign' вместо 'sign'), gspread выдаст ошибку
             logger.error(f"Error getting professions from worksheet '{scale_key}': {e}")
             return []
     
-    def get_profession_by_name(self, name: str, worksheet_name: str) -> Optional[Dict]:
+    async def get_profession_by_name(self, name: str, worksheet_name: str) -> Optional[Profession]:
         """Получение профессии по названию с конкретного листа."""
         try:
-            professions = self.get_all_records(worksheet_name)
-            for prof in professions:
-                if prof.get('Название профессии') == name:
+            for prof in await self._get_professions(worksheet_name):
+                if prof.name == name:
                     return prof
             return None
         except Exception as e:
             logger.error(f"Error getting profession by name from {worksheet_name}: {e}")
             return None
     
-    def get_all_professions(self) -> List[Dict]:
+    async def get_all_professions(self) -> List[Profession]:
+        entry = await self.get_all_professions_catalog()
+        return (self.professions(self.ALL_PROFESSIONS_KEY, entry.version) or []) if entry else []
 
-        all_professions = []
+    async def get_all_professions_catalog(self) -> Optional[CacheEntry]:
+        """Профессии со всех листов-шкал одним каталогом (с версией)."""
         try:
-            # Получаем список всех листов в таблице
-            sheet_names = [ws.title for ws in self.sheet.worksheets()]
-            
-            # Фильтруем, оставляя только листы со шкалами
-            scale_sheets = [name for name in sheet_names if name in ['human', 'tech', 'art', 'sign', 'nature']]
-
-            for sheet_name in scale_sheets:
-                try:
-                    logger.info(f"Loading professions from sheet: {sheet_name}")
-                    all_professions.extend(self.get_all_records(sheet_name))
-                except Exception as e:
-                    logger.error(f"Failed to load professions from sheet '{sheet_name}': {e}")
-                    # Просто пропускаем этот лист и идем к следующему
-                    pass
-
-            
-            return all_professions
+            return await catalog_cache.get_entry(self.sheet_id, self.ALL_PROFESSIONS_KEY, self._load_all_professions)
         except Exception as e:
             logger.error(f"Error getting all professions from all sheets: {e}")
-            return []
+            return None
 
-    def get_all_directions(self) -> List[str]:
+    async def _load_all_professions(self) -> List[Dict]:
+        all_professions = []
+        # Получаем список всех листов в таблице
+        sheet_names = await catalog_cache.get(
+            self.sheet_id, self.WORKSHEET_TITLES_KEY,
+            lambda: read_scheduler.submit(spreadsheet_handles.worksheet_titles, self.sheet_id)
+        )
+        
+        # Фильтруем, оставляя только листы со шкалами
+        scale_sheets = [name for name in sheet_names if name in ['human', 'tech', 'art', 'sign', 'nature']]
+
+        # Ошибка любого листа прерывает загрузку: неполный каталог не должен
+        # заменить в кэше прежнюю полную версию
+        for sheet_name in scale_sheets:
+            logger.info(f"Loading professions from sheet: {sheet_name}")
+            all_professions.extend((await self._load_catalog(sheet_name)).value)
+
+        return all_professions
+
+    async def get_all_directions(self) -> List[str]:
         """Получение списка всех уникальных направлений со всех листов."""
         try:
-            all_professions = self.get_all_professions()
+            all_professions = await self.get_all_professions()
             directions = set()
             
             for prof in all_professions:
-                if direction := prof.get('Направление'):
+                if direction := prof.direction:
                     directions.add(direction)
             
             return sorted(list(directions))
@@ -447,21 +1137,63 @@ class ProfessionsGSheet(GoogleSheetsManager):
             return []
 
 
+def university_sheet_ids() -> List[str]:
+    """ID всех таблиц вузов: государственные по городам, частные и иностранные."""
+    sheet_ids = [*STATE_UNIVERSITIES_BY_CITY.values(), PRIVATE_UNIVERSITIES_SHEET_ID, FOREIGN_UNIVERSITIES_SHEET_ID]
+    return list(dict.fromkeys(sheet_id for sheet_id in sheet_ids if sheet_id))
+
+
+def restore_catalog_snapshot(store: CatalogSnapshotStore) -> Optional[Snapshot]:
+    """
+    Поднимает последний снимок каталогов в общий кэш. Данные отдаются сразу,
+    но помечены устаревшими: первое обращение к вкладке обновит ее в фоне.
+    """
+    snapshot = store.load()
+    if snapshot is None:
+        return None
+    for (sheet_id, worksheet_name), records in snapshot.worksheets.items():
+        catalog_cache.put(sheet_id, worksheet_name, records, stale=True)
+    age = datetime.now().timestamp() - snapshot.created_at
+    logger.info(f"Catalog snapshot v{snapshot.version} restored: {len(snapshot.worksheets)} worksheets, {age:.0f}s old")
+    return snapshot
+
+
+async def save_catalog_snapshot(store: CatalogSnapshotStore) -> int:
+    """Сохраняет текущее содержимое кэша каталогов в снимок."""
+    worksheets = {key: value for key, value in catalog_cache.export().items() if key[0]}
+    return await run_blocking(store.save, worksheets)
+
+
+async def build_catalog_snapshot(store: CatalogSnapshotStore) -> int:
+    """Загружает все каталоги из Google и сохраняет снимок (для CLI и деплоя)."""
+    get_client()
+    await asyncio.gather(
+        CoursesGSheet(COURSES_SHEET_ID).warm_up(),
+        ProfessionsGSheet(PROFESSIONS_SHEET_ID).warm_up(),
+        UniversitiesGSheet().refresh_all(university_sheet_ids())
+    )
+    return await save_catalog_snapshot(store)
+
+
 # Вспомогательные функции для обратной совместимости
-def get_user_data(telegram_id: int, sheet_id: str) -> Optional[Dict]:
+def _registration_manager(sheet_id: str) -> RegistrationGSheet:
+    """Уже созданный менеджер таблицы (без повторного построения индекса) или новый."""
+    return _registration_managers.get(sheet_id) or RegistrationGSheet(sheet_id)
+
+
+async def get_user_data(telegram_id: int, sheet_id: str) -> Optional[Dict]:
     """Получение данных пользователя (для обратной совместимости)."""
-    manager = RegistrationGSheet(sheet_id)
-    return manager.get_user_by_id(telegram_id)
+    return await _registration_manager(sheet_id).get_user_by_id(telegram_id)
 
 
-def save_user_data(data: Dict, sheet_id: str) -> bool:
+async def save_user_data(data: Dict, sheet_id: str) -> bool:
     """Сохранение данных пользователя (для обратной совместимости)."""
-    manager = RegistrationGSheet(sheet_id)
+    manager = _registration_manager(sheet_id)
     
     if data.get('role') == 'parent':
-        return manager.add_parent(data)
+        return await manager.add_parent(data)
     elif data.get('role') == 'student':
-        return manager.add_student(data)
+        return await manager.add_student(data)
     
     return False
 
@@ -1,5 +1,11 @@
+import functools
+import json
 from datetime import datetime
 
+# Компактная сериализация в JSON: без пробелов и без \u-экранирования кириллицы
+json_dumps = functools.partial(json.dumps, ensure_ascii=False, separators=(',', ':'), default=str)
+
+
 def calculate_age(dob_string: str) -> int | None:
     """Рассчитывает возраст по строке с датой рождения (ДД.ММ.ГГГГ)."""
     if not dob_string or '.' not in dob_string:
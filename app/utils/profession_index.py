@@ -0,0 +1,41 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from app.utils.records import Profession, read_records
+
+
+@dataclass
+class Direction:
+    """Направление (например, 'Медицинское'): его профессии и их названия для кнопок."""
+    name: str
+    professions: List[Profession]
+    profession_names: List[str]
+
+
+@dataclass
+class DirectionsIndex:
+    """Индекс каталога профессий: отсортированные направления, id направления — позиция."""
+    directions: List[Direction]
+    direction_names: List[str]
+
+    def direction(self, direction_id: Optional[int]) -> Optional[Direction]:
+        if direction_id is None or not 0 <= direction_id < len(self.directions):
+            return None
+        return self.directions[direction_id]
+
+
+def build_directions_index(records: List[Dict]) -> DirectionsIndex:
+    """Группирует профессии по направлениям за один проход; направления сортируются по названию."""
+    by_direction: Dict[str, List[Profession]] = {}
+    for profession in read_records(Profession, records):
+        if profession.direction:
+            by_direction.setdefault(profession.direction, []).append(profession)
+    directions = [
+        Direction(
+            name=name,
+            professions=by_direction[name],
+            profession_names=[prof.name for prof in by_direction[name]]
+        )
+        for name in sorted(by_direction)
+    ]
+    return DirectionsIndex(directions=directions, direction_names=[d.name for d in directions])
@@ -0,0 +1,299 @@
+"""
+Типизированные строки листов: вузы, программы, курсы, профессии и данные регистрации.
+
+Каждая модель — неизменяемый dataclass со __slots__, HEADERS сопоставляет поле
+с заголовком колонки (первый — основной и выводится в карточках, остальные —
+варианты написания в старых таблицах). Сопоставление заголовков листа с полями
+строится и проверяется один раз на набор заголовков, а не на каждую строку.
+"""
+
+import logging
+from dataclasses import dataclass, fields
+from functools import lru_cache
+from typing import ClassVar, Dict, List, Optional, Sequence, Tuple, Type, TypeVar
+
+logger = logging.getLogger(__name__)
+
+R = TypeVar('R', bound='SheetRecord')
+
+
+@dataclass(frozen=True, slots=True)
+class SheetRecord:
+    """Базовая модель строки листа. Значения хранятся строками, пустая ячейка — ''."""
+    HEADERS: ClassVar[Dict[str, Tuple[str, ...]]] = {}
+
+    @classmethod
+    def header(cls, field_name: str) -> str:
+        """Основной заголовок колонки поля (подпись в карточках)."""
+        return cls.HEADERS[field_name][0]
+
+    @classmethod
+    def from_records(cls, records: List[Dict]) -> list:
+        return read_records(cls, records)
+
+
+@dataclass(frozen=True, slots=True)
+class University(SheetRecord):
+    name: str
+    city: str
+    sheet_name: str
+
+    HEADERS: ClassVar[Dict[str, Tuple[str, ...]]] = {
+        'name': ('Наименования ВОУ',),
+        'city': ('Город',),
+        'sheet_name': ('sheet_name',),
+    }
+
+
+@dataclass(frozen=True, slots=True)
+class Program(SheetRecord):
+    faculty: str
+    name: str
+    language: str
+    study_form: str
+    exams: str
+    price: str
+    admission: str
+    min_score: str
+    duration: str
+    extramural: str
+    evening: str
+    online: str
+    scholarship: str
+    dormitory: str
+    seats: str
+    budget_quota: str
+    paid_quota: str
+    documents: str
+
+    HEADERS: ClassVar[Dict[str, Tuple[str, ...]]] = {
+        'faculty': ('Название факультета',),
+        'name': ('Название программы',),
+        'language': ('Язык обучения',),
+        'study_form': ('Форма обучения',),
+        'exams': ('Экзамены',),
+        'price': ('Стоимость',),
+        'admission': ('Прием документов',),
+        'min_score': ('Минимальные баллы для поступления',),
+        'duration': ('Продолжительность',),
+        'extramural': ('Заочное обучение',),
+        'evening': ('Вечернее обучение',),
+        'online': ('Онлайн обучение',),
+        'scholarship': ('Стипендия',),
+        'dormitory': ('Наличие общежития',),
+        'seats': ('Количество мест',),
+        'budget_quota': ('Квота на бюджет',),
+        'paid_quota': ('Квота на платное обучение',),
+        'documents': ('Список документов',),
+    }
+
+
+@dataclass(frozen=True, slots=True)
+class Course(SheetRecord):
+    course_id: str
+    name: str
+    description: str
+    duration: str
+    price: str
+    category: str
+    subcategory: str
+    language: str
+
+    HEADERS: ClassVar[Dict[str, Tuple[str, ...]]] = {
+        'course_id': ('course_id',),
+        'name': ('Название курса',),
+        'description': ('Описание',),
+        'duration': ('Длительность',),
+        'price': ('Цена',),
+        'category': ('Категория',),
+        'subcategory': ('Подкатегория',),
+        'language': ('language',),
+    }
+
+
+@dataclass(frozen=True, slots=True)
+class Profession(SheetRecord):
+    name: str
+    direction: str
+    about: str
+    duties: str
+    qualities: str
+    where_to_study: str
+    faculties: str
+    examples: str
+    workplaces: str
+    salary: str
+    prospects: str
+    related: str
+    career: str
+    environment: str
+    difficulties: str
+    famous: str
+
+    HEADERS: ClassVar[Dict[str, Tuple[str, ...]]] = {
+        'name': ('Название профессии',),
+        'direction': ('Направление',),
+        'about': ('О чём профессия?',),
+        'duties': ('Чем занимаются?',),
+        'qualities': ('Какими качествами нужно обладать',),
+        'where_to_study': ('Где учиться',),
+        'faculties': ('Факультеты',),
+        'examples': ('Живые примеры',),
+        'workplaces': ('Где можно работать',),
+        'salary': ('Сколько зарабатывают',),
+        'prospects': ('Перспективы',),
+        'related': ('Смежные профессии',),
+        'career': ('Карьерный рост',),
+        'environment': ('Рабочая обстановка',),
+        'difficulties': ('Трудности',),
+        'famous': ('Знаменитые представители профессии',),
+    }
+
+
+@dataclass(frozen=True, slots=True)
+class Parent(SheetRecord):
+    telegram_id: str
+    first_name: str
+    last_name: str
+    phone: str
+    email: str
+    language: str
+    role: str
+    registered_at: str
+
+    HEADERS: ClassVar[Dict[str, Tuple[str, ...]]] = {
+        'telegram_id': ('Telegram ID',),
+        'first_name': ('Имя',),
+        'last_name': ('Фамилия',),
+        'phone': ('Номер телефона', 'Номер телефон'),
+        'email': ('Email',),
+        'language': ('Язык',),
+        'role': ('role',),
+        'registered_at': ('Время регистрации', 'Время'),
+    }
+
+
+@dataclass(frozen=True, slots=True)
+class Student(SheetRecord):
+    telegram_id: str
+    first_name: str
+    last_name: str
+    birth_date: str
+    city: str
+    phone: str
+    language: str
+    role: str
+    registered_at: str
+    parent_name: str
+    parent_phone: str
+
+    HEADERS: ClassVar[Dict[str, Tuple[str, ...]]] = {
+        'telegram_id': ('Telegram ID',),
+        'first_name': ('Имя',),
+        'last_name': ('Фамилия',),
+        'birth_date': ('Дата рождения',),
+        'city': ('Город',),
+        'phone': ('Телефон',),
+        'language': ('Язык',),
+        'role': ('role',),
+        'registered_at': ('Время регистрации', 'Время'),
+        'parent_name': ('Имя родителя',),
+        'parent_phone': ('Телефон родителя',),
+    }
+
+    @property
+    def parent_contact(self) -> Optional[str]:
+        return f"{self.parent_name} {self.parent_phone}".strip() or None
+
+
+@dataclass(frozen=True, slots=True)
+class Child(SheetRecord):
+    parent_id: str
+    first_name: str
+    last_name: str
+    birth_date: str
+    grade: str
+    city: str
+    interests: str
+    registered_at: str
+    exode_id: str
+    phone: str
+
+    HEADERS: ClassVar[Dict[str, Tuple[str, ...]]] = {
+        'parent_id': ('Parent Telegram ID',),
+        'first_name': ('Имя ребенка', 'Имя'),
+        'last_name': ('Фамилия ребенка', 'Фамилия'),
+        'birth_date': ('Дата рождения',),
+        'grade': ('Класс',),
+        'city': ('Город',),
+        'interests': ('Интересы',),
+        'registered_at': ('Время регистрации', 'Время'),
+        'exode_id': ('Exode ID',),
+        'phone': ('Телефон ребенка',),
+    }
+
+    @property
+    def full_name(self) -> str:
+        return f"{self.first_name} {self.last_name}".strip()
+
+
+def _text(value) -> str:
+    return '' if value is None else str(value)
+
+
+class RecordReader:
+    """
+    Сопоставление заголовков листа с полями модели. Строится один раз на набор
+    заголовков; колонки, которых нет на листе, логируются и читаются как ''.
+    """
+
+    def __init__(self, model: Type[R], headers: Sequence[str]):
+        self.model = model
+        self.headers = tuple(headers)
+        # Повторяющийся заголовок: берется первая колонка, как при поиске на листе
+        positions: Dict[str, int] = {}
+        for column, header in enumerate(self.headers):
+            positions.setdefault(header, column)
+
+        self.columns: List[Optional[int]] = []
+        self.keys: List[Optional[str]] = []
+        missing = []
+        for model_field in fields(model):
+            header = next((h for h in model.HEADERS[model_field.name] if h in positions), None)
+            self.keys.append(header)
+            self.columns.append(positions[header] if header is not None else None)
+            if header is None:
+                missing.append(model.header(model_field.name))
+        if missing:
+            logger.warning(f"{model.__name__}: no columns {missing} in sheet headers")
+
+    def from_row(self, row: Sequence) -> R:
+        """Строка листа (список значений в порядке заголовков) -> модель."""
+        size = len(row)
+        return self.model(*[
+            _text(row[column]) if column is not None and column < size else ''
+            for column in self.columns
+        ])
+
+    def from_record(self, record: Dict) -> R:
+        """Запись в виде get_all_records() -> модель."""
+        return self.model(*[_text(record.get(key)) if key is not None else '' for key in self.keys])
+
+
+@lru_cache(maxsize=256)
+def reader_for(model: Type[R], headers: Tuple[str, ...]) -> RecordReader:
+    """Читатель для модели и набора заголовков (один на набор — проверка делается один раз)."""
+    return RecordReader(model, headers)
+
+
+def read_records(model: Type[R], records: List[Dict]) -> List[R]:
+    """Записи вкладки (или нескольких вкладок подряд, как в общем каталоге профессий) -> модели."""
+    models = []
+    reader, headers = None, None
+    for record in records:
+        # Заголовки сверяются по ключам записи; новый читатель — только на границе вкладок
+        if record.keys() != headers:
+            reader = reader_for(model, tuple(record))
+            headers = frozenset(reader.headers)
+        models.append(reader.from_record(record))
+    return models
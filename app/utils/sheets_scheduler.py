@@ -0,0 +1,227 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Приоритеты запросов: меньше — раньше
+PRIORITY_USER = 0
+PRIORITY_BACKGROUND = 1
+
+# Приоритет по умолчанию для запросов из текущей задачи
+_priority: ContextVar[int] = ContextVar('sheets_priority', default=PRIORITY_USER)
+
+Runner = Callable[..., Awaitable[Any]]
+
+
+@contextmanager
+def background_priority():
+    """Запросы к таблицам внутри блока (и в задачах, созданных в нем) идут с фоновым приоритетом."""
+    token = _priority.set(PRIORITY_BACKGROUND)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> int:
+    """Приоритет запросов текущей задачи."""
+    return _priority.get()
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """Превышение квоты (429) и ошибки сервера Google стоит повторить позже."""
+    code = getattr(error, 'code', None)
+    return isinstance(code, int) and (code == 429 or code >= 500)
+
+
+@dataclass
+class _Job:
+    func: Callable
+    args: tuple
+    kwargs: dict
+    priority: int
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.monotonic)
+    attempts: int = 0
+
+
+@dataclass
+class SchedulerStats:
+    """Метрики планировщика с момента последнего сброса."""
+    name: str
+    queue_depth: Dict[int, int]
+    in_flight: int
+    completed: int
+    throttled: int
+    failed: int
+    avg_wait: float
+    max_wait: float
+
+
+class SheetsScheduler:
+    """
+    Общий планировщик запросов к Google Sheets API для всех менеджеров.
+
+    Ограничивает частоту запросов маркерной корзиной (rate_per_minute, запас burst),
+    чтобы не упираться в поминутную квоту Google. Запросы, которым не хватило
+    маркеров, ждут в очереди: пользовательские обслуживаются раньше фоновых
+    обновлений. При 429 и ошибках сервера очередь приостанавливается,
+    а запрос повторяется с задержкой.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate_per_minute: float,
+        run: Runner,
+        burst: int = 10,
+        max_concurrency: int = 8,
+        max_retries: int = 8,
+        max_backoff: float = 64.0,
+    ):
+        self.name = name
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.max_backoff = max_backoff
+        self._run_blocking = run
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._queue: List[tuple] = []
+        self._seq = itertools.count()
+        self._running = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        # Выполняемые запросы: ссылки держим, чтобы задачи не собрал GC и их можно было дождаться
+        self._tasks: Set[asyncio.Task] = set()
+        self._reset_stats()
+
+    async def submit(self, func: Callable, *args, priority: Optional[int] = None, **kwargs) -> Any:
+        """Выполняет блокирующий вызов gspread в свою очередь."""
+        future = asyncio.get_running_loop().create_future()
+        # Ошибку забирает хотя бы этот колбэк, даже если вызывающий уже отменен
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        job = _Job(func, args, kwargs, _priority.get() if priority is None else priority, future)
+        self._push(job, next(self._seq))
+        self._ensure_worker()
+        return await asyncio.shield(future)
+
+    async def stop(self):
+        """Останавливает очередь: дожидается выполняемых запросов, ожидающие отменяет."""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        while self._queue:
+            _, _, job = heapq.heappop(self._queue)
+            job.future.cancel()
+
+    def stats(self, reset: bool = False) -> SchedulerStats:
+        depth: Dict[int, int] = {}
+        for priority, _, _ in self._queue:
+            depth[priority] = depth.get(priority, 0) + 1
+        stats = SchedulerStats(
+            name=self.name,
+            queue_depth=depth,
+            in_flight=self._running,
+            completed=self._completed,
+            throttled=self._throttled,
+            failed=self._failed,
+            avg_wait=self._wait_total / self._dispatched if self._dispatched else 0.0,
+            max_wait=self._wait_max,
+        )
+        if reset:
+            self._reset_stats()
+        return stats
+
+    def _reset_stats(self):
+        self._completed = 0
+        self._throttled = 0
+        self._failed = 0
+        self._dispatched = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _push(self, job: _Job, seq: int):
+        heapq.heappush(self._queue, (job.priority, seq, job))
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.create_task(self._run())
+
+    def _take_token(self) -> float:
+        """Забирает маркер; если маркеров нет — возвращает, сколько секунд ждать."""
+        now = time.monotonic()
+        if now < self._paused_until:
+            return self._paused_until - now
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    async def _run(self):
+        while True:
+            if not self._queue or self._running >= self.max_concurrency:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            delay = self._take_token()
+            if delay > 0:
+                # За время ожидания в очередь может прийти более приоритетный запрос
+                await asyncio.sleep(delay)
+                continue
+            _, seq, job = heapq.heappop(self._queue)
+            if job.attempts == 0:
+                waited = time.monotonic() - job.enqueued_at
+                self._dispatched += 1
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+            self._running += 1
+            task = asyncio.create_task(self._execute(job, seq))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _execute(self, job: _Job, seq: int):
+        try:
+            result = await self._run_blocking(job.func, *job.args, **job.kwargs)
+        except Exception as e:
+            if is_retryable_error(e) and job.attempts < self.max_retries:
+                job.attempts += 1
+                delay = min(self.max_backoff, 2 ** job.attempts) * random.uniform(0.5, 1.0)
+                self._throttled += 1
+                # Квота исчерпана для всех — приостанавливаем всю очередь, запрос остается на своем месте
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                self._tokens = 0.0
+                logger.warning(f"Sheets {self.name}: API error, queue paused for {delay:.1f}s: {e}")
+                self._push(job, seq)
+            else:
+                self._failed += 1
+                if not job.future.done():
+                    job.future.set_exception(e)
+        else:
+            self._completed += 1
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            self._running -= 1
+            self._wakeup.set()
@@ -0,0 +1,50 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Объединение одновременных одинаковых запросов (single-flight).
+
+    Пока запрос с ключом выполняется, остальные вызывающие с тем же ключом
+    не запускают свой, а ждут общий результат. После завершения ключ
+    освобождается — следующий вызов снова пойдет в сеть. Отмена одного
+    из ожидающих не отменяет запрос для остальных.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self.shared = 0
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Результат call() — общий для всех одновременных вызовов с этим key, его нельзя изменять."""
+        task = self._calls.get(key)
+        if task is not None:
+            self.shared += 1
+            return await asyncio.shield(task)
+
+        task = asyncio.ensure_future(call())
+        self._calls[key] = task
+        task.add_done_callback(lambda done: self._release(key, done))
+        return await asyncio.shield(task)
+
+    def running(self, key: Hashable) -> bool:
+        """Выполняется ли сейчас запрос с этим key."""
+        return key in self._calls
+
+    def forget(self, *prefix: Hashable) -> int:
+        """
+        Новые вызовы с ключами, начинающимися с prefix, пойдут мимо текущих запросов
+        (например, после записи в лист). Уже ожидающие получат прежний результат.
+        """
+        keys = [key for key in self._calls if isinstance(key, tuple) and key[:len(prefix)] == prefix]
+        for key in keys:
+            del self._calls[key]
+        return len(keys)
+
+    def _release(self, key: Hashable, task: asyncio.Future):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Ошибку забираем здесь, даже если все ожидающие уже отменены
+        if not task.cancelled():
+            task.exception()
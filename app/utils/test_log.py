@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import os
+import re
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS test_sessions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    started_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS test_sessions_user ON test_sessions (user_id, started_at);
+CREATE TABLE IF NOT EXISTS test_answers (
+    session INTEGER NOT NULL,
+    answered_at REAL NOT NULL,
+    answer INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS test_answers_session ON test_answers (session);
+CREATE INDEX IF NOT EXISTS test_answers_time ON test_answers (answered_at);
+"""
+
+# Один ответ на вопрос в сессии (номер вопроса — старшие биты упакованного ответа)
+_UNIQUE_QUESTION = "CREATE UNIQUE INDEX IF NOT EXISTS test_answers_question ON test_answers (session, answer >> 3)"
+
+# Ответ теста в callback_data: номер вопроса и буква варианта ("5_A")
+_ANSWER_RE = re.compile(r'^(\d+)_([A-H])$')
+
+
+def pack_answer(answer: str) -> Optional[int]:
+    """'5_A' -> один байт: номер вопроса (1..31) в старших битах, вариант (A..H) в младших трех."""
+    match = _ANSWER_RE.match(answer or '')
+    if not match or not 1 <= int(match.group(1)) <= 31:
+        return None
+    return int(match.group(1)) << 3 | ord(match.group(2)) - ord('A')
+
+
+def unpack_answer(packed: int) -> str:
+    return f"{packed >> 3}_{chr(ord('A') + (packed & 7))}"
+
+
+@dataclass
+class LoggedAnswer:
+    """Ответ из журнала: кто, в какой попытке теста, когда и какой вариант."""
+    user_id: int
+    session: int
+    answered_at: float
+    answer: str
+
+
+class AnswerLog:
+    """
+    Локальный журнал ответов STEM-теста в файле SQLite (только дописывается).
+
+    Каждая попытка теста — сессия с номером, каждый ответ — строка с временем
+    и упакованным в байт вариантом. В состоянии FSM хватает номера сессии и
+    номера вопроса, а ответы переживают перезапуск бота и доступны для выборок
+    по пользователю и периоду (аналитика, пересчет результатов).
+    Вызовы из бота (start_session, append, session_answers) выполняются в отдельном
+    потоке по одному; выборки для офлайн-обработки синхронные.
+    """
+
+    def __init__(self, path: str):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._ensure_unique_questions()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="test-log")
+
+    async def _run(self, func: Callable, *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def _ensure_unique_questions(self):
+        exists = self._db.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'test_answers_question'"
+        ).fetchone()
+        if exists:
+            return
+        # Журналы, записанные до ограничения, могут содержать повторные ответы — остается первый
+        with self._db:
+            self._db.execute("BEGIN")
+            removed = self._db.execute(
+                "DELETE FROM test_answers WHERE rowid NOT IN "
+                "(SELECT MIN(rowid) FROM test_answers GROUP BY session, answer >> 3)"
+            ).rowcount
+            self._db.execute(_UNIQUE_QUESTION)
+        if removed:
+            logger.info(f"Test log: {removed} repeated answers removed")
+
+    async def start_session(self, user_id: int) -> int:
+        """Новая попытка теста. Возвращает номер сессии."""
+        return await self._run(self._start_session, user_id)
+
+    def _start_session(self, user_id: int) -> int:
+        return self._db.execute(
+            "INSERT INTO test_sessions (user_id, started_at) VALUES (?, ?)", (user_id, time.time())
+        ).lastrowid
+
+    async def append(self, session: int, answer: str) -> bool:
+        """
+        Записывает ответ сессии. Данные, не похожие на ответ теста, и повторный ответ
+        на тот же вопрос (двойное нажатие) не записываются — тогда возвращается False.
+        """
+        packed = pack_answer(answer)
+        if packed is None:
+            logger.warning(f"Test session {session}: unexpected answer {answer!r} not logged")
+            return False
+        return await self._run(self._insert_answer, session, packed)
+
+    def _insert_answer(self, session: int, packed: int) -> bool:
+        return self._db.execute(
+            "INSERT OR IGNORE INTO test_answers (session, answered_at, answer) VALUES (?, ?, ?)",
+            (session, time.time(), packed)
+        ).rowcount == 1
+
+    async def session_answers(self, session: int) -> List[str]:
+        """Ответы сессии в порядке записи."""
+        return await self._run(self._session_answers, session)
+
+    def _session_answers(self, session: int) -> List[str]:
+        rows = self._db.execute(
+            "SELECT answer FROM test_answers WHERE session = ? ORDER BY rowid", (session,)
+        ).fetchall()
+        return [unpack_answer(packed) for (packed,) in rows]
+
+    def query(self, user_id: Optional[int] = None, since: Optional[float] = None, until: Optional[float] = None) -> List[LoggedAnswer]:
+        """Ответы пользователя (или всех) за период [since, until) по времени ответа."""
+        conditions, params = [], []
+        if user_id is not None:
+            conditions.append("s.user_id = ?")
+            params.append(user_id)
+        if since is not None:
+            conditions.append("a.answered_at >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("a.answered_at < ?")
+            params.append(until)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self._db.execute(
+            "SELECT s.user_id, a.session, a.answered_at, a.answer "
+            "FROM test_answers a JOIN test_sessions s ON s.id = a.session "
+            f"{where} ORDER BY a.rowid",
+            params
+        ).fetchall()
+        return [LoggedAnswer(user_id, session, answered_at, unpack_answer(packed)) for user_id, session, answered_at, packed in rows]
+
+    def sessions_answers(self, sessions: List[int]) -> Dict[int, List[str]]:
+        """Ответы нескольких сессий одним запросом: номер сессии -> ответы."""
+        answers: Dict[int, List[str]] = {session: [] for session in sessions}
+        for start in range(0, len(sessions), 500):
+            chunk = sessions[start:start + 500]
+            rows = self._db.execute(
+                f"SELECT session, answer FROM test_answers WHERE session IN ({','.join('?' * len(chunk))}) ORDER BY rowid",
+                chunk
+            )
+            for session, packed in rows:
+                answers[session].append(unpack_answer(packed))
+        return answers
+
+    def close(self):
+        # Дожидаемся записей, уже отправленных в поток
+        self._executor.shutdown(wait=True)
+        self._db.close()
@@ -0,0 +1,161 @@
+"""
+Подсчет результатов STEM-теста по ключу SCORING_KEY.
+
+Ключ компилируется при импорте в обратную таблицу «ответ -> шкалы»,
+поэтому каждый ответ обрабатывается одним поиском в словаре, а не проверкой
+всех списков ключа. Подсчет для многих анкет сразу — score_many().
+
+Пересчет всех сохраненных результатов после изменения SCORING_KEY
+(сессии в SQLite-хранилище FSM, ответы — из журнала ответов; бот может при этом работать):
+    python -m app.utils.test_scoring rescore [--dry-run]
+"""
+
+import json
+import logging
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.utils.test_content import QUESTIONS, SCORING_KEY
+
+logger = logging.getLogger(__name__)
+
+# Шкалы в порядке ключа
+SCALES: Tuple[str, ...] = tuple(SCORING_KEY)
+
+
+def compile_scoring_key(scoring_key: Dict[str, List[str]]) -> Dict[str, Tuple[str, ...]]:
+    """Ключ «шкала -> ответы» -> «ответ -> шкалы» (ответ может относиться к нескольким шкалам)."""
+    answer_scales: Dict[str, List[str]] = {}
+    for scale, answers in scoring_key.items():
+        for answer in answers:
+            scales = answer_scales.setdefault(answer, [])
+            # Повтор ответа в списке одной шкалы дает одно очко, как проверка `answer in keys`
+            if scale not in scales:
+                scales.append(scale)
+    return {answer: tuple(scales) for answer, scales in answer_scales.items()}
+
+
+ANSWER_SCALES: Dict[str, Tuple[str, ...]] = compile_scoring_key(SCORING_KEY)
+
+
+def score_answers(answers: Iterable[str]) -> Dict[str, int]:
+    """Баллы по шкалам для одной анкеты. Шкалы — в порядке первого набранного балла."""
+    scores: Dict[str, int] = {}
+    for answer in answers:
+        for scale in ANSWER_SCALES.get(answer, ()):
+            scores[scale] = scores.get(scale, 0) + 1
+    return scores
+
+
+def top_scales(scores: Dict[str, int], limit: int = 3) -> List[Tuple[str, int]]:
+    """Лучшие шкалы по убыванию баллов; при равенстве — раньше набравшая балл."""
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+
+def score_many(answer_sheets: Iterable[Sequence[str]], limit: int = 3) -> List[List[Tuple[str, int]]]:
+    """Результаты (лучшие шкалы) для многих анкет сразу, в порядке анкет."""
+    return [top_scales(score_answers(answers), limit) for answers in answer_sheets]
+
+
+class ScoringMatrix:
+    """
+    Ключ как матрица «ответ × шкала» из 0 и 1 для пакетного подсчета.
+
+    Анкета кодируется строкой матрицы — битовой маской ответов (колонки идут
+    в порядке вопросов), столбец шкалы — маской ее ответов. Баллы анкеты по шкале —
+    число общих битов, то есть произведение строки на столбец. Каждая анкета
+    хранится одним целым числом. На равенство баллов выше шкала, набравшая балл
+    раньше (на более раннем вопросе) — как в score_answers() для анкеты по порядку вопросов.
+    Повторный ответ на тот же вариант учитывается один раз.
+    """
+
+    def __init__(self, scoring_key: Dict[str, List[str]] = SCORING_KEY, questions: List[Dict] = QUESTIONS):
+        order = [answer['data'] for question in questions for answer in question['answers']]
+        order += [answer for answers in scoring_key.values() for answer in answers]
+        self.columns: Dict[str, int] = {answer: column for column, answer in enumerate(dict.fromkeys(order))}
+        self.scales: Tuple[str, ...] = tuple(scoring_key)
+        self.scale_masks: Tuple[int, ...] = tuple(
+            sum(1 << self.columns[answer] for answer in set(answers)) for answers in scoring_key.values()
+        )
+
+    def encode(self, answers: Iterable[str]) -> int:
+        """Ответы анкеты -> строка матрицы (битовая маска). Неизвестные ответы не дают баллов."""
+        row = 0
+        for answer in answers:
+            column = self.columns.get(answer)
+            if column is not None:
+                row |= 1 << column
+        return row
+
+    def scores(self, rows: Sequence[int]) -> List[Tuple[int, ...]]:
+        """Матрица баллов «анкета × шкала»."""
+        masks = self.scale_masks
+        return [tuple((row & mask).bit_count() for mask in masks) for row in rows]
+
+    def top(self, rows: Sequence[int], limit: int = 3) -> List[List[Tuple[str, int]]]:
+        """Лучшие шкалы каждой анкеты (только набравшие баллы), в формате top_scales()."""
+        results = []
+        for row in rows:
+            ranked = []
+            for index, mask in enumerate(self.scale_masks):
+                hits = row & mask
+                if hits:
+                    # Номер младшего бита — первый вопрос, на котором шкала получила балл;
+                    # один ответ на несколько шкал — в порядке ключа
+                    ranked.append((-hits.bit_count(), (hits & -hits).bit_length(), index))
+            ranked.sort()
+            results.append([(self.scales[index], -score) for score, _, index in ranked[:limit]])
+        return results
+
+
+def rescore_sessions(storage, test_log=None, matrix: Optional[ScoringMatrix] = None, dry_run: bool = False) -> Tuple[int, int]:
+    """
+    Пересчитывает сохраненные результаты теста (test_results) во всех сессиях
+    SQLite-хранилища FSM и пакетно записывает изменившиеся. Ответы берутся из журнала
+    test_log по номеру попытки (или из состояния для тестов, пройденных до журнала).
+    Возвращает (пересчитано, изменено).
+    """
+    matrix = matrix or ScoringMatrix()
+    sessions = []
+    for storage_key, value in storage.iter_data():
+        data = json.loads(value)
+        if data.get('test_results') and (data.get('answers') or (test_log and data.get('test_session') is not None)):
+            sessions.append((storage_key, value, data))
+
+    logged = test_log.sessions_answers([
+        data['test_session'] for _, _, data in sessions if not data.get('answers')
+    ]) if test_log else {}
+    results = matrix.top([
+        matrix.encode(data.get('answers') or logged[data['test_session']]) for _, _, data in sessions
+    ])
+    updates = []
+    for (storage_key, value, data), top in zip(sessions, results):
+        if [list(item) for item in data['test_results']] != [list(item) for item in top]:
+            updates.append((storage_key, value, dict(data, test_results=top)))
+
+    updated = len(updates) if dry_run else storage.replace_data_many(updates)
+    logger.info(f"Test results rescored: {len(sessions)} sessions, {updated} changed{' (dry run)' if dry_run else ''}")
+    return len(sessions), updated
+
+
+if __name__ == '__main__':
+    import argparse
+    import asyncio
+
+    from app.core.config import FSM_STORAGE_PATH, TEST_LOG_PATH
+    from app.utils.fsm_storage import SQLiteStorage
+    from app.utils.test_log import AnswerLog
+
+    parser = argparse.ArgumentParser(description='Rescore stored STEM test results')
+    parser.add_argument('command', choices=['rescore'])
+    parser.add_argument('--path', default=FSM_STORAGE_PATH)
+    parser.add_argument('--test-log', default=TEST_LOG_PATH)
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(name)s - %(message)s')
+
+    storage = SQLiteStorage(args.path)
+    test_log = AnswerLog(args.test_log)
+    scanned, changed = rescore_sessions(storage, test_log, dry_run=args.dry_run)
+    print(f"{args.path}: {scanned} sessions with results, {changed} {'would change' if args.dry_run else 'updated'}")
+    asyncio.run(storage.close())
+    test_log.close()
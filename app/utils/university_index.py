@@ -0,0 +1,83 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from app.utils.records import Program, University, read_records
+
+
+@dataclass
+class UniversityList:
+    """Вузы одного города (или всей таблицы) в порядке таблицы; id вуза — позиция в списке."""
+    universities: List[University]
+    names: List[str]
+
+
+@dataclass
+class UniversitiesIndex:
+    """Индекс вкладки 'Universities' одной таблицы: город -> список вузов."""
+    all: UniversityList
+    by_city: Dict[str, UniversityList] = field(default_factory=dict)
+
+    def for_city(self, city: Optional[str]) -> UniversityList:
+        """Вузы города (без учета регистра); без города — все вузы таблицы."""
+        if not city:
+            return self.all
+        return self.by_city.get(city.lower(), _EMPTY_LIST)
+
+
+@dataclass
+class Faculty:
+    """Факультет вуза: его программы и их названия для кнопок."""
+    name: str
+    programs: List[Program]
+    program_names: List[str]
+
+
+@dataclass
+class ProgramsIndex:
+    """Индекс вкладки программ вуза: отсортированные факультеты, id факультета — позиция."""
+    faculties: List[Faculty]
+    faculty_names: List[str]
+
+    def faculty(self, faculty_id: Optional[int]) -> Optional[Faculty]:
+        if faculty_id is None or not 0 <= faculty_id < len(self.faculties):
+            return None
+        return self.faculties[faculty_id]
+
+
+_EMPTY_LIST = UniversityList(universities=[], names=[])
+
+
+def _university_list(universities: List[University]) -> UniversityList:
+    return UniversityList(
+        universities=universities,
+        names=[uni.name or "N/A" for uni in universities]
+    )
+
+
+def build_universities_index(records: List[Dict]) -> UniversitiesIndex:
+    """Строит индекс вузов за один проход по строкам."""
+    universities = read_records(University, records)
+    by_city: Dict[str, List[University]] = {}
+    for uni in universities:
+        by_city.setdefault(uni.city.lower(), []).append(uni)
+    return UniversitiesIndex(
+        all=_university_list(universities),
+        by_city={city: _university_list(rows) for city, rows in by_city.items()}
+    )
+
+
+def build_programs_index(records: List[Dict]) -> ProgramsIndex:
+    """Группирует программы по факультетам; факультеты сортируются по названию."""
+    by_faculty: Dict[str, List[Program]] = {}
+    for program in read_records(Program, records):
+        if program.faculty:
+            by_faculty.setdefault(program.faculty, []).append(program)
+    faculties = [
+        Faculty(
+            name=name,
+            programs=by_faculty[name],
+            program_names=[p.name or "N/A" for p in by_faculty[name]]
+        )
+        for name in sorted(by_faculty)
+    ]
+    return ProgramsIndex(faculties=faculties, faculty_names=[f.name for f in faculties])
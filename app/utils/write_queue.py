@@ -0,0 +1,295 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+AppendRows = Callable[[str, List[List]], Awaitable[None]]
+ReadRows = Callable[[str], Awaitable[List[List]]]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pending_rows (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    worksheet TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL
+)
+"""
+
+# Статусы строк журнала
+STATUS_PENDING = 'pending'
+STATUS_SENDING = 'sending'
+STATUS_DONE = 'done'
+
+
+def normalize_row(values: List) -> tuple:
+    """Строка в виде, сравнимом с результатом get_all_values()."""
+    cells = ['' if value is None else str(value) for value in values]
+    while cells and cells[-1] == '':
+        cells.pop()
+    return tuple(cells)
+
+
+def make_idempotency_key(worksheet: str, identity: Sequence) -> str:
+    """
+    Ключ идемпотентности по тому, что определяет запись (например, Telegram ID),
+    а не по всей строке: повторная отправка формы через секунду дает тот же ключ,
+    хотя время регистрации в строке уже другое.
+    """
+    raw = json.dumps([worksheet, [str(value).strip() for value in identity]], ensure_ascii=False)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+class WriteBehindQueue:
+    """
+    Надежная очередь отложенной записи строк в Google Sheets.
+
+    Строка сначала фиксируется в локальном журнале SQLite, и пользователь
+    сразу получает подтверждение. Фоновая задача раз в flush_interval секунд
+    отправляет накопленные строки пачками через append_rows, повторяя
+    неудачные попытки с экспоненциальной задержкой.
+
+    Повторная постановка строки с тем же ключом игнорируется. Записанные
+    строки хранятся в журнале done_retention секунд (окно защиты от повторов)
+    и затем удаляются. Строки, отправка которых была прервана падением
+    процесса, при старте сверяются с содержимым листа, чтобы не записать их дважды.
+
+    Обращения к журналу выполняются в отдельном потоке по одному, не останавливая
+    event loop. Незаписанные строки дополнительно хранятся в памяти: pending_rows()
+    читает их синхронно, поэтому индекс пользователей строится без ожидания диска.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        flush_interval: float = 5.0,
+        batch_size: int = 100,
+        max_backoff: float = 300.0,
+        done_retention: float = 24 * 3600,
+    ):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(_SCHEMA)
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_backoff = max_backoff
+        self.done_retention = done_retention
+        # Ключ -> (лист, строка) для всех незаписанных строк, в порядке постановки
+        self._unwritten: Dict[str, tuple] = {
+            key: (worksheet, json.loads(payload))
+            for key, worksheet, payload in self._db.execute(
+                "SELECT idempotency_key, worksheet, payload FROM pending_rows WHERE status != ? ORDER BY id",
+                (STATUS_DONE,)
+            )
+        }
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="write-queue")
+        self._append_rows: Optional[AppendRows] = None
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self, func: Callable, *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def enqueue(self, worksheet: str, values: List, identity: Sequence) -> bool:
+        """
+        Ставит строку в очередь. identity — поля, определяющие запись (см. make_idempotency_key).
+        Возвращает False, если запись с таким ключом уже была поставлена.
+        """
+        key = make_idempotency_key(worksheet, identity)
+        inserted = await self._run(self._insert, key, worksheet, json.dumps(values, ensure_ascii=False, default=str))
+        if inserted:
+            self._unwritten[key] = (worksheet, list(values))
+        return inserted
+
+    def _insert(self, key: str, worksheet: str, payload: str) -> bool:
+        return self._db.execute(
+            "INSERT OR IGNORE INTO pending_rows (idempotency_key, worksheet, payload, created_at) VALUES (?, ?, ?, ?)",
+            (key, worksheet, payload, time.time())
+        ).rowcount == 1
+
+    def pending_rows(self, worksheet: str) -> List[List]:
+        """Строки листа, которые еще не записаны в таблицу (в порядке постановки)."""
+        return [list(values) for row_worksheet, values in self._unwritten.values() if row_worksheet == worksheet]
+
+    async def update_pending(self, worksheet: str, identity: Sequence, changes: Dict[int, Any]) -> bool:
+        """
+        Правка строки, которая еще ждет в очереди: {номер колонки с 0: значение}.
+        Возвращает False, если строка уже отправляется или записана.
+        """
+        key = make_idempotency_key(worksheet, identity)
+        values = await self._run(self._update_payload, key, changes)
+        if values is None:
+            return False
+        self._unwritten[key] = (worksheet, values)
+        return True
+
+    def _update_payload(self, key: str, changes: Dict[int, Any]) -> Optional[List]:
+        found = self._db.execute(
+            "SELECT payload FROM pending_rows WHERE idempotency_key = ? AND status = ?", (key, STATUS_PENDING)
+        ).fetchone()
+        if found is None:
+            return None
+        values = json.loads(found[0])
+        for column, value in changes.items():
+            values.extend([''] * (column + 1 - len(values)))
+            values[column] = value
+        self._db.execute(
+            "UPDATE pending_rows SET payload = ? WHERE idempotency_key = ?",
+            (json.dumps(values, ensure_ascii=False, default=str), key)
+        )
+        return values
+
+    async def flush_entry(self, worksheet: str, identity: Sequence) -> bool:
+        """Отправляет очередь, пока не будет записана указанная строка. True — строка записана."""
+        key = make_idempotency_key(worksheet, identity)
+        while key in self._unwritten:
+            if await self.flush(ignore_backoff=True) == 0:
+                return False
+        return await self._run(self._status, key) == STATUS_DONE
+
+    def _status(self, key: str) -> Optional[str]:
+        found = self._db.execute("SELECT status FROM pending_rows WHERE idempotency_key = ?", (key,)).fetchone()
+        return found[0] if found else None
+
+    def pending_count(self) -> int:
+        return len(self._unwritten)
+
+    async def start(self, append_rows: AppendRows, read_rows: ReadRows):
+        """Сверяет прерванные отправки с таблицей и запускает фоновую запись."""
+        self._append_rows = append_rows
+        await self._recover(read_rows)
+        await self.purge_done()
+        self._task = asyncio.create_task(self._run_loop())
+
+    async def stop(self):
+        """Останавливает фоновую задачу, пытается дописать все, что осталось, и закрывает журнал."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush(ignore_backoff=True)
+        await self._run(self._db.close)
+        self._executor.shutdown(wait=False)
+
+    def wakeup(self):
+        """Просит фоновую задачу выполнить запись, не дожидаясь интервала."""
+        self._wakeup.set()
+
+    async def flush(self, ignore_backoff: bool = False) -> int:
+        """Отправляет готовые к записи строки. Возвращает число записанных строк."""
+        if self._append_rows is None:
+            return 0
+        async with self._flush_lock:
+            due = await self._run(self._take_due, float('inf') if ignore_backoff else time.time())
+            by_worksheet: Dict[str, List[tuple]] = {}
+            for row in due:
+                by_worksheet.setdefault(row[1], []).append(row)
+
+            written = 0
+            for worksheet, entries in by_worksheet.items():
+                ids = [entry[0] for entry in entries]
+                try:
+                    await self._append_rows(worksheet, [json.loads(entry[2]) for entry in entries])
+                except Exception as e:
+                    logger.error(f"Write-behind append to '{worksheet}' failed ({len(ids)} rows): {e}")
+                    await self._run(self._schedule_retry, entries)
+                    continue
+                await self._run(self._set_status, ids, STATUS_DONE)
+                for entry in entries:
+                    self._unwritten.pop(entry[4], None)
+                written += len(ids)
+                logger.info(f"Write-behind: {len(ids)} rows appended to '{worksheet}'")
+            return written
+
+    def _take_due(self, now: float) -> List[tuple]:
+        """Выбирает пачку готовых строк и сразу отмечает ее целиком: пока пишется один лист, строки других уже не правятся."""
+        with self._db:
+            self._db.execute("BEGIN")
+            due = self._db.execute(
+                "SELECT id, worksheet, payload, attempts, idempotency_key FROM pending_rows "
+                "WHERE status = ? AND next_attempt_at <= ? ORDER BY id LIMIT ?",
+                (STATUS_PENDING, now, self.batch_size)
+            ).fetchall()
+            self._set_status([row[0] for row in due], STATUS_SENDING)
+        return due
+
+    async def _run_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+                await self.purge_done()
+            except Exception as e:
+                logger.error(f"Write-behind flush failed: {e}")
+
+    async def purge_done(self) -> int:
+        """Удаляет записанные строки старше окна защиты от повторов. Возвращает число удаленных."""
+        deleted = await self._run(self._purge_done, time.time() - self.done_retention)
+        if deleted:
+            logger.info(f"Write-behind: {deleted} written rows purged from the journal")
+        return deleted
+
+    def _purge_done(self, before: float) -> int:
+        return self._db.execute(
+            "DELETE FROM pending_rows WHERE status = ? AND created_at < ?", (STATUS_DONE, before)
+        ).rowcount
+
+    async def _recover(self, read_rows: ReadRows):
+        interrupted = await self._run(self._interrupted)
+        by_worksheet: Dict[str, List[tuple]] = {}
+        for row in interrupted:
+            by_worksheet.setdefault(row[1], []).append(row)
+
+        for worksheet, entries in by_worksheet.items():
+            try:
+                existing = {normalize_row(row) for row in await read_rows(worksheet)}
+            except Exception as e:
+                # Не смогли проверить — оставляем строки в статусе отправки до следующего старта
+                logger.error(f"Write-behind recovery for '{worksheet}' failed: {e}")
+                continue
+            written = [entry for entry in entries if normalize_row(json.loads(entry[2])) in existing]
+            missing = [entry[0] for entry in entries if entry not in written]
+            await self._run(self._set_status, [entry[0] for entry in written], STATUS_DONE)
+            await self._run(self._set_status, missing, STATUS_PENDING)
+            for entry in written:
+                self._unwritten.pop(entry[3], None)
+            logger.info(f"Write-behind recovery for '{worksheet}': {len(written)} already written, {len(missing)} requeued")
+
+    def _interrupted(self) -> List[tuple]:
+        return self._db.execute(
+            "SELECT id, worksheet, payload, idempotency_key FROM pending_rows WHERE status = ?", (STATUS_SENDING,)
+        ).fetchall()
+
+    def _set_status(self, ids: List[int], status: str):
+        if ids:
+            placeholders = ','.join('?' * len(ids))
+            self._db.execute(f"UPDATE pending_rows SET status = ? WHERE id IN ({placeholders})", (status, *ids))
+
+    def _schedule_retry(self, entries: List[tuple]):
+        for entry_id, _, _, attempts, _ in entries:
+            delay = min(self.max_backoff, 2 ** attempts) * random.uniform(0.5, 1.0)
+            self._db.execute(
+                "UPDATE pending_rows SET status = ?, attempts = ?, next_attempt_at = ? WHERE id = ?",
+                (STATUS_PENDING, attempts + 1, time.time() + delay, entry_id)
+            )
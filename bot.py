@@ -6,19 +6,30 @@ import json
 from aiogram import Bot, Dispatcher, F, types
 from aiogram.types import BotCommand
 from aiogram.enums import ParseMode
-from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.fsm.context import FSMContext
 from dotenv import load_dotenv
 from aiogram.filters import CommandStart, Command 
 
 # --- ИМПОРТЫ ---
-from app.utils.google_sheets import RegistrationGSheet, UniversitiesGSheet, CoursesGSheet, ProfessionsGSheet
+from app.utils.google_sheets import (
+    RegistrationGSheet, UniversitiesGSheet, CoursesGSheet, ProfessionsGSheet, get_client,
+    restore_catalog_snapshot, save_catalog_snapshot, university_sheet_ids, read_scheduler, write_scheduler, read_flights
+)
+from app.utils.sheets_scheduler import background_priority
+from app.utils.write_queue import WriteBehindQueue
+from app.utils.catalog_snapshot import CatalogSnapshotStore
+from app.utils.fsm_storage import create_storage, create_event_isolation
+from app.utils.exode_api import ExodeClient
+from app.utils.test_log import AnswerLog
 from app.core.config import (
     REGISTRATION_SHEET_ID, COURSES_SHEET_ID, PRIVATE_UNIVERSITIES_SHEET_ID, 
-    FOREIGN_UNIVERSITIES_SHEET_ID, PROFESSIONS_SHEET_ID, STATE_UNIVERSITIES_BY_CITY
+    FOREIGN_UNIVERSITIES_SHEET_ID, PROFESSIONS_SHEET_ID, STATE_UNIVERSITIES_BY_CITY,
+    WRITE_QUEUE_PATH, WRITE_QUEUE_FLUSH_INTERVAL, CATALOG_SNAPSHOT_PATH, CATALOG_SNAPSHOT_INTERVAL,
+    CATALOG_CACHE_TTL, TEST_LOG_PATH
 )
 
 from app.states.registration import GeneralRegistration, ParentRegistration, StudentRegistration
+from app.keyboards.cache import warm_keyboards
 from app.keyboards.inline import get_language_keyboard, get_role_keyboard, get_profile_creation_keyboard, get_student_welcome_keyboard
 from app.keyboards.reply import get_parent_main_menu_keyboard, get_student_main_menu_keyboard
 from app.handlers.registration import parent as parent_router_module
@@ -49,6 +60,60 @@ async def set_main_menu(bot: Bot, lexicon: dict):
     ]
     await bot.set_my_commands(commands_uz, language_code="uz")
 
+async def warm_up_sheets(registration_manager: RegistrationGSheet, courses_manager: CoursesGSheet, professions_manager: ProfessionsGSheet):
+    """
+    Фоновый прогрев после старта: таблицы открываются параллельно, строится
+    индекс пользователей и загружаются каталоги. Бот в это время уже принимает
+    апдейты — первые запросы просто дождутся нужных данных.
+    """
+    results = await asyncio.gather(
+        registration_manager.build_index(),
+        courses_manager.warm_up(),
+        professions_manager.warm_up(),
+        return_exceptions=True
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            logging.error(f"Ошибка прогрева Google Sheets: {result}", exc_info=result)
+    # Регистрации пишутся в таблицу пачками в фоне
+    await registration_manager.start_write_behind()
+    # Новые строки листов регистрации подтягиваются в фоне, без полного перечитывания
+    await registration_manager.start_sync()
+    logging.info("Прогрев Google Sheets завершен.")
+
+async def keep_catalog_snapshot(universities_manager: UniversitiesGSheet, store: CatalogSnapshotStore):
+    """
+    Каталог вузов целиком в памяти: все таблицы периодически перезагружаются
+    пачками, после чего кэш всех каталогов сохраняется новой версией снимка.
+    """
+    # Пока таблицы вузов обновляются по расписанию, отдельные вкладки не перечитываются
+    ttl = CATALOG_SNAPSHOT_INTERVAL + CATALOG_CACHE_TTL
+    while True:
+        try:
+            with background_priority():
+                await universities_manager.refresh_all(university_sheet_ids(), ttl=ttl)
+            await save_catalog_snapshot(store)
+        except Exception as e:
+            logging.error(f"Ошибка обновления снимка каталогов: {e}", exc_info=True)
+        await asyncio.sleep(CATALOG_SNAPSHOT_INTERVAL)
+
+async def log_sheets_metrics(interval: float = 60):
+    """Раз в interval секунд пишет в лог глубину очереди и время ожидания запросов к Google Sheets."""
+    while True:
+        await asyncio.sleep(interval)
+        for scheduler in (read_scheduler, write_scheduler):
+            stats = scheduler.stats(reset=True)
+            if not (stats.completed or stats.failed or stats.queue_depth):
+                continue
+            logging.info(
+                f"Sheets {stats.name}: queue={stats.queue_depth} in_flight={stats.in_flight} "
+                f"completed={stats.completed} throttled={stats.throttled} "
+                f"failed={stats.failed} wait_avg={stats.avg_wait:.2f}s wait_max={stats.max_wait:.2f}s"
+            )
+        if read_flights.shared:
+            logging.info(f"Sheets reads: {read_flights.shared} duplicate requests joined an in-flight fetch")
+            read_flights.shared = 0
+
 async def main() -> None:
     load_dotenv()
     TOKEN = getenv("BOT_TOKEN")
@@ -56,18 +121,34 @@ async def main() -> None:
         logging.critical("Токен бота не найден!")
         return
 
-    storage = MemoryStorage()
-    dp = Dispatcher(storage=storage)
+    storage = create_storage()
+    dp = Dispatcher(storage=storage, events_isolation=create_event_isolation(storage))
     bot = Bot(token=TOKEN, parse_mode=ParseMode.HTML)
     with open('texts.json', 'r', encoding='utf-8') as f:
         lexicon = json.load(f)
     dp['lexicon'] = lexicon
+    # Статичные клавиатуры строятся заранее для всех языков
+    warm_keyboards(lexicon)
+    # Один клиент Exode на процесс: общий пул keep-alive соединений
+    exode_client = ExodeClient()
+    dp['exode_client'] = exode_client
+    dp.shutdown.register(exode_client.close)
+    # Журнал ответов STEM-теста
+    test_log = AnswerLog(TEST_LOG_PATH)
+    dp['test_log'] = test_log
+    dp.shutdown.register(test_log.close)
     await set_main_menu(bot, lexicon)
     try:
-        registration_manager = RegistrationGSheet(REGISTRATION_SHEET_ID)
+        # Одна авторизация на процесс; таблицы открываются лениво
+        get_client()
+        write_queue = WriteBehindQueue(WRITE_QUEUE_PATH, flush_interval=WRITE_QUEUE_FLUSH_INTERVAL)
+        registration_manager = RegistrationGSheet(REGISTRATION_SHEET_ID, write_queue=write_queue)
         courses_manager = CoursesGSheet(COURSES_SHEET_ID)
         professions_manager = ProfessionsGSheet(PROFESSIONS_SHEET_ID)
-        universities_manager = UniversitiesGSheet(REGISTRATION_SHEET_ID)
+        universities_manager = UniversitiesGSheet()
+        # Последний снимок каталогов отдается сразу, обновление из Google идет в фоне
+        catalog_snapshot = CatalogSnapshotStore(CATALOG_SNAPSHOT_PATH)
+        restore_catalog_snapshot(catalog_snapshot)
 
         dp['registration_manager'] = registration_manager
         dp['universities_manager'] = universities_manager
@@ -81,6 +162,29 @@ async def main() -> None:
         logging.critical(f"КРИТИЧЕСКАЯ ОШИБКА при подключении к Google Sheets: {e}", exc_info=True)
         return 
 
+    # Индекс пользователей и кэш каталогов строятся в фоне, не задерживая старт
+    warm_up_task = asyncio.create_task(warm_up_sheets(registration_manager, courses_manager, professions_manager))
+    snapshot_task = asyncio.create_task(keep_catalog_snapshot(universities_manager, catalog_snapshot))
+    metrics_task = asyncio.create_task(log_sheets_metrics())
+
+    @dp.shutdown()
+    async def stop_sheets_background_tasks():
+        warm_up_task.cancel()
+        snapshot_task.cancel()
+        metrics_task.cancel()
+        # Сначала останавливаем синхронизацию, чтобы она не читала листы и не меняла
+        # индекс во время последней записи; затем дописываем остаток очереди и закрываем ее
+        await registration_manager.stop_sync()
+        await registration_manager.stop_write_behind()
+        # и сохраняем свежие каталоги для следующего старта
+        try:
+            await save_catalog_snapshot(catalog_snapshot)
+        except Exception as e:
+            logging.error(f"Не удалось сохранить снимок каталогов: {e}")
+        # Последними — очереди запросов к API: выше через них шли последние записи
+        for scheduler in (read_scheduler, write_scheduler):
+            await scheduler.stop()
+
     # --- Устанавливаем ПРАВИЛЬНЫЙ ПОРЯДОК ПОДКЛЮЧЕНИЯ ---
     
     @dp.message(CommandStart())
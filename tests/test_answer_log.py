@@ -0,0 +1,50 @@
+import asyncio
+
+from app.utils.test_log import AnswerLog
+
+
+def test_repeated_answer_to_a_question_is_not_logged(tmp_path):
+    async def main():
+        log = AnswerLog(str(tmp_path / 'answers.sqlite3'))
+        try:
+            session = await log.start_session(42)
+            appended = [await log.append(session, answer) for answer in ('1_A', '1_B', '2_C', 'page_uni_1')]
+            # The same question in another attempt is a new answer
+            other = await log.start_session(42)
+            return appended, await log.session_answers(session), await log.append(other, '1_B')
+        finally:
+            log.close()
+
+    appended, answers, other_appended = asyncio.run(main())
+    assert appended == [True, False, True, False]
+    assert answers == ['1_A', '2_C']
+    assert other_appended
+
+
+def test_concurrent_taps_log_one_answer(tmp_path):
+    async def main():
+        log = AnswerLog(str(tmp_path / 'answers.sqlite3'))
+        try:
+            session = await log.start_session(42)
+            appended = await asyncio.gather(*(log.append(session, answer) for answer in ('1_A', '1_B', '1_A')))
+            return appended, await log.session_answers(session)
+        finally:
+            log.close()
+
+    appended, answers = asyncio.run(main())
+    assert sorted(appended) == [False, False, True]
+    assert len(answers) == 1
+
+
+def test_existing_duplicates_are_dropped_when_the_constraint_is_added(tmp_path):
+    path = str(tmp_path / 'answers.sqlite3')
+    log = AnswerLog(path)
+    session = log._start_session(42)
+    log._db.execute("DROP INDEX test_answers_question")
+    for packed in (1 << 3, 1 << 3 | 1, 2 << 3):
+        log._db.execute("INSERT INTO test_answers (session, answered_at, answer) VALUES (?, 0, ?)", (session, packed))
+    log.close()
+
+    log = AnswerLog(path)
+    assert log.sessions_answers([session]) == {session: ['1_A', '2_A']}
+    log.close()
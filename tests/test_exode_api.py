@@ -0,0 +1,74 @@
+import asyncio
+
+from app.utils.exode_api import ExodeClient
+from app.utils.exode_mock import ExodeMockServer
+
+
+def run_with_mock(scenario, fail_next: int = 0, delay: float = 0.0, **client_options):
+    """Runs scenario(server, client) against a fresh mock server and client."""
+    async def main():
+        server = ExodeMockServer(fail_next=fail_next, delay=delay)
+        base_url = await server.start()
+        client = ExodeClient(base_url=base_url, backoff_base=0.01, **client_options)
+        try:
+            return await scenario(server, client)
+        finally:
+            await client.close()
+            await server.stop()
+    return asyncio.run(main())
+
+
+def test_get_is_retried_after_injected_failures():
+    async def scenario(server, client):
+        server._create({'phone': '+998901234567'})
+        user = await client.find_user_by_phone('998901234567')
+        return user, server.request_count
+
+    user, requests = run_with_mock(scenario, fail_next=2, max_retries=2)
+    assert user['user']['phone'] == '+998901234567'
+    assert requests == 3
+
+
+def test_get_gives_up_after_max_retries():
+    async def scenario(server, client):
+        return await client.find_user_by_telegram_id(42), server.request_count
+
+    user, requests = run_with_mock(scenario, fail_next=5, max_retries=2)
+    assert user is None
+    assert requests == 3
+
+
+def test_create_is_not_retried_on_server_error():
+    async def scenario(server, client):
+        created = await client.create_user({'phone': '998901234567', 'profile': {}})
+        return created, server.request_count, len(server.users)
+
+    created, requests, users = run_with_mock(scenario, fail_next=1, max_retries=2)
+    assert created is None
+    assert requests == 1
+    assert users == 0
+
+
+def test_create_is_not_repeated_after_timeout():
+    async def scenario(server, client):
+        created = await client.create_user({'phone': '998901234567', 'profile': {}})
+        # Let the server finish the request the client stopped waiting for
+        await asyncio.sleep(0.3)
+        return created, server.request_count, len(server.users)
+
+    created, requests, users = run_with_mock(scenario, delay=0.2, timeout=0.05, max_retries=2)
+    assert created is None
+    assert requests == 1
+    assert users == 1
+
+
+def test_lookup_is_refreshed_after_create():
+    async def scenario(server, client):
+        before = await client.find_user_by_phone('998901234567')
+        created = await client.create_user({'phone': '998901234567', 'profile': {}})
+        after = await client.find_user_by_phone('998901234567')
+        return before, created, after
+
+    before, created, after = run_with_mock(scenario)
+    assert before is None
+    assert after['user']['id'] == created['user']['id']
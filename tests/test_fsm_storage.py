@@ -0,0 +1,147 @@
+import asyncio
+import json
+import time
+
+import pytest
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.fsm.storage.base import StorageKey
+
+from app.utils import fsm_storage
+from app.utils.fsm_storage import SQLiteStorage
+
+
+class Form(StatesGroup):
+    name = State()
+
+
+def make_key(user_id: int) -> StorageKey:
+    return StorageKey(bot_id=1, chat_id=user_id, user_id=user_id)
+
+
+def run_with_storage(tmp_path, scenario, ttl=None):
+    """Runs scenario(storage) against a fresh storage file and closes it."""
+    async def main():
+        storage = SQLiteStorage(str(tmp_path / 'fsm.sqlite3'), ttl=ttl)
+        try:
+            return await scenario(storage)
+        finally:
+            await storage.close()
+    return asyncio.run(main())
+
+
+def expire_all(storage: SQLiteStorage):
+    storage._db.execute("UPDATE fsm SET expires_at = ?", (time.time() - 1,))
+
+
+def test_state_and_data_round_trip(tmp_path):
+    async def scenario(storage):
+        key = make_key(1)
+        await storage.set_state(key, Form.name)
+        await storage.set_data(key, {'language': 'uz', 'name': 'Ислом', 'answers': [[0, 'A']]})
+        first = await storage.get_state(key), await storage.get_data(key)
+        await storage.set_state(key, None)
+        await storage.set_data(key, {})
+        return first, await storage.get_state(key), await storage.get_data(key), await storage.get_data(make_key(2))
+
+    (state, data), cleared_state, cleared_data, other = run_with_storage(tmp_path, scenario)
+    assert state == Form.name.state
+    assert data == {'language': 'uz', 'name': 'Ислом', 'answers': [[0, 'A']]}
+    assert cleared_state is None
+    assert cleared_data == {}
+    assert other == {}
+
+
+def test_state_survives_reopen(tmp_path):
+    async def write(storage):
+        await storage.set_state(make_key(1), Form.name)
+
+    async def read(storage):
+        return await storage.get_state(make_key(1))
+
+    run_with_storage(tmp_path, write)
+    assert run_with_storage(tmp_path, read) == Form.name.state
+
+
+def test_expired_session_reads_empty_and_restarts_clean(tmp_path):
+    async def scenario(storage):
+        key = make_key(1)
+        await storage.set_state(key, Form.name)
+        await storage.set_data(key, {'language': 'ru'})
+        expire_all(storage)
+        expired = await storage.get_state(key), await storage.get_data(key)
+        # A write after expiry must not bring the old data back
+        await storage.set_state(key, Form.name)
+        return expired, await storage.get_data(key), storage.purge_expired()
+
+    (state, data), data_after_write, purged = run_with_storage(tmp_path, scenario, ttl=3600)
+    assert state is None
+    assert data == {}
+    assert data_after_write == {}
+    assert purged == 0
+
+
+def test_purge_removes_expired_sessions(tmp_path):
+    async def scenario(storage):
+        await storage.set_data(make_key(1), {'language': 'ru'})
+        await storage.set_data(make_key(2), {'language': 'uz'})
+        expire_all(storage)
+        await storage.set_data(make_key(3), {'language': 'en'})
+        return storage.purge_expired(), list(storage.iter_data())
+
+    purged, rows = run_with_storage(tmp_path, scenario, ttl=3600)
+    assert purged == 2
+    assert [json.loads(data) for _, data in rows] == [{'language': 'en'}]
+
+
+def test_replace_data_many_skips_sessions_changed_after_read(tmp_path):
+    async def scenario(storage):
+        await storage.set_data(make_key(1), {'score': 1})
+        await storage.set_data(make_key(2), {'score': 2})
+        snapshot = sorted(storage.iter_data())
+        # The bot changes the second session between the read and the batch write
+        await storage.set_data(make_key(2), {'score': 20})
+        updated = storage.replace_data_many([
+            (storage_key, value, dict(json.loads(value), rescored=True)) for storage_key, value in snapshot
+        ])
+        return updated, await storage.get_data(make_key(1)), await storage.get_data(make_key(2))
+
+    updated, first, second = run_with_storage(tmp_path, scenario)
+    assert updated == 1
+    assert first == {'score': 1, 'rescored': True}
+    assert second == {'score': 20}
+
+
+def test_redis_backend_against_a_local_stand_in(monkeypatch):
+    pytest.importorskip('redis')
+    fakeredis = pytest.importorskip('fakeredis')
+    from aiogram.fsm.storage.redis import RedisEventIsolation
+
+    monkeypatch.setattr(fsm_storage, 'FSM_STORAGE', 'redis')
+    monkeypatch.setattr(fsm_storage, 'FSM_STORAGE_TTL', 3600)
+
+    async def main():
+        storage = fsm_storage.create_storage()
+        # Same storage settings, but a local in-process server instead of REDIS_URL
+        storage.redis = fakeredis.aioredis.FakeRedis()
+        try:
+            key = make_key(1)
+            await storage.set_state(key, Form.name)
+            await storage.set_data(key, {'language': 'uz', 'name': 'Ислом'})
+            data_key = storage.key_builder.build(key, 'data')
+            return (
+                await storage.get_state(key),
+                await storage.get_data(key),
+                await storage.redis.get(data_key),
+                await storage.redis.ttl(data_key),
+                fsm_storage.create_event_isolation(storage),
+            )
+        finally:
+            await storage.redis.aclose()
+
+    state, data, raw, ttl, isolation = asyncio.run(main())
+    assert state == Form.name.state
+    assert data == {'language': 'uz', 'name': 'Ислом'}
+    # Compact JSON without \u-escaping of Cyrillic
+    assert raw.decode('utf-8') == '{"language":"uz","name":"Ислом"}'
+    assert 0 < ttl <= 3600
+    assert isinstance(isolation, RedisEventIsolation)
@@ -0,0 +1,99 @@
+from aiogram import types
+
+from app.handlers.universities import UNIVERSITIES_PAGES, universities_markup
+from app.keyboards.cache import cached_keyboard, keyboard_cache
+from app.keyboards.pagination import PagedView
+from app.utils.catalog_cache import CatalogCache
+from app.utils.university_index import build_universities_index
+
+LEXICON = {'ru': {'button-back': 'Назад'}, 'uz': {'button-back': 'Orqaga'}}
+SHEET_ID = 'sheet'
+
+TEST_PAGES = PagedView('test_item', back_callback='back_to_tests', per_page=2)
+
+
+def button_texts(markup):
+    return [button.text for row in markup.inline_keyboard for button in row]
+
+
+def universities_catalog(*names):
+    return [{'Наименования ВОУ': name, 'Город': 'Ташкент', 'sheet_name': name} for name in names]
+
+
+def test_same_version_reuses_the_keyboard():
+    first = TEST_PAGES.markup(['a', 'b', 'c'], 0, LEXICON, 'ru', key=1)
+    # A copy of the list under the same version is the same catalog
+    again = TEST_PAGES.markup(['a', 'b', 'c'], 0, LEXICON, 'ru', key=1)
+    other_lang = TEST_PAGES.markup(['a', 'b', 'c'], 0, LEXICON, 'uz', key=1)
+    assert again is first
+    assert other_lang is not first
+    assert button_texts(first) == ['a', 'b', '➡️', 'Назад']
+    assert button_texts(other_lang)[-1] == 'Orqaga'
+
+
+def test_page_past_the_end_is_clamped():
+    markup = TEST_PAGES.markup(['a', 'b', 'c'], 7, LEXICON, 'ru', key=2)
+    assert button_texts(markup) == ['c', '⬅️', 'Назад']
+    assert markup.inline_keyboard[0][0].callback_data == 'test_item_2'
+
+
+def test_lazy_items_are_built_once_per_version():
+    calls = []
+
+    def items():
+        calls.append(1)
+        return ['a']
+
+    TEST_PAGES.markup(items, 0, LEXICON, 'ru', key=('lazy', 1))
+    TEST_PAGES.markup(items, 0, LEXICON, 'uz', key=('lazy', 1))
+    assert len(calls) == 1
+
+
+def test_rebuilt_catalog_gives_a_fresh_keyboard():
+    cache = CatalogCache(ttl=3600)
+
+    def load(*names):
+        version = cache.put(SHEET_ID, 'Universities', universities_catalog(*names)).version
+        universities = build_universities_index(cache.get_version(SHEET_ID, 'Universities', version)).for_city(None)
+        return {'universities_version': version}, universities
+
+    old_session, old_universities = load('ТГУ', 'ТАТУ')
+    old = universities_markup(old_session, old_universities, LEXICON, 'ru')
+    # The sheet is reloaded with other rows: a new version and a new list of names
+    new_session, new_universities = load('ИНХА')
+    new = universities_markup(new_session, new_universities, LEXICON, 'ru')
+
+    assert new_session != old_session
+    assert button_texts(old)[:2] == ['ТГУ', 'ТАТУ']
+    assert button_texts(new) == ['ИНХА', 'Назад']
+    # A session opened before the reload still pages its own list
+    assert universities_markup(old_session, old_universities, LEXICON, 'ru') is old
+    assert UNIVERSITIES_PAGES.table([], key=(new_session['universities_version'], None)).items is new_universities.names
+
+
+@cached_keyboard(warm=(), normalize={'selected': lambda value: value or set()})
+def choice_keyboard(lexicon: dict, lang: str, options, selected=None, columns: int = 1):
+    selected = selected or set()
+    return types.InlineKeyboardMarkup(inline_keyboard=[
+        [types.InlineKeyboardButton(text=f"{'✅ ' if option in selected else ''}{option}", callback_data=option)]
+        for option in options
+    ])
+
+
+def test_call_forms_share_one_cache_entry():
+    markup = choice_keyboard(LEXICON, 'ru', ['a', 'b'])
+    assert choice_keyboard(LEXICON, 'ru', ('a', 'b'), None, 1) is markup
+    assert choice_keyboard(lexicon=LEXICON, lang='ru', options=['a', 'b'], selected=set()) is markup
+    assert choice_keyboard(LEXICON, 'ru', ['a', 'b'], {'a'}) is not markup
+    assert choice_keyboard(LEXICON, 'uz', ['a', 'b']) is not markup
+    # Another texts dictionary is another set of keyboards
+    assert choice_keyboard(dict(LEXICON), 'ru', ['a', 'b']) is not markup
+
+
+def test_unhashable_arguments_bypass_the_cache():
+    before = len(keyboard_cache)
+    first = choice_keyboard(LEXICON, 'ru', ['a', 'b'], selected={'a': True})
+    second = choice_keyboard(LEXICON, 'ru', ['a', 'b'], selected={'a': True})
+    assert first is not second
+    assert button_texts(first) == ['✅ a', 'b']
+    assert len(keyboard_cache) == before
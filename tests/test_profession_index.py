@@ -0,0 +1,39 @@
+from app.utils import google_sheets
+from app.utils.profession_index import build_directions_index
+
+
+def profession(name, direction):
+    return {'Название профессии': name, 'Направление': direction}
+
+
+RECORDS = [
+    profession('Врач', 'Медицинское'),
+    profession('Инженер', 'Техническое'),
+    profession('Медсестра', 'Медицинское'),
+    profession('Без направления', ''),
+]
+
+
+def test_directions_are_sorted_and_keep_sheet_order_inside():
+    index = build_directions_index(RECORDS)
+    assert index.direction_names == ['Медицинское', 'Техническое']
+    assert index.direction(0).profession_names == ['Врач', 'Медсестра']
+    assert [prof.name for prof in index.direction(1).professions] == ['Инженер']
+    assert index.direction(2) is None
+    assert index.direction(None) is None
+
+
+def test_index_is_built_once_per_catalog_version():
+    manager = google_sheets.ProfessionsGSheet('professions-sheet')
+    entry = google_sheets.catalog_cache.put(manager.sheet_id, manager.ALL_PROFESSIONS_KEY, RECORDS)
+    index = manager.directions_index(manager.ALL_PROFESSIONS_KEY, entry.version)
+    assert manager.directions_index(manager.ALL_PROFESSIONS_KEY, entry.version) is index
+
+    updated = google_sheets.catalog_cache.put(
+        manager.sheet_id, manager.ALL_PROFESSIONS_KEY, RECORDS + [profession('Дизайнер', 'Творческое')]
+    )
+    assert manager.directions_index(manager.ALL_PROFESSIONS_KEY, updated.version).direction_names == [
+        'Медицинское', 'Творческое', 'Техническое'
+    ]
+    # Sessions that saw the previous version keep their index
+    assert manager.directions_index(manager.ALL_PROFESSIONS_KEY, entry.version) is index
@@ -0,0 +1,91 @@
+import logging
+
+import pytest
+from gspread.exceptions import GSpreadException
+
+from app.utils.google_sheets import WorksheetMirror, _to_records
+from app.utils.records import Child, Parent, Profession, reader_for, read_records
+from app.utils.university_index import build_programs_index, build_universities_index
+
+
+def test_legacy_alias_headers_map_to_fields():
+    # Older registration sheets use shorter headers
+    parent = reader_for(Parent, ('Telegram ID', 'Имя', 'Номер телефон', 'Время')).from_row(
+        [42, 'Ali', '+998901234567', '10:00']
+    )
+    child = reader_for(Child, ('Parent Telegram ID', 'Имя', 'Фамилия', 'Время')).from_row(
+        ['42', 'Vali', 'Aliev', '10:00']
+    )
+    assert (parent.telegram_id, parent.first_name, parent.phone, parent.registered_at) == (
+        '42', 'Ali', '+998901234567', '10:00'
+    )
+    assert (child.parent_id, child.full_name, child.registered_at) == ('42', 'Vali Aliev', '10:00')
+
+
+def test_primary_header_wins_over_alias():
+    reader = reader_for(Child, ('Имя', 'Имя ребенка'))
+    assert reader.from_row(['Parent', 'Vali']).first_name == 'Vali'
+
+
+def test_missing_columns_read_as_empty(caplog):
+    with caplog.at_level(logging.WARNING):
+        parent = reader_for(Parent, ('Telegram ID', 'Имя')).from_row(['42', 'Ali'])
+    assert (parent.phone, parent.email, parent.registered_at) == ('', '', '')
+    assert 'Номер телефона' in caplog.text
+    # A short row reads as if its trailing cells were empty
+    assert reader_for(Parent, ('Telegram ID', 'Имя')).from_row(['42']).first_name == ''
+
+
+def test_read_records_switches_reader_at_tab_boundaries():
+    records = [
+        {'Название профессии': 'Инженер', 'Направление': 'Техническое'},
+        # The next tab has other columns and a legacy layout without the direction
+        {'Название профессии': 'Врач', 'Сколько зарабатывают': 1000},
+    ]
+    first, second = read_records(Profession, records)
+    assert (first.name, first.direction, first.salary) == ('Инженер', 'Техническое', '')
+    assert (second.name, second.direction, second.salary) == ('Врач', '', '1000')
+
+
+def test_duplicate_headers_are_rejected():
+    values = [['Город', 'Наименования ВОУ', 'Город'], ['Ташкент', 'ТГУ', 'Самарканд']]
+    with pytest.raises(GSpreadException, match='Город'):
+        _to_records(values)
+    with pytest.raises(GSpreadException):
+        WorksheetMirror.from_values(values)
+
+
+def test_blank_headers_are_allowed():
+    records = _to_records([['Город', '', 'Наименования ВОУ', ''], ['Ташкент', 'x', 'ТГУ', 'y', 'z']])
+    assert records == [{'Город': 'Ташкент', '': 'y', 'Наименования ВОУ': 'ТГУ'}]
+
+
+def test_universities_index_groups_by_city():
+    records = _to_records([
+        ['Наименования ВОУ', 'Город', 'sheet_name'],
+        ['ТГУ', 'Ташкент', 'tgu'],
+        ['', 'ташкент', 'noname'],
+        ['СамГУ', 'Самарканд', 'samgu'],
+    ])
+    index = build_universities_index(records)
+    assert index.all.names == ['ТГУ', 'N/A', 'СамГУ']
+    assert index.for_city('ТАШКЕНТ').names == ['ТГУ', 'N/A']
+    assert [uni.sheet_name for uni in index.for_city('Самарканд').universities] == ['samgu']
+    assert index.for_city('Бухара').names == []
+    assert index.for_city(None) is index.all
+
+
+def test_programs_index_sorts_faculties_and_skips_unnamed():
+    records = _to_records([
+        ['Название факультета', 'Название программы', 'Стоимость'],
+        ['Физика', 'Оптика', 1000],
+        ['Математика', '', ''],
+        ['', 'Без факультета', ''],
+        ['Физика', 'Механика', ''],
+    ])
+    index = build_programs_index(records)
+    assert index.faculty_names == ['Математика', 'Физика']
+    assert index.faculty(1).program_names == ['Оптика', 'Механика']
+    assert index.faculty(1).programs[0].price == '1000'
+    assert index.faculty(0).program_names == ['N/A']
+    assert index.faculty(2) is None and index.faculty(None) is None
@@ -0,0 +1,84 @@
+import asyncio
+import json
+from pathlib import Path
+from types import SimpleNamespace
+
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from app.handlers.registration.student import confirm_student_profile_handler
+from app.states.registration import StudentRegistration
+
+LEXICON = json.loads((Path(__file__).resolve().parent.parent / 'texts.json').read_text(encoding='utf-8'))
+USER_ID = 42
+
+
+class FakeMessage:
+    def __init__(self):
+        self.chat = SimpleNamespace(id=USER_ID)
+        self.answers = []
+
+    async def answer(self, text, **kwargs):
+        self.answers.append(text)
+        return SimpleNamespace(message_id=len(self.answers))
+
+
+class FakeCallback:
+    def __init__(self):
+        self.from_user = SimpleNamespace(id=USER_ID)
+        self.message = FakeMessage()
+        self.bot = SimpleNamespace(delete_message=self._delete_message)
+
+    async def _delete_message(self, chat_id, message_id):
+        pass
+
+    async def answer(self, *args, **kwargs):
+        pass
+
+
+class FakeRegistration:
+    def __init__(self):
+        self.students = []
+
+    async def add_student(self, data):
+        self.students.append(data)
+        return True
+
+
+class FakeExode:
+    def __init__(self):
+        self.upserts = []
+
+    async def upsert_user(self, payload):
+        self.upserts.append(payload)
+        return {'user': {'id': 1}}
+
+
+def confirm_student(found_exode_user: bool):
+    async def main():
+        state = FSMContext(storage=MemoryStorage(), key=StorageKey(bot_id=1, chat_id=USER_ID, user_id=USER_ID))
+        await state.set_state(StudentRegistration.confirming_profile)
+        await state.update_data(
+            language='ru', student_first_name='Ali', student_phone='+998901234567', found_exode_user=found_exode_user
+        )
+        callback, registration, exode = FakeCallback(), FakeRegistration(), FakeExode()
+        await confirm_student_profile_handler(
+            callback, state, lexicon=LEXICON, registration_manager=registration, exode_client=exode
+        )
+        return await state.get_state(), registration.students, exode.upserts
+    return asyncio.run(main())
+
+
+def test_confirm_links_found_exode_user():
+    state, students, upserts = confirm_student(found_exode_user=True)
+    assert students[0]['Telegram ID'] == USER_ID
+    assert upserts == [{'phone': '+998901234567', 'tgId': USER_ID}]
+    assert state == StudentRegistration.choosing_goal.state
+
+
+def test_confirm_asks_consent_without_exode_user():
+    state, students, upserts = confirm_student(found_exode_user=False)
+    assert len(students) == 1
+    assert upserts == []
+    assert state == StudentRegistration.confirming_exode_creation.state
@@ -0,0 +1,61 @@
+import asyncio
+
+from app.utils import google_sheets
+from app.utils.sheets_scheduler import PRIORITY_BACKGROUND, PRIORITY_USER, background_priority, current_priority
+
+
+class FakeReadScheduler:
+    """Records the priority of every submitted read and answers after a short delay."""
+
+    def __init__(self):
+        self.priorities = []
+
+    async def submit(self, func, *args, **kwargs):
+        self.priorities.append(current_priority())
+        request = len(self.priorities)
+        await asyncio.sleep(0.05)
+        return [['header'], [str(request)]]
+
+
+def run_reads(monkeypatch, scenario):
+    scheduler = FakeReadScheduler()
+    monkeypatch.setattr(google_sheets, 'read_scheduler', scheduler)
+    return asyncio.run(scenario()), scheduler.priorities
+
+
+def background_read():
+    with background_priority():
+        return asyncio.ensure_future(google_sheets.read_values('sheet', 'Ученик'))
+
+
+def test_user_read_does_not_join_a_background_read(monkeypatch):
+    async def scenario():
+        background = background_read()
+        await asyncio.sleep(0)
+        user = await google_sheets.read_values('sheet', 'Ученик')
+        return await background, user
+
+    (background, user), priorities = run_reads(monkeypatch, scenario)
+    assert priorities == [PRIORITY_BACKGROUND, PRIORITY_USER]
+    assert background != user
+
+
+def test_background_read_joins_a_user_read(monkeypatch):
+    async def scenario():
+        user = asyncio.ensure_future(google_sheets.read_values('sheet', 'Ученик'))
+        await asyncio.sleep(0)
+        background = background_read()
+        return await user, await background
+
+    (user, background), priorities = run_reads(monkeypatch, scenario)
+    assert priorities == [PRIORITY_USER]
+    assert background is user
+
+
+def test_same_priority_reads_share_one_request(monkeypatch):
+    async def scenario():
+        return await asyncio.gather(*(google_sheets.read_values('sheet', 'Ученик') for _ in range(3)))
+
+    results, priorities = run_reads(monkeypatch, scenario)
+    assert priorities == [PRIORITY_USER]
+    assert results[0] is results[1] is results[2]
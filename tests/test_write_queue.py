@@ -0,0 +1,141 @@
+import asyncio
+import time
+
+from app.utils.write_queue import STATUS_DONE, STATUS_PENDING, STATUS_SENDING, WriteBehindQueue
+
+
+class FakeSheet:
+    """Stand-in for the append and read callbacks of RegistrationGSheet."""
+
+    def __init__(self, rows=None, failing=False):
+        self.rows = {worksheet: list(values) for worksheet, values in (rows or {}).items()}
+        self.failing = failing
+        self.appends = 0
+
+    async def append_rows(self, worksheet, rows):
+        self.appends += 1
+        if self.failing:
+            raise RuntimeError('quota exceeded')
+        self.rows.setdefault(worksheet, []).extend(rows)
+
+    async def read_rows(self, worksheet):
+        return self.rows.get(worksheet, [])
+
+
+def run_with_queue(tmp_path, scenario, **options):
+    """Runs scenario(queue) against a journal file that survives between calls."""
+    async def main():
+        queue = WriteBehindQueue(str(tmp_path / 'queue.sqlite3'), flush_interval=3600, **options)
+        try:
+            return await scenario(queue)
+        finally:
+            await queue.stop()
+    return asyncio.run(main())
+
+
+def statuses(queue):
+    return [status for (status,) in queue._db.execute("SELECT status FROM pending_rows ORDER BY id")]
+
+
+def test_enqueue_ignores_the_same_identity(tmp_path):
+    sheet = FakeSheet()
+
+    async def scenario(queue):
+        first = await queue.enqueue('Ученик', ['42', 'Ali', '10:00'], identity=['42'])
+        # The form is resubmitted a second later: other registration time, same user
+        repeated = await queue.enqueue('Ученик', ['42', 'Ali', '10:01'], identity=['42'])
+        other = await queue.enqueue('Ученик', ['43', 'Vali', '10:01'], identity=['43'])
+        pending = queue.pending_rows('Ученик')
+        await queue.start(sheet.append_rows, sheet.read_rows)
+        written = await queue.flush()
+        # Still deduplicated after the row was written (within the retention window)
+        after_write = await queue.enqueue('Ученик', ['42', 'Ali', '10:02'], identity=[42])
+        return first, repeated, other, pending, written, after_write
+
+    first, repeated, other, pending, written, after_write = run_with_queue(tmp_path, scenario)
+    assert (first, repeated, other, after_write) == (True, False, True, False)
+    assert pending == [['42', 'Ali', '10:00'], ['43', 'Vali', '10:01']]
+    assert written == 2
+    assert sheet.rows['Ученик'] == pending
+
+
+def test_recover_marks_interrupted_rows_done_or_pending(tmp_path):
+    async def enqueue_and_crash(queue):
+        await queue.enqueue('Ученик', ['42', 'Ali'], identity=['42'])
+        await queue.enqueue('Ученик', ['43', 'Vali'], identity=['43'])
+        # The process died after marking the batch as sending; only the first row reached the sheet
+        queue._db.execute("UPDATE pending_rows SET status = ?", (STATUS_SENDING,))
+
+    run_with_queue(tmp_path, enqueue_and_crash)
+    sheet = FakeSheet(rows={'Ученик': [['42', 'Ali']]})
+
+    async def restart(queue):
+        await queue.start(sheet.append_rows, sheet.read_rows)
+        recovered = statuses(queue), queue.pending_rows('Ученик')
+        await queue.flush()
+        return recovered
+
+    recovered_statuses, pending = run_with_queue(tmp_path, restart)
+    assert recovered_statuses == [STATUS_DONE, STATUS_PENDING]
+    assert pending == [['43', 'Vali']]
+    assert sheet.rows['Ученик'] == [['42', 'Ali'], ['43', 'Vali']]
+
+
+def test_failed_append_backs_off(tmp_path):
+    sheet = FakeSheet(failing=True)
+
+    async def scenario(queue):
+        await queue.enqueue('Ученик', ['42', 'Ali'], identity=['42'])
+        await queue.start(sheet.append_rows, sheet.read_rows)
+        failed = await queue.flush()
+        attempts, next_attempt_at = queue._db.execute(
+            "SELECT attempts, next_attempt_at FROM pending_rows"
+        ).fetchone()
+        sheet.failing = False
+        # The retry is not due yet, so a regular flush leaves the row alone
+        during_backoff = await queue.flush()
+        forced = await queue.flush(ignore_backoff=True)
+        return failed, attempts, next_attempt_at, during_backoff, forced, statuses(queue), queue.pending_count()
+
+    failed, attempts, next_attempt_at, during_backoff, forced, row_statuses, pending = run_with_queue(tmp_path, scenario)
+    assert failed == 0
+    assert attempts == 1
+    assert next_attempt_at > time.time()
+    assert during_backoff == 0
+    assert forced == 1
+    assert row_statuses == [STATUS_DONE]
+    assert pending == 0
+    assert sheet.appends == 2
+
+
+def test_flush_entry_writes_rows_beyond_the_first_batch(tmp_path):
+    sheet = FakeSheet()
+
+    async def scenario(queue):
+        for user_id in range(5):
+            await queue.enqueue('Ученик', [str(user_id)], identity=[user_id])
+        await queue.start(sheet.append_rows, sheet.read_rows)
+        return await queue.flush_entry('Ученик', [3]), sheet.appends
+
+    written, appends = run_with_queue(tmp_path, scenario, batch_size=2)
+    assert written
+    assert appends == 2
+
+
+def test_update_pending_edits_the_queued_row(tmp_path):
+    sheet = FakeSheet(failing=True)
+
+    async def scenario(queue):
+        await queue.enqueue('Ученик', ['42', 'Ali'], identity=['42'])
+        await queue.start(sheet.append_rows, sheet.read_rows)
+        written = await queue.flush_entry('Ученик', ['42'])
+        updated = await queue.update_pending('Ученик', ['42'], {1: 'Alisher', 3: 'Tashkent'})
+        sheet.failing = False
+        return written, updated, queue.pending_rows('Ученик')
+
+    written, updated, pending = run_with_queue(tmp_path, scenario)
+    assert not written
+    assert updated
+    assert pending == [['42', 'Alisher', '', 'Tashkent']]
+    # stop() flushes the edited row
+    assert sheet.rows['Ученик'] == pending